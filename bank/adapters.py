@@ -0,0 +1,156 @@
+import os
+from datetime import date
+from itertools import islice
+
+import pandas as pd
+
+from bank.statement_parsers import BINARY_PARSERS, PARSERS, parser_for
+
+# The frame every adapter returns, and what RECON.process_transactions consumes.
+NORMALIZED_COLUMNS = ['entryId', 'bookingDate', 'valueDate', 'remittanceInfo', 'reference', 'amount', 'currency',
+                      'creditDebitIndicator', 'availableCreditDebitIndicator']
+
+# Few distinct values per statement, so they are stored as categoricals
+CATEGORY_COLUMNS = ['currency', 'creditDebitIndicator', 'availableCreditDebitIndicator']
+
+
+def compact_frame(df):
+    """
+    Bring a statement frame to the normalized column order and compact dtypes.
+
+    Args:
+        df (pandas.DataFrame): Transactions with at least the parser record columns.
+
+    Returns:
+        pandas.DataFrame: NORMALIZED_COLUMNS plus zeroed discount and total.
+    """
+    if 'availableCreditDebitIndicator' not in df.columns:
+        df = df.assign(availableCreditDebitIndicator=df['creditDebitIndicator'])
+    df = df[NORMALIZED_COLUMNS].copy()
+    df['amount'] = pd.to_numeric(df['amount']).abs().astype('float64')
+    for column in CATEGORY_COLUMNS:
+        df[column] = df[column].astype('category')
+    df['discount'] = 0.0
+    df['total'] = 0.0
+    return df
+
+
+def _as_date(value):
+    if value is None or isinstance(value, date):
+        return value
+    return date.fromisoformat(value)
+
+
+class BankAdapter:
+    """
+    A source of bank statement transactions.
+
+    Subclasses return the normalized frame, so RECON and recon.pipeline work the same
+    whichever bank or file format the statement came from.
+    """
+
+    name = None
+
+    def get_transaction_history(self, account_number, from_date, to_date, idempotency_id=None):
+        """
+        Transactions for an account and date window.
+
+        Args:
+            account_number (str): The account number.
+            from_date (str): Window start (YYYY-MM-DD).
+            to_date (str): Window end (YYYY-MM-DD), inclusive.
+            idempotency_id (str): Passed to sources that support it.
+
+        Returns:
+            pandas.DataFrame: The normalized frame, or None if there are no transactions.
+        """
+        raise NotImplementedError
+
+
+class FNBAdapter(BankAdapter):
+    """The FNB transaction-history API through bank.fnb.BankAPI."""
+
+    name = 'fnb'
+
+    def __init__(self, bank_api):
+        self.bank_api = bank_api
+
+    def get_transaction_history(self, account_number, from_date, to_date, idempotency_id=None):
+        df = self.bank_api.get_transaction_history(account_number, from_date, to_date,
+                                                   idempotency_id=idempotency_id)
+        return None if df is None else compact_frame(df)
+
+
+class FileStatementAdapter(BankAdapter):
+    """
+    Statement files (CSV, OFX, MT940, camt.053) read with the streaming parsers in bank.statement_parsers.
+
+    Files are parsed row by row and turned into frames chunk_rows at a time, so only one
+    chunk of a large statement is held as Python objects at once. Files are assumed to
+    belong to the account being reconciled; only the booking date window is filtered.
+
+    Args:
+        path (str): A statement file, or a directory of them.
+        statement_format (str): Force a parser ('csv', 'ofx', 'mt940', 'camt053'); by extension when omitted.
+        chunk_rows (int): Rows per frame yielded by iter_frames.
+        encoding (str): Text encoding of the files.
+        parser_options: Passed to the parser, e.g. columns= or date_format= for CSV.
+    """
+
+    name = 'file'
+
+    def __init__(self, path, statement_format=None, chunk_rows=50000, encoding='utf-8', **parser_options):
+        self.path = path
+        self.statement_format = statement_format
+        self.chunk_rows = chunk_rows
+        self.encoding = encoding
+        self.parser_options = parser_options
+
+    def files(self):
+        if not os.path.isdir(self.path):
+            return [self.path]
+        return sorted(
+            os.path.join(self.path, name) for name in os.listdir(self.path)
+            if self.statement_format or os.path.splitext(name)[1].lower() in PARSERS
+        )
+
+    def records(self):
+        """Parsed transaction dicts from every statement file, in file order."""
+        for path in self.files():
+            parser = parser_for(path, self.statement_format)
+            if parser in BINARY_PARSERS:
+                # XML carries its own encoding declaration
+                with open(path, 'rb') as stream:
+                    yield from parser(stream, **self.parser_options)
+            else:
+                with open(path, encoding=self.encoding, newline='') as stream:
+                    yield from parser(stream, **self.parser_options)
+
+    def iter_frames(self, from_date=None, to_date=None):
+        """
+        Yield normalized frames of up to chunk_rows transactions within the booking date window.
+
+        Args:
+            from_date (str): Window start (YYYY-MM-DD), or None for no lower bound.
+            to_date (str): Window end (YYYY-MM-DD), inclusive, or None for no upper bound.
+        """
+        from_date, to_date = _as_date(from_date), _as_date(to_date)
+        records = self.records()
+        while True:
+            chunk = list(islice(records, self.chunk_rows))
+            if not chunk:
+                return
+            if from_date or to_date:
+                chunk = [record for record in chunk
+                         if (from_date is None or record['bookingDate'] >= from_date)
+                         and (to_date is None or record['bookingDate'] <= to_date)]
+            if chunk:
+                yield compact_frame(pd.DataFrame.from_records(chunk))
+
+    def get_transaction_history(self, account_number, from_date, to_date, idempotency_id=None):
+        frames = list(self.iter_frames(from_date, to_date))
+        if not frames:
+            print('No transactions found')
+            return None
+        # Concatenating categoricals with different categories falls back to object
+        return compact_frame(pd.concat(frames, ignore_index=True))
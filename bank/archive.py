@@ -0,0 +1,174 @@
+import os
+import re
+import uuid
+from datetime import date, timedelta
+
+from bank.adapters import NORMALIZED_COLUMNS, BankAdapter, compact_frame
+
+# pyarrow is imported in the methods that read or write, to keep module import cheap.
+
+DEFAULT_ARCHIVE_DIR = os.path.join('output', 'archive')
+PARTITION_FILE = 'statement.parquet'
+# Partition of the rows the bank returned without a booking date
+UNDATED = 'undated'
+
+_ACCOUNT = re.compile(r'^[\w-]+$')
+
+
+def _as_date(value):
+    return value if isinstance(value, date) else date.fromisoformat(value)
+
+
+class StatementArchive:
+    """
+    Local store of fetched statements as Parquet, partitioned by account and booking date.
+
+    Layout: <root>/account=<account>/booking_date=<YYYY-MM-DD>/statement.parquet. Each fetch
+    replaces the partitions of the days it returned, so a day always holds the latest
+    statement the bank gave for it. Rows without a booking date go to
+    booking_date=undated/<from>_<to>.parquet, one file per fetched window. Reads open only
+    the partitions in the window, memory mapped, and decode only the requested columns.
+
+    Args:
+        root (str): Archive directory. Defaults to STATEMENT_ARCHIVE or output/archive.
+    """
+
+    def __init__(self, root=None):
+        self.root = root or os.getenv('STATEMENT_ARCHIVE') or DEFAULT_ARCHIVE_DIR
+
+    def partition_path(self, account_number, booking_date):
+        if not _ACCOUNT.match(str(account_number)):
+            raise ValueError(f"Account number '{account_number}' cannot be used as a partition name")
+        return os.path.join(self.root, f'account={account_number}', f'booking_date={booking_date}',
+                            PARTITION_FILE)
+
+    def undated_path(self, account_number, from_date, to_date):
+        directory = os.path.dirname(self.partition_path(account_number, UNDATED))
+        return os.path.join(directory, f'{_as_date(from_date)}_{_as_date(to_date)}.parquet')
+
+    def write(self, account_number, df, window=None):
+        """
+        Archive a normalized statement frame, one partition per booking date.
+
+        Args:
+            account_number (str): The account the statement belongs to.
+            df (pandas.DataFrame): Normalized transactions, as returned by a bank adapter.
+            window (tuple): (from_date, to_date) the statement was fetched for; needed to
+                archive rows without a booking date.
+
+        Returns:
+            list: Paths of the partitions written.
+
+        Raises:
+            ValueError: Some rows have no booking date and no window was given.
+        """
+        df = df[NORMALIZED_COLUMNS]
+        undated = df['bookingDate'].isna()
+        if undated.any() and window is None:
+            raise ValueError(f"{undated.sum()} rows have no booking date; pass the fetch window to archive them")
+
+        written = []
+        for booking_date, day_df in df.groupby('bookingDate', sort=True, observed=True):
+            written.append(self._write_partition(self.partition_path(account_number, booking_date), day_df))
+        if undated.any():
+            written.append(self._write_partition(self.undated_path(account_number, *window), df[undated]))
+        return written
+
+    def _write_partition(self, path, df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        # Write next to the partition and swap it in, so readers never see a partial file
+        temp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        pq.write_table(table, temp_path)
+        os.replace(temp_path, path)
+        return path
+
+    def days(self, account_number, from_date, to_date):
+        """Booking dates in the window that have an archived partition."""
+        from_date, to_date = _as_date(from_date), _as_date(to_date)
+        days = []
+        current = from_date
+        while current <= to_date:
+            if os.path.exists(self.partition_path(account_number, current)):
+                days.append(current)
+            current += timedelta(days=1)
+        return days
+
+    def undated_files(self, account_number, from_date, to_date):
+        """Undated partitions of the fetches whose window lies inside this one."""
+        from_date, to_date = _as_date(from_date), _as_date(to_date)
+        directory = os.path.dirname(self.partition_path(account_number, UNDATED))
+        if not os.path.isdir(directory):
+            return []
+        paths = []
+        for file_name in sorted(os.listdir(directory)):
+            if not file_name.endswith('.parquet'):
+                continue
+            fetched_from, _, fetched_to = file_name[:-len('.parquet')].partition('_')
+            if from_date <= _as_date(fetched_from) and _as_date(fetched_to) <= to_date:
+                paths.append(os.path.join(directory, file_name))
+        return paths
+
+    def read(self, account_number, from_date, to_date, columns=None):
+        """
+        Read archived transactions for a booking date window.
+
+        Args:
+            account_number (str): The account number.
+            from_date (str): Window start (YYYY-MM-DD).
+            to_date (str): Window end (YYYY-MM-DD), inclusive.
+            columns (list): Columns to read; all normalized columns when omitted.
+
+        Returns:
+            pandas.DataFrame: The archived rows in booking date order, then the undated rows of
+                fetches inside the window, or None if nothing is archived for it.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        paths = [self.partition_path(account_number, day) for day in self.days(account_number, from_date, to_date)]
+        paths += self.undated_files(account_number, from_date, to_date)
+        tables = [pq.read_table(path, columns=columns, memory_map=True) for path in paths]
+        if not tables:
+            return None
+        # Dictionary columns of different days may have different dictionaries
+        return pa.concat_tables(tables, promote_options='permissive').to_pandas()
+
+
+class ArchivingAdapter(BankAdapter):
+    """Wraps a bank adapter and archives every statement it returns."""
+
+    def __init__(self, adapter, archive):
+        self.adapter = adapter
+        self.archive = archive
+        self.name = adapter.name
+
+    def get_transaction_history(self, account_number, from_date, to_date, idempotency_id=None):
+        df = self.adapter.get_transaction_history(account_number, from_date, to_date,
+                                                  idempotency_id=idempotency_id)
+        if df is not None and not df.empty:
+            try:
+                self.archive.write(account_number, df, window=(from_date, to_date))
+            except Exception as e:
+                # The archive is a convenience; never fail a recon run because of it
+                print(f"Error archiving statement {from_date} - {to_date}: {e}")
+        return df
+
+
+class ArchiveAdapter(BankAdapter):
+    """Replays archived statements, for debugging and backfills without calling the bank."""
+
+    name = 'archive'
+
+    def __init__(self, archive):
+        self.archive = archive
+
+    def get_transaction_history(self, account_number, from_date, to_date, idempotency_id=None):
+        df = self.archive.read(account_number, from_date, to_date)
+        if df is None or df.empty:
+            print('No archived transactions found')
+            return None
+        return compact_frame(df)
@@ -0,0 +1,113 @@
+from datetime import date
+
+# ISO 20022 camt.053 (bank-to-customer statement) reader. lxml is imported when a file is
+# parsed, so importing bank.statement_parsers does not need it.
+
+BOOKED = 'BOOK'
+NOT_PROVIDED = 'NOTPROVIDED'
+
+
+def _local_name(element):
+    # '{urn:iso:std:iso:20022:tech:xsd:camt.053.001.08}Ntry' -> 'Ntry'; comments have no string tag
+    tag = element.tag
+    return tag[tag.rfind('}') + 1:] if isinstance(tag, str) else None
+
+
+def _date(element):
+    # <Dt>2024-08-01</Dt> or <DtTm>2024-08-01T10:00:00+02:00</DtTm>
+    value = element[0].text if len(element) else None
+    return date.fromisoformat(value.strip()[:10]) if value else None
+
+
+def parse_camt053(stream, booked_only=True):
+    """
+    Stream Ntry elements from a camt.053 statement, in any message version.
+
+    Each entry is cleared, and earlier siblings are dropped, once it has been read, so
+    memory use stays flat however large the statement is.
+
+    Args:
+        stream (BinaryIO): Open binary file, or a path.
+        booked_only (bool): Skip pending and information-only entries.
+
+    Yields:
+        dict: One normalized transaction per Ntry.
+    """
+    from lxml import etree
+
+    context = etree.iterparse(stream, events=('end',), tag='{*}Ntry',
+                              resolve_entities=False, no_network=True, huge_tree=True)
+    for index, (_, entry) in enumerate(context, start=1):
+        status, record = _entry_record(entry, index)
+        if not booked_only or status in ('', BOOKED):
+            yield record
+
+        entry.clear(keep_tail=True)
+        parent = entry.getparent()
+        while entry.getprevious() is not None:
+            del parent[0]
+
+
+def _entry_record(entry, index):
+    """(status, record) for one Ntry, reading each element once."""
+    fields = {}
+    amount = currency = details = None
+    status = ''
+    for child in entry:
+        name = _local_name(child)
+        if name == 'Amt':
+            amount, currency = child.text, child.get('Ccy')
+        elif name in ('NtryRef', 'AcctSvcrRef', 'CdtDbtInd'):
+            fields[name] = (child.text or '').strip()
+        elif name in ('BookgDt', 'ValDt'):
+            fields[name] = _date(child)
+        elif name == 'Sts':
+            # camt.053.001.02 has <Sts>BOOK</Sts>, later versions <Sts><Cd>BOOK</Cd></Sts>
+            status = ((child[0].text if len(child) else child.text) or '').strip()
+        elif name == 'NtryDtls':
+            details = child
+
+    remittance, end_to_end_id, creditor_reference, servicer_reference = [], None, None, None
+    if details is not None:
+        for element in details.iter():
+            name = _local_name(element)
+            if name == 'Ustrd' and element.text:
+                remittance.append(element.text.strip())
+            elif name == 'EndToEndId' and end_to_end_id is None:
+                end_to_end_id = (element.text or '').strip()
+            elif name == 'Ref' and creditor_reference is None:
+                creditor_reference = (element.text or '').strip()
+            elif name == 'AcctSvcrRef' and servicer_reference is None:
+                servicer_reference = (element.text or '').strip()
+
+    reference = end_to_end_id if end_to_end_id and end_to_end_id != NOT_PROVIDED else creditor_reference
+    booking_date = fields.get('BookgDt')
+    return status, {
+        'entryId': fields.get('NtryRef') or fields.get('AcctSvcrRef') or servicer_reference or f'ntry-{index}',
+        'bookingDate': booking_date,
+        'valueDate': fields.get('ValDt') or booking_date,
+        'remittanceInfo': ' '.join(remittance) or None,
+        'reference': reference or None,
+        'amount': abs(float(amount)),
+        'currency': currency,
+        'creditDebitIndicator': fields.get('CdtDbtInd'),
+    }
+
+
+def read_camt053(path, chunk_rows=50000, from_date=None, to_date=None):
+    """
+    Normalized transaction frames from a camt.053 file, chunk_rows at a time.
+
+    Args:
+        path (str): The statement file.
+        chunk_rows (int): Rows per frame.
+        from_date (str): Optional booking window start (YYYY-MM-DD).
+        to_date (str): Optional booking window end (YYYY-MM-DD), inclusive.
+
+    Yields:
+        pandas.DataFrame: Frames in the bank.adapters normalized layout.
+    """
+    from bank.adapters import FileStatementAdapter
+
+    adapter = FileStatementAdapter(path, statement_format='camt053', chunk_rows=chunk_rows)
+    yield from adapter.iter_frames(from_date, to_date)
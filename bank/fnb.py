@@ -1,17 +1,47 @@
 import json
 import os
+import threading
+import time
 import uuid
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 
-import pandas as pd
 import psycopg2
 from psycopg2 import extras
 import requests
 from requests.auth import HTTPBasicAuth
 
-from RPA.Database import Database
+from bank.fnb_decode import TransactionColumns
+from metrics import BANK_REQUEST_SECONDS, BANK_RESPONSES
+
+
+def retry_after_seconds(value, now=None):
+    """
+    Seconds to wait from a Retry-After header, given as delay seconds or as an HTTP date.
+
+    Args:
+        value (str): The header value.
+        now (datetime.datetime): Reference time for the HTTP-date form; defaults to the current UTC time.
+
+    Returns:
+        float: Seconds to wait, never negative, or None when the header cannot be parsed.
+    """
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - (now or datetime.now(timezone.utc))).total_seconds(), 0.0)
+
 
 class BankAPI:
-    def __init__(self, client_id, client_secret, base_url, auth_url, db_config):
+    def __init__(self, client_id, client_secret, base_url, auth_url, db_config, max_retries=3, backoff_seconds=1.0,
+                 max_delay_seconds=60.0):
         self.client_id = client_id
         self.client_secret = client_secret
         self.access_token = None
@@ -20,6 +50,13 @@ class BankAPI:
         self.auth_url = auth_url
         self.db_config = db_config
         self.db_conn = None
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        # Upper bound on any single wait, so a large Retry-After cannot stall the run
+        self.max_delay_seconds = max_delay_seconds
+        self.session = requests.Session()
+        # Worker threads share one client; only one of them re-authenticates at a time
+        self._token_lock = threading.Lock()
         self.__auth_tokens()
     
     #todo - this will be gone ...
@@ -113,7 +150,8 @@ class BankAPI:
             'scope': scope
             }
     
-        auth_response = requests.post(self.auth_url, data=auth_data, auth=HTTPBasicAuth(self.client_id, self.client_secret))
+        auth_response = self.__request('token', 'post', self.auth_url, data=auth_data,
+                                        auth=HTTPBasicAuth(self.client_id, self.client_secret))
     
         # Check if authentication was successful
         if auth_response.status_code == 200:
@@ -125,7 +163,7 @@ class BankAPI:
             print(auth_response.text)
     
 
-    def get_transaction_history(self, account_number, from_date, to_date):
+    def get_transaction_history(self, account_number, from_date, to_date, idempotency_id=None):
         """
         Retrieve transaction history for a given account number and date range.
         
@@ -133,6 +171,7 @@ class BankAPI:
             account_number (str): The account number for which to retrieve transaction history.
             from_date (str): The start date for the transaction history (YYYY-MM-DD).
             to_date (str): The end date for the transaction history (YYYY-MM-DD).
+            idempotency_id (str): X-Idempotency-ID to reuse when retrying a window; a new one is generated if omitted.
             
         Returns:
             dict: A dictionary containing the transaction history, or None if no transactions were found or an error occurred.
@@ -142,7 +181,7 @@ class BankAPI:
         
         # Generate unique UUID header variables
         request_id = str(uuid.uuid4()) 
-        idempotency_id = str(uuid.uuid4()) 
+        idempotency_id = idempotency_id or str(uuid.uuid4())
        
         headers = {
             'Authorization': f'Bearer {self.access_token}',
@@ -157,67 +196,103 @@ class BankAPI:
             'toDate': to_date
         }
         
-        # Make the API call
-        response = requests.get(transaction_history_url, headers=headers, params=params)
-        
-        # Check the response status code
-        if response.status_code == 200:
-            transactions = response.json()
-            entries = transactions['entry']
+        # Make the API call, following paged responses until the window is complete.
+        # Each page is decoded straight into the columns the frame needs (bank.fnb_decode).
+        columns = TransactionColumns()
+        url = transaction_history_url
+        while url:
+            response = self.__get_with_retries(url, headers, params)
 
-            df = pd.json_normalize(entries)
-            
-            df = df.rename(columns={
-                           'bookingDate.Date': 'bookingDate',
-                           'valueDate.Date': 'valueDate',
-                           'entryDetails.transactionDetails.remittanceInfo.unstructured': 'remittanceInfo',
-                           'entryDetails.transactionDetails.reference.endToEndId': 'reference',
-                           'amount.amount': 'amount',
-                           'amount.currency': 'currency',
-                           'availability.creditDebitIndicator': 'availableCreditDebitIndicator'
-                       })
-            
-            df['amount'] = pd.to_numeric(df['amount']).abs()
-            df['bookingDate'] = pd.to_datetime(df['bookingDate']).dt.date
-            df['valueDate'] = pd.to_datetime(df['valueDate']).dt.date
+            if response.status_code == 204:
+                break
+            if response.status_code != 200:
+                print(f'Error: {response.status_code}')
+                return None
 
-            column_order = ['entryId', 'bookingDate', 'valueDate', 'remittanceInfo','reference', 'amount', 'currency', 
-                'creditDebitIndicator', 'availableCreditDebitIndicator']
-            
-            df = df[column_order]
-            df['discount'] = 0.0
-            df['total'] = 0.0
-                  
-            return df
-        elif response.status_code == 204:
+            # The next link already carries the query string
+            url = columns.add_page(response.content)
+            params = None
+
+        if not len(columns):
             print('No transactions found')
             return None
-        elif response.status_code == 401:
-            # Access token expired, refresh token
-            self.__refresh_access_token()
-            if self.access_token:
-                headers['Authorization'] = f'Bearer {self.access_token}'
-                response = requests.get(transaction_history_url, headers=headers, params=params)
-                if response.status_code == 200:
-                    transactions = json.loads(response)
-                    # Convert to DataFrame
-                    df = pd.DataFrame.from_dict(transactions)
-                    return df
-                else:
-                    print(f'Error: {response.status_code}')
-                    return None
-            else:
-                print('Error refreshing token')
-                return None
-        else:
-            print(f'Error: {response.status_code}')
-            return None
+
+        df = columns.to_frame()
+        df['discount'] = 0.0
+        df['total'] = 0.0
+
+        return df
+
+
+    def __get_with_retries(self, url, headers, params):
+        """
+        GET a transaction-history page, re-authenticating on 401 and backing off on 429/5xx.
+
+        Args:
+            url (str): The page URL.
+            headers (dict): Request headers; the Authorization header is updated after re-authentication.
+            params (dict): Query parameters, or None when the URL already carries them.
+
+        Returns:
+            requests.Response: The last response received.
+        """
+        reauthenticated = False
+        for attempt in range(self.max_retries + 1):
+            response = self.__request('transaction-history', 'get', url, headers=headers, params=params)
+
+            if response.status_code == 401 and not reauthenticated:
+                # Access token expired, get a new one and retry straight away
+                reauthenticated = True
+                with self._token_lock:
+                    # Another thread may have replaced the expired token while this one waited
+                    if headers['Authorization'] == f'Bearer {self.access_token}':
+                        self.__refresh_access_token()
+                    access_token = self.access_token
+                if not access_token:
+                    print('Error refreshing token')
+                    return response
+                headers['Authorization'] = f'Bearer {access_token}'
+                continue
+
+            if response.status_code != 429 and response.status_code < 500:
+                return response
+
+            if attempt < self.max_retries:
+                delay = retry_after_seconds(response.headers.get('Retry-After'))
+                if delay is None:
+                    delay = self.backoff_seconds * (2 ** attempt)
+                delay = min(delay, self.max_delay_seconds)
+                print(f'Bank API returned {response.status_code}, retrying in {delay:.1f}s')
+                time.sleep(delay)
+
+        return response
         
 
+    def __request(self, endpoint, method, url, **kwargs):
+        """Send a request through the session, recording its latency and status code."""
+        start_time = time.perf_counter()
+        status = 'error'
+        try:
+            response = self.session.request(method, url, **kwargs)
+            status = response.status_code
+            return response
+        finally:
+            BANK_REQUEST_SECONDS.labels(bank='fnb', endpoint=endpoint).observe(time.perf_counter() - start_time)
+            BANK_RESPONSES.labels(bank='fnb', endpoint=endpoint, status=status).inc()
+
+
     def __refresh_access_token(self):
         """
         Refresh the access token using the refresh token.
+
+        The client-credentials grant does not return a refresh token, so in that
+        case a new access token is requested instead.
         """
+        if not self.refresh_token:
+            self.access_token = None
+            self.__auth_tokens()
+            return
+
         refresh_url = f'{self.base_url}/oauth2/token/v2'
         refresh_payload = {
             'grant_type': 'refresh_token',
@@ -226,7 +301,7 @@ class BankAPI:
             'client_secret': self.client_secret
         }
         
-        refresh_response = requests.post(refresh_url, data=refresh_payload)
+        refresh_response = self.__request('token-refresh', 'post', refresh_url, data=refresh_payload)
 
         if refresh_response.status_code == 200:
             refresh_data = refresh_response.json()
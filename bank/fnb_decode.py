@@ -0,0 +1,241 @@
+import gc
+import json
+from contextlib import contextmanager
+from datetime import date
+from typing import List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+# Decodes FNB transaction-history pages straight into the nine columns the normalized
+# frame needs, instead of json_normalize flattening every nested field of every entry.
+# msgspec is used when installed: entries are decoded into typed structs that hold only
+# those fields, everything else is skipped by the parser. Otherwise pages are decoded
+# with orjson, or the standard library json, and the fields are read from the dicts.
+# A page creates millions of objects, none of them in reference cycles, so the cyclic
+# garbage collector is paused while one is decoded; it otherwise runs hundreds of times
+# per page and dominates decode time.
+
+# Output column -> path of the field in an entry, in the order of the normalized frame
+ENTRY_FIELDS = {
+    'entryId': ('entryId',),
+    'bookingDate': ('bookingDate', 'Date'),
+    'valueDate': ('valueDate', 'Date'),
+    'remittanceInfo': ('entryDetails', 'transactionDetails', 'remittanceInfo', 'unstructured'),
+    'reference': ('entryDetails', 'transactionDetails', 'reference', 'endToEndId'),
+    'amount': ('amount', 'amount'),
+    'currency': ('amount', 'currency'),
+    'creditDebitIndicator': ('creditDebitIndicator',),
+    'availableCreditDebitIndicator': ('availability', 'creditDebitIndicator'),
+}
+
+# What json_normalize leaves in a column for an entry that lacks the field
+MISSING = np.nan
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+if msgspec is not None:
+    _UNSET = msgspec.UNSET
+    # JSON scalars; anything else where a field is expected fails validation and the page
+    # is decoded through the dict path, which handles it like json_normalize
+    _Scalar = Union[str, int, float, bool, None]
+
+    class _Date(msgspec.Struct, gc=False):
+        Date: _Scalar = _UNSET
+
+    class _Amount(msgspec.Struct, gc=False):
+        amount: _Scalar = _UNSET
+        currency: _Scalar = _UNSET
+
+    class _Availability(msgspec.Struct, gc=False):
+        creditDebitIndicator: _Scalar = _UNSET
+
+    class _RemittanceInfo(msgspec.Struct, gc=False):
+        unstructured: _Scalar = _UNSET
+
+    class _Reference(msgspec.Struct, gc=False):
+        endToEndId: _Scalar = _UNSET
+
+    class _TransactionDetails(msgspec.Struct, gc=False):
+        remittanceInfo: Optional[_RemittanceInfo] = None
+        reference: Optional[_Reference] = None
+
+    class _EntryDetails(msgspec.Struct, gc=False):
+        transactionDetails: Optional[_TransactionDetails] = None
+
+    class _Entry(msgspec.Struct, gc=False):
+        entryId: _Scalar = _UNSET
+        bookingDate: Optional[_Date] = None
+        valueDate: Optional[_Date] = None
+        amount: Optional[_Amount] = None
+        creditDebitIndicator: _Scalar = _UNSET
+        availability: Optional[_Availability] = None
+        entryDetails: Optional[_EntryDetails] = None
+
+    class _Links(msgspec.Struct, gc=False):
+        next: Optional[str] = None
+
+    class _Page(msgspec.Struct):
+        entry: List[_Entry] = msgspec.field(default_factory=list)
+        links: Optional[_Links] = None
+
+    _PAGE_DECODER = msgspec.json.Decoder(_Page)
+
+
+def default_backend():
+    """The fastest decoder available: 'msgspec', 'orjson' or 'json'."""
+    if msgspec is not None:
+        return 'msgspec'
+    return 'orjson' if orjson is not None else 'json'
+
+
+@contextmanager
+def _gc_paused():
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _struct_row(entry):
+    try:
+        details = entry.entryDetails.transactionDetails
+        row = (entry.entryId, entry.bookingDate.Date, entry.valueDate.Date, details.remittanceInfo.unstructured,
+               details.reference.endToEndId, entry.amount.amount, entry.amount.currency,
+               entry.creditDebitIndicator, entry.availability.creditDebitIndicator)
+    except AttributeError:
+        # An object on the path is null
+        row = None
+    if row is None or _UNSET in row:
+        row = tuple(_struct_value(entry, path) for path in ENTRY_FIELDS.values())
+    return row
+
+
+def _struct_value(entry, path):
+    value = entry
+    for name in path:
+        value = getattr(value, name, _UNSET) if value is not None else _UNSET
+        if value is _UNSET:
+            return MISSING
+    return value
+
+
+def _dict_row(entry):
+    try:
+        details = entry['entryDetails']['transactionDetails']
+        amount = entry['amount']
+        row = (entry['entryId'], entry['bookingDate']['Date'], entry['valueDate']['Date'],
+               details['remittanceInfo']['unstructured'], details['reference']['endToEndId'],
+               amount['amount'], amount['currency'], entry['creditDebitIndicator'],
+               entry['availability']['creditDebitIndicator'])
+    except (KeyError, TypeError):
+        # A field is missing, or an object on the path is null
+        row = None
+    if row is None or dict in map(type, row):
+        row = tuple(_dict_value(entry, path) for path in ENTRY_FIELDS.values())
+    return row
+
+
+def _dict_value(entry, path):
+    value = entry
+    for name in path:
+        if not isinstance(value, dict) or name not in value:
+            return MISSING
+        value = value[name]
+    # A dict here would have been flattened into deeper columns, not this one
+    return MISSING if isinstance(value, dict) else value
+
+
+def _parse_dates(values):
+    """Column of datetime.date, as pd.to_datetime(...).dt.date gives for ISO dates, but cached per value."""
+    parsed = {}
+    try:
+        for value in values:
+            if value not in parsed:
+                if not isinstance(value, str) or (len(value) > 10 and value[10] not in 'T '):
+                    raise ValueError(value)
+                parsed[value] = date.fromisoformat(value[:10])
+    except ValueError:
+        return pd.to_datetime(pd.Series(values)).dt.date
+    return pd.Series([parsed[value] for value in values], dtype=object)
+
+
+class TransactionColumns:
+    """
+    Accumulates transaction-history pages as column arrays.
+
+    Each page is decoded and reduced to the ENTRY_FIELDS columns straight away, so no
+    more than one decoded page is held at a time.
+
+    Args:
+        backend (str): 'msgspec', 'orjson' or 'json'; defaults to the fastest installed.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or default_backend()
+        if self.backend == 'msgspec' and msgspec is None or self.backend == 'orjson' and orjson is None:
+            raise ValueError(f"JSON decoder '{self.backend}' is not installed")
+        self.columns = {column: [] for column in ENTRY_FIELDS}
+
+    def __len__(self):
+        return len(self.columns['entryId'])
+
+    def add_page(self, content):
+        """
+        Decode one response body and append its entries.
+
+        Args:
+            content (bytes): The transaction-history response body.
+
+        Returns:
+            str: The next page link, or None on the last page.
+        """
+        with _gc_paused():
+            page = None
+            if self.backend == 'msgspec':
+                try:
+                    page = _PAGE_DECODER.decode(content)
+                except msgspec.ValidationError:
+                    # Not the shape the structs describe; decode it as plain JSON instead
+                    pass
+            if page is not None:
+                next_link = page.links.next if page.links else None
+                rows = [_struct_row(entry) for entry in page.entry]
+            else:
+                page = orjson.loads(content) if orjson is not None and self.backend != 'json' else json.loads(content)
+                next_link = (page.get('links') or {}).get('next')
+                rows = [_dict_row(entry) for entry in page['entry']]
+            del page
+
+        for values, column in zip(zip(*rows), self.columns.values()):
+            column.extend(values)
+        return next_link
+
+    def to_frame(self):
+        """
+        The entries as a frame, equal to the json_normalize path it replaces.
+
+        Returns:
+            pandas.DataFrame: ENTRY_FIELDS columns with amount made absolute and dates as datetime.date.
+        """
+        data = {}
+        for column, values in self.columns.items():
+            if column == 'amount':
+                data[column] = pd.to_numeric(pd.Series(values)).abs()
+            elif column in ('bookingDate', 'valueDate'):
+                data[column] = _parse_dates(values)
+            else:
+                data[column] = pd.Series(values, dtype=object)
+        return pd.DataFrame(data)
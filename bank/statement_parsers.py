@@ -0,0 +1,307 @@
+import csv
+import html
+import os
+import re
+from datetime import date, datetime
+
+from bank.camt053 import parse_camt053
+
+# Streaming parsers for statement files. Each parser reads a text stream once and yields
+# one dict per transaction with the normalized column names (see bank.adapters), so a
+# statement never has to fit in memory as text or as a parsed tree.
+
+CREDIT = 'CRDT'
+DEBIT = 'DBIT'
+
+# Normalized column -> CSV header. Override per bank with parse_csv(columns=...).
+CSV_COLUMNS = {
+    'entryId': 'entryId',
+    'bookingDate': 'bookingDate',
+    'valueDate': 'valueDate',
+    'remittanceInfo': 'remittanceInfo',
+    'reference': 'reference',
+    'amount': 'amount',
+    'currency': 'currency',
+    'creditDebitIndicator': 'creditDebitIndicator',
+}
+
+_DATE_CACHE_SIZE = 4096
+
+
+class _DateParser:
+    """strptime with a small cache; statements repeat the same handful of dates."""
+
+    def __init__(self, date_format):
+        self.date_format = date_format
+        self.cache = {}
+
+    def __call__(self, value):
+        if not value:
+            return None
+        parsed = self.cache.get(value)
+        if parsed is None:
+            if len(self.cache) > _DATE_CACHE_SIZE:
+                self.cache.clear()
+            parsed = self.cache[value] = datetime.strptime(value, self.date_format).date()
+        return parsed
+
+
+def _indicator(amount, indicator):
+    if indicator:
+        indicator = indicator.strip().upper()
+        if indicator in ('C', 'CR', 'CREDIT', CREDIT):
+            return CREDIT
+        if indicator in ('D', 'DR', 'DEBIT', DEBIT):
+            return DEBIT
+    return DEBIT if amount < 0 else CREDIT
+
+
+def parse_csv(stream, columns=None, date_format='%Y-%m-%d', delimiter=',', currency='ZAR'):
+    """
+    Parse a CSV statement with a header row.
+
+    Args:
+        stream (TextIO): Open text file.
+        columns (dict): Normalized column -> CSV header; bookingDate, remittanceInfo and amount are required.
+        date_format (str): strptime format of the date columns.
+        delimiter (str): Field delimiter.
+        currency (str): Currency for rows without a currency column.
+
+    Yields:
+        dict: One normalized transaction per row.
+    """
+    columns = {**CSV_COLUMNS, **(columns or {})}
+    reader = csv.reader(stream, delimiter=delimiter)
+    header = next(reader, None)
+    if header is None:
+        return
+    positions = {name: header.index(title) for name, title in columns.items() if title in header}
+    missing = {'bookingDate', 'remittanceInfo', 'amount'} - set(positions)
+    if missing:
+        raise ValueError(f"CSV statement is missing columns: {', '.join(sorted(missing))}")
+
+    parse_date = _DateParser(date_format)
+
+    def field(row, name):
+        index = positions.get(name)
+        return row[index] if index is not None and index < len(row) else ''
+
+    for line_number, row in enumerate(reader, start=1):
+        if not row:
+            continue
+        amount = float(field(row, 'amount').replace(' ', '').replace(',', '') or 0)
+        booked = parse_date(field(row, 'bookingDate'))
+        yield {
+            'entryId': field(row, 'entryId') or f'csv-{line_number}',
+            'bookingDate': booked,
+            'valueDate': parse_date(field(row, 'valueDate')) or booked,
+            'remittanceInfo': field(row, 'remittanceInfo') or None,
+            'reference': field(row, 'reference') or None,
+            'amount': abs(amount),
+            'currency': field(row, 'currency') or currency,
+            'creditDebitIndicator': _indicator(amount, field(row, 'creditDebitIndicator')),
+        }
+
+
+_OFX_TOKEN = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+
+
+def _ofx_date(value):
+    # YYYYMMDD[HHMMSS[.XXX][[gmt offset:tz name]]]
+    value = value.strip()
+    return date(int(value[:4]), int(value[4:6]), int(value[6:8])) if len(value) >= 8 else None
+
+
+def parse_ofx(stream, block_size=1 << 20):
+    """
+    Parse an OFX 1.x (SGML) or 2.x (XML) statement.
+
+    The file is tokenised block by block; only the transaction being read is kept.
+
+    Args:
+        stream (TextIO): Open text file.
+        block_size (int): Characters read per block.
+
+    Yields:
+        dict: One normalized transaction per STMTTRN.
+    """
+    currency = None
+    transaction = None
+    pending = ''
+
+    while True:
+        block = stream.read(block_size)
+        text = pending + block
+        # Keep a possibly incomplete trailing tag for the next block
+        cut = text.rfind('<') if block else len(text)
+        cut = len(text) if cut <= 0 else cut
+        pending = text[cut:]
+
+        for closing, name, value in _OFX_TOKEN.findall(text[:cut]):
+            name = name.upper()
+            value = value.strip()
+            if '&' in value:
+                value = html.unescape(value)
+            if name == 'STMTTRN':
+                if closing:
+                    if transaction:
+                        yield _ofx_record(transaction, currency)
+                    transaction = None
+                else:
+                    transaction = {}
+            elif closing:
+                continue
+            elif transaction is not None:
+                transaction[name] = value
+            elif name == 'CURDEF':
+                currency = value
+
+        if not block:
+            break
+
+    if transaction:
+        yield _ofx_record(transaction, currency)
+
+
+def _ofx_record(transaction, currency):
+    amount = float(transaction.get('TRNAMT') or 0)
+    booked = _ofx_date(transaction.get('DTPOSTED', ''))
+    indicator = transaction.get('TRNTYPE') if transaction.get('TRNTYPE') in ('CREDIT', 'DEBIT') else None
+    text = ' '.join(value for value in (transaction.get('NAME'), transaction.get('MEMO')) if value)
+    return {
+        'entryId': transaction.get('FITID'),
+        'bookingDate': booked,
+        'valueDate': _ofx_date(transaction.get('DTUSER', '')) or booked,
+        'remittanceInfo': text or None,
+        'reference': transaction.get('REFNUM') or transaction.get('CHECKNUM') or None,
+        'amount': abs(amount),
+        'currency': transaction.get('CURRENCY') or currency,
+        'creditDebitIndicator': _indicator(amount, indicator),
+    }
+
+
+_MT940_TAG = re.compile(r'^:(\d{2}[A-Z]?):(.*)$')
+_MT940_LINE = re.compile(
+    r'(?P<value>\d{6})(?P<entry>\d{4})?(?P<mark>R?[CD])[A-Z]?(?P<amount>\d+,\d*)'
+    r'[NFS][A-Z0-9]{3}(?P<customer>[^/]*?)(?://(?P<bank>.*))?$')
+
+
+def _mt940_date(value):
+    return date(2000 + int(value[:2]), int(value[2:4]), int(value[4:6]))
+
+
+def parse_mt940(stream):
+    """
+    Parse a SWIFT MT940 statement, possibly holding several messages.
+
+    :61: statement lines give the dates, amount and references, and the :86: field that
+    follows gives the remittance text. Wrapped :86: lines are joined without a separator,
+    since banks wrap at a fixed width, often inside a word.
+
+    Args:
+        stream (TextIO): Open text file.
+
+    Yields:
+        dict: One normalized transaction per :61: line.
+    """
+    currency = None
+    account = None
+    transaction = None
+    tag = None
+    sequence = 0
+
+    for raw_line in stream:
+        line = raw_line.rstrip('\r\n')
+        match = _MT940_TAG.match(line)
+        if match is None:
+            if line.startswith('-}') or line == '-':
+                tag = None
+            elif tag == '86' and transaction is not None:
+                transaction['remittanceInfo'] += line
+            continue
+
+        tag, value = match.groups()
+        if tag == '25':
+            account = value.strip()
+        elif tag in ('60F', '60M'):
+            currency = value[7:10]
+        elif tag == '61':
+            if transaction is not None:
+                yield _mt940_record(transaction)
+            sequence += 1
+            transaction = _mt940_statement_line(value, currency, account, sequence)
+        elif tag == '86' and transaction is not None:
+            transaction['remittanceInfo'] = value
+        elif tag in ('62F', '62M', '64', '65') and transaction is not None:
+            # Closing balance: a later :86: belongs to the statement, not the last entry
+            yield _mt940_record(transaction)
+            transaction = None
+
+    if transaction is not None:
+        yield _mt940_record(transaction)
+
+
+def _mt940_statement_line(value, currency, account, sequence):
+    match = _MT940_LINE.match(value)
+    if match is None:
+        raise ValueError(f"Unrecognised MT940 :61: line: {value}")
+
+    value_date = _mt940_date(match['value'])
+    booking_date = value_date
+    if match['entry']:
+        booking_date = date(value_date.year, int(match['entry'][:2]), int(match['entry'][2:]))
+        # The entry date has no year; it can fall across a year end from the value date
+        if (booking_date - value_date).days > 180:
+            booking_date = booking_date.replace(year=booking_date.year - 1)
+        elif (value_date - booking_date).days > 180:
+            booking_date = booking_date.replace(year=booking_date.year + 1)
+
+    customer_reference = match['customer'].strip()
+    bank_reference = (match['bank'] or '').strip()
+    mark = match['mark']
+    # RC/RD are reversals: a reversed credit is money going out
+    indicator = DEBIT if mark in ('D', 'RC') else CREDIT
+    return {
+        'entryId': bank_reference or f'{account}-{value_date:%Y%m%d}-{sequence}',
+        'bookingDate': booking_date,
+        'valueDate': value_date,
+        'remittanceInfo': '',
+        'reference': None if customer_reference in ('', 'NONREF') else customer_reference,
+        'amount': float(match['amount'].replace(',', '.')),
+        'currency': currency,
+        'creditDebitIndicator': indicator,
+    }
+
+
+def _mt940_record(transaction):
+    transaction['remittanceInfo'] = transaction['remittanceInfo'].strip() or None
+    return transaction
+
+
+# File extension (or statement_format) -> parser. bank.adapters.FileStatementAdapter picks the parser from here.
+PARSERS = {
+    '.csv': parse_csv,
+    '.ofx': parse_ofx,
+    '.qfx': parse_ofx,
+    '.sta': parse_mt940,
+    '.mt940': parse_mt940,
+    '.940': parse_mt940,
+    '.xml': parse_camt053,
+    '.camt053': parse_camt053,
+}
+
+# Parsers that read bytes; the rest get a text stream.
+BINARY_PARSERS = {parse_camt053}
+
+
+def parser_for(path, statement_format=None):
+    """
+    The parser for a statement file, from an explicit format or the file extension.
+
+    Raises:
+        ValueError: If the format is not supported.
+    """
+    key = f'.{statement_format.lower().lstrip(".")}' if statement_format else os.path.splitext(path)[1].lower()
+    if key not in PARSERS:
+        raise ValueError(f"Unsupported statement format '{key}' for {path}")
+    return PARSERS[key]
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import os
+import shutil
+import tarfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+tag = '🍎🍎🍎 Download Manager 🍎'
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'tiger-robot', 'downloads')
+COPY_BUFFER = 1024 * 1024
+
+
+class DownloadManager:
+    """Downloads large files in parallel ranged chunks into a content-addressed local cache.
+
+    Files are cached under a key built from the URL and the server's ETag (or size and
+    Last-Modified when there is no ETag), so a repeat download of an unchanged file is a
+    cache hit. Chunks are written straight to a temp file and tracked in a small state file,
+    so an interrupted download resumes with only the missing chunks.
+
+    Args:
+        cache_dir: Directory for cached downloads. Defaults to VSC_DOWNLOAD_CACHE or ~/.cache/tiger-robot/downloads.
+        chunk_size: Size of each ranged request in bytes.
+        max_workers: Number of chunks downloaded at the same time.
+        timeout: Socket timeout in seconds for each request.
+    """
+
+    def __init__(self, cache_dir=None, chunk_size=8 * 1024 * 1024, max_workers=4, timeout=60):
+        self.cache_dir = cache_dir or os.getenv('VSC_DOWNLOAD_CACHE', DEFAULT_CACHE_DIR)
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.session = requests.Session()
+        self._state_lock = threading.Lock()
+
+    def fetch(self, url, sha256=None):
+        """Returns the path of a cached copy of the URL, downloading it if needed.
+
+        Args:
+            url: The URL to download.
+            sha256: Optional expected SHA-256 hex digest of the file.
+
+        Returns:
+            str: Path of the cached file.
+
+        Raises:
+            ValueError: If the downloaded file does not match the expected checksum.
+        """
+        head = self.session.head(url, allow_redirects=True, timeout=self.timeout)
+        head.raise_for_status()
+        final_url = head.url
+        size = int(head.headers.get('Content-Length') or 0) or None
+        validator = head.headers.get('ETag') or f"{size}:{head.headers.get('Last-Modified')}"
+        ranges = head.headers.get('Accept-Ranges', '').lower() == 'bytes' and size is not None
+
+        key = hashlib.sha256(f'{url}\n{validator}'.encode()).hexdigest()
+        cache_path = os.path.join(self.cache_dir, key[:2], key)
+        meta_path = cache_path + '.json'
+
+        if os.path.exists(cache_path) and os.path.exists(meta_path):
+            with open(meta_path) as meta_file:
+                meta = json.load(meta_file)
+            if sha256 is None or meta['sha256'] == sha256:
+                print(f"{tag} Cache hit for {url} 🥬 {cache_path}")
+                return cache_path
+
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        part_path = cache_path + '.part'
+
+        if ranges:
+            self._download_ranges(final_url, part_path, size, validator)
+        else:
+            self._download_stream(final_url, part_path)
+
+        digest = file_sha256(part_path)
+        if sha256 is not None and digest != sha256:
+            os.remove(part_path)
+            raise ValueError(f"Checksum mismatch for {url}: expected {sha256}, got {digest}")
+
+        os.replace(part_path, cache_path)
+        with open(meta_path, 'w') as meta_file:
+            json.dump({'url': url, 'validator': validator, 'size': os.path.getsize(cache_path), 'sha256': digest},
+                      meta_file)
+        print(f"{tag} Downloaded {url} 🥦 {cache_path}")
+        return cache_path
+
+    def _download_ranges(self, url, part_path, size, validator):
+        state_path = part_path + '.json'
+        state = {'validator': validator, 'size': size, 'chunk_size': self.chunk_size, 'done': []}
+        if os.path.exists(state_path) and os.path.exists(part_path):
+            with open(state_path) as state_file:
+                saved = json.load(state_file)
+            if (saved['validator'], saved['size'], saved['chunk_size']) == (validator, size, self.chunk_size):
+                state = saved
+
+        if not os.path.exists(part_path) or not state['done']:
+            with open(part_path, 'wb') as part_file:
+                part_file.truncate(size)
+
+        chunks = [index for index in range((size + self.chunk_size - 1) // self.chunk_size)
+                  if index not in state['done']]
+        if state['done']:
+            print(f"{tag} Resuming download: {len(chunks)} chunks left")
+
+        def download_chunk(index):
+            start = index * self.chunk_size
+            end = min(start + self.chunk_size, size) - 1
+            response = self.session.get(url, headers={'Range': f'bytes={start}-{end}'}, stream=True,
+                                        timeout=self.timeout)
+            response.raise_for_status()
+            if response.status_code != 206:
+                raise IOError(f"Server ignored range request for chunk {index}")
+
+            with open(part_path, 'r+b') as part_file:
+                part_file.seek(start)
+                written = 0
+                for block in response.iter_content(COPY_BUFFER):
+                    part_file.write(block)
+                    written += len(block)
+            if written != end - start + 1:
+                raise IOError(f"Chunk {index} truncated: {written} of {end - start + 1} bytes")
+
+            with self._state_lock:
+                state['done'].append(index)
+                with open(state_path, 'w') as state_file:
+                    json.dump(state, state_file)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for future in [executor.submit(download_chunk, index) for index in chunks]:
+                future.result()
+
+        if os.path.exists(state_path):
+            os.remove(state_path)
+
+    def _download_stream(self, url, part_path):
+        response = self.session.get(url, stream=True, timeout=self.timeout)
+        response.raise_for_status()
+        with open(part_path, 'wb') as part_file:
+            for block in response.iter_content(COPY_BUFFER):
+                part_file.write(block)
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for block in iter(lambda: source.read(COPY_BUFFER), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def extract_archive(archive_path, output_dir):
+    """Extracts a zip or tar archive member by member, keeping memory use flat.
+
+    Args:
+        archive_path: Path of the archive on disk.
+        output_dir: Directory to extract into.
+
+    Returns:
+        bool: True if the file was an archive and was extracted, False otherwise.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    root = os.path.realpath(output_dir)
+
+    if zipfile.is_zipfile(archive_path):
+        with zipfile.ZipFile(archive_path) as archive:
+            for member in archive.infolist():
+                target = os.path.realpath(os.path.join(output_dir, member.filename))
+                if not target.startswith(root + os.sep) and target != root:
+                    raise ValueError(f"Unsafe path in archive: {member.filename}")
+                if member.is_dir():
+                    os.makedirs(target, exist_ok=True)
+                    continue
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with archive.open(member) as source, open(target, 'wb') as destination:
+                    shutil.copyfileobj(source, destination, COPY_BUFFER)
+                mode = member.external_attr >> 16
+                if mode:
+                    os.chmod(target, mode & 0o777)
+        return True
+
+    if tarfile.is_tarfile(archive_path):
+        # Stream mode reads the compressed file sequentially instead of seeking
+        extract_options = {'filter': 'data'} if hasattr(tarfile, 'data_filter') else {}
+        with tarfile.open(archive_path, 'r|*') as archive:
+            for member in archive:
+                target = os.path.realpath(os.path.join(output_dir, member.name))
+                if not target.startswith(root + os.sep) and target != root:
+                    raise ValueError(f"Unsafe path in archive: {member.name}")
+                archive.extract(member, output_dir, **extract_options)
+        return True
+
+    return False
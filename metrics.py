@@ -0,0 +1,53 @@
+import os
+
+from prometheus_client import CONTENT_TYPE_LATEST as CONTENT_TYPE
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, write_to_textfile
+
+# Recon robot metrics, registered on prometheus_client's default registry. The worker's
+# /metrics endpoint serves exposition() and one-shot runs leave write_textfile() behind for
+# the node_exporter textfile collector.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def exposition(registry=REGISTRY):
+    """All metrics in the Prometheus text format."""
+    return generate_latest(registry)
+
+
+def write_textfile(path=None, registry=REGISTRY):
+    """
+    Write the registry for the node_exporter textfile collector.
+
+    Args:
+        path (str): Target file. Defaults to METRICS_TEXTFILE or output/metrics.prom.
+        registry (CollectorRegistry): Registry to write.
+
+    Returns:
+        str: The path written.
+    """
+    path = path or os.getenv('METRICS_TEXTFILE', os.path.join('output', 'metrics.prom'))
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    # write_to_textfile writes next to the final name and renames, so a scrape never reads a partial file
+    write_to_textfile(path, registry)
+    return path
+
+
+BANK_REQUEST_SECONDS = Histogram('recon_bank_request_seconds', 'Latency of bank API requests.', ['bank', 'endpoint'],
+                                 buckets=DEFAULT_BUCKETS)
+BANK_RESPONSES = Counter('recon_bank_responses', 'Bank API responses by status code.', ['bank', 'endpoint', 'status'])
+ROWS_FETCHED = Counter('recon_statement_rows_fetched', 'Statement rows returned by the statement source.',
+                       ['source'])
+ROWS_MATCHED = Counter('recon_rows_matched', 'Statement rows by customer match result.', ['result'])
+UNMATCHED_RATIO = Gauge('recon_unmatched_ratio', 'Share of unmatched rows in the last recon run.')
+ALLOCATIONS = Counter('recon_invoice_allocations', 'Payment allocations to open invoices by method.', ['method'])
+ROWS_INSERTED = Counter('recon_rows_inserted', 'Transactions inserted into fin.batch_transactions.')
+INSERT_ROWS_PER_SECOND = Gauge('recon_insert_rows_per_second', 'Insert throughput of the last batch.')
+LEDGER_POST_SECONDS = Histogram('recon_ledger_post_seconds', 'Latency of general ledger postings.', ['result'],
+                                buckets=DEFAULT_BUCKETS)
+EMAIL_SEND_SECONDS = Histogram('recon_email_send_seconds', 'Latency of recon report emails.', ['result'],
+                               buckets=DEFAULT_BUCKETS)
+RUN_SECONDS = Histogram('recon_run_seconds', 'Duration of recon window runs.', ['status'],
+                        buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600))
+WINDOW_LOCKS = Counter('recon_window_locks', 'Statement window lock attempts by result.', ['result'])
+OUTBOX_DELIVERIES = Counter('recon_outbox_deliveries', 'Outbox messages by delivery attempt result.', ['result'])
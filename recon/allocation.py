@@ -0,0 +1,217 @@
+import numpy as np
+import pandas as pd
+from psycopg2 import extras
+
+OPEN_INVOICES_SQL = """
+    SELECT invoice_id, customer_id, due_date, balance
+    FROM fin.invoices
+    WHERE customer_id = ANY(%s) AND balance > 0
+"""
+
+INSERT_ALLOCATIONS_SQL = """
+    INSERT INTO fin.invoice_allocations (batch_id, entry_id, customer_id, invoice_id, amount, method)
+    VALUES %s
+"""
+
+# Allocations of a batch are summed per invoice first: UPDATE ... FROM applies one row per target.
+# A balance never goes below zero, even if another run settled the invoice in the meantime.
+UPDATE_BALANCES_SQL = """
+    UPDATE fin.invoices AS i
+    SET balance = GREATEST(i.balance - a.amount, 0)
+    FROM (VALUES %s) AS a (invoice_id, amount)
+    WHERE i.invoice_id = a.invoice_id
+"""
+
+INVOICE_COLUMNS = ['invoice_id', 'customer_id', 'due_date', 'balance']
+
+# payment is the index label of the statement row the allocation belongs to
+ALLOCATION_COLUMNS = ['payment', 'customer_id', 'invoice_id', 'amount', 'method']
+
+
+def _cents(values):
+    return (pd.to_numeric(pd.Series(values)).astype(float) * 100).round().astype('int64').to_numpy()
+
+
+def _payments_frame(payments):
+    frame = pd.DataFrame({
+        'order': np.arange(len(payments)),
+        'customer_id': payments['customer_id'].to_numpy(),
+        'cents': _cents(payments['total']),
+    })
+    sort_by = ['customer_id', 'order']
+    if 'bookingDate' in payments:
+        frame['bookingDate'] = payments['bookingDate'].to_numpy()
+        sort_by.insert(1, 'bookingDate')
+    frame = frame[frame['customer_id'].notna() & (frame['cents'] > 0)]
+    return frame.sort_values(sort_by, kind='stable')[['order', 'customer_id', 'cents']]
+
+
+def _invoices_frame(invoices):
+    frame = pd.DataFrame({
+        'invoice_id': invoices['invoice_id'].to_numpy(),
+        'customer_id': invoices['customer_id'].to_numpy(),
+        'due_date': invoices['due_date'].to_numpy(),
+        'cents': _cents(invoices['balance']),
+    })
+    frame = frame[frame['cents'] > 0]
+    return frame.sort_values(['customer_id', 'due_date', 'invoice_id'], kind='stable')
+
+
+def _exact_matches(payments, invoices):
+    """Pair each payment with an open invoice of the same customer and amount, oldest invoice first."""
+    keys = ['customer_id', 'cents']
+    payments = payments.assign(rank=payments.groupby(keys, sort=False).cumcount())
+    invoices = invoices.assign(rank=invoices.groupby(keys, sort=False).cumcount())
+    # The n-th payment of an amount takes the n-th oldest invoice of that amount
+    return payments.merge(invoices[['invoice_id', *keys, 'rank']], on=[*keys, 'rank'])
+
+
+def _with_ranges(frame):
+    end = frame.groupby('customer_id', sort=False)['cents'].cumsum()
+    return frame.assign(start=end - frame['cents'], end=end)
+
+
+def _oldest_first(payments, invoices):
+    """
+    Spread payments over open invoices in due date order, per customer.
+
+    Payments and invoices are laid end to end on one running total per customer, and
+    every stretch of that line belongs to one payment and one invoice. The stretches are
+    found with sort-merge joins (merge_asof) on the running totals, so the cost is one
+    sort of the rows rather than a payment-by-invoice loop.
+    """
+    payments = _with_ranges(payments)
+    invoices = _with_ranges(invoices[invoices['customer_id'].isin(payments['customer_id'])])
+
+    points = pd.concat([frame[['customer_id', bound]].rename(columns={bound: 'point'})
+                        for frame in (payments, invoices) for bound in ('start', 'end')])
+    points = points.drop_duplicates().sort_values(['customer_id', 'point'])
+    points['next'] = points.groupby('customer_id', sort=False)['point'].shift(-1)
+    stretches = points.dropna(subset=['next']).sort_values('point')
+
+    for frame, name in ((payments[['customer_id', 'start', 'end', 'order']], 'payment'),
+                        (invoices[['customer_id', 'start', 'end', 'invoice_id']], 'invoice')):
+        frame = frame.rename(columns={'start': f'{name}_start', 'end': f'{name}_end'})
+        stretches = pd.merge_asof(stretches, frame.sort_values(f'{name}_start'), left_on='point',
+                                  right_on=f'{name}_start', by='customer_id')
+        # Past the customer's last payment or invoice: nothing left to allocate there
+        stretches = stretches[stretches['point'] < stretches[f'{name}_end']]
+
+    stretches = stretches.assign(cents=(stretches['next'] - stretches['point']).astype('int64'))
+    return stretches.groupby(['order', 'customer_id', 'invoice_id'], sort=False, as_index=False)['cents'].sum()
+
+
+def allocate(payments, invoices):
+    """
+    Allocate matched payments to open invoices.
+
+    A payment that equals an open invoice of its customer settles that invoice. What is
+    left is spread over the customer's remaining invoices, oldest due date first, in
+    booking order. Amounts are compared in cents.
+
+    Args:
+        payments (pandas.DataFrame): Matched statement rows with customer_id and total, and optionally
+            bookingDate; the index labels identify the payments.
+        invoices (pandas.DataFrame): Open invoices with INVOICE_COLUMNS.
+
+    Returns:
+        pandas.DataFrame: ALLOCATION_COLUMNS, method 'exact' or 'oldest_first', in payment order.
+    """
+    payment_rows, invoice_rows = _payments_frame(payments), _invoices_frame(invoices)
+
+    exact = _exact_matches(payment_rows, invoice_rows)
+    payment_rows = payment_rows[~payment_rows['order'].isin(exact['order'])]
+    invoice_rows = invoice_rows[~invoice_rows['invoice_id'].isin(exact['invoice_id'])]
+    oldest_first = _oldest_first(payment_rows, invoice_rows)
+
+    allocations = pd.concat([exact[['order', 'customer_id', 'invoice_id', 'cents']].assign(method='exact'),
+                             oldest_first.assign(method='oldest_first')], ignore_index=True)
+    allocations = allocations.sort_values('order', kind='stable')
+    return pd.DataFrame({
+        'payment': payments.index[allocations['order'].to_numpy()],
+        'customer_id': allocations['customer_id'].to_numpy(),
+        'invoice_id': allocations['invoice_id'].to_numpy(),
+        'amount': allocations['cents'].to_numpy() / 100,
+        'method': allocations['method'].to_numpy(),
+    }, columns=ALLOCATION_COLUMNS)
+
+
+def allocated_amounts(payments, allocations):
+    """Amount allocated to each payment, aligned with the payments' index."""
+    return allocations.groupby('payment')['amount'].sum().reindex(payments.index, fill_value=0.0).round(2)
+
+
+class InvoiceAllocator:
+    """Allocates matched statement payments to the customers' open invoices in fin.invoices."""
+
+    def load_open_invoices(self, db_conn, customer_ids):
+        """
+        Read the open invoices of the given customers only.
+
+        Args:
+            db_conn (psycopg2.extensions.connection): The database connection object.
+            customer_ids (Iterable): Matched customer ids.
+
+        Returns:
+            pandas.DataFrame: INVOICE_COLUMNS, balance as float.
+        """
+        customer_ids = sorted({customer_id for customer_id in customer_ids if isinstance(customer_id, str)})
+        rows = []
+        if customer_ids:
+            with db_conn.cursor() as cur:
+                cur.execute(OPEN_INVOICES_SQL, (customer_ids,))
+                rows = cur.fetchall()
+
+        df = pd.DataFrame(rows, columns=INVOICE_COLUMNS)
+        df['balance'] = df['balance'].astype(float)
+        return df
+
+    def allocate(self, db_conn, payments):
+        """
+        Load the open invoices of the paying customers and allocate the payments to them.
+
+        Args:
+            db_conn (psycopg2.extensions.connection): The database connection object.
+            payments (pandas.DataFrame): Matched statement rows, see allocate().
+
+        Returns:
+            pandas.DataFrame: ALLOCATION_COLUMNS.
+        """
+        invoices = self.load_open_invoices(db_conn, payments['customer_id'].unique())
+        return allocate(payments, invoices)
+
+    def apply_batch(self, cur, allocations, batch_df, batch_id):
+        """
+        Record the allocations of a batch's payments and reduce the invoice balances.
+
+        Uses the caller's cursor, so the allocations commit or roll back together with
+        the general ledger posting.
+
+        Args:
+            cur (psycopg2.extensions.cursor): Cursor of the posting transaction.
+            allocations (pandas.DataFrame): Output of allocate() for the run.
+            batch_df (pandas.DataFrame): The posted batch transactions.
+            batch_id (int): The posted batch.
+
+        Returns:
+            int: Number of allocations recorded.
+        """
+        batch_allocations = allocations[allocations['payment'].isin(batch_df.index)]
+        if batch_allocations.empty:
+            return 0
+
+        if 'entryId' in batch_df:
+            entry_ids = batch_df['entryId'].reindex(batch_allocations['payment']).to_numpy()
+        else:
+            entry_ids = [None] * len(batch_allocations)
+        rows = [
+            (batch_id, entry_id, row.customer_id, row.invoice_id, float(row.amount), row.method)
+            for entry_id, row in zip(entry_ids, batch_allocations.itertuples(index=False))
+        ]
+        extras.execute_values(cur, INSERT_ALLOCATIONS_SQL, rows)
+
+        per_invoice = batch_allocations.groupby('invoice_id', sort=False)['amount'].sum().round(2)
+        extras.execute_values(cur, UPDATE_BALANCES_SQL,
+                              [(invoice_id, float(amount)) for invoice_id, amount in per_invoice.items()],
+                              template='(%s, %s::numeric)')
+        return len(rows)
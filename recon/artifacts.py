@@ -0,0 +1,153 @@
+import gzip
+import hashlib
+import os
+import shutil
+import time
+import uuid
+from dataclasses import dataclass
+
+DEFAULT_ARTIFACT_DIR = os.path.join('output', 'artifacts')
+
+
+@dataclass(frozen=True)
+class Artifact:
+    """
+    A stored report file.
+
+    Args:
+        digest (str): sha256 of the original content; the artifact's address in the store.
+        name (str): File name the artifact was generated under, used when it is attached.
+        size (int): Original size in bytes.
+    """
+
+    digest: str
+    name: str
+    size: int
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for block in iter(lambda: source.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ArtifactStore:
+    """
+    Content-addressed, gzip-compressed store for generated reports.
+
+    Layout: <root>/objects/<aa>/<sha256>.gz. A file with the same content as one already
+    stored is not written again, only its last-use time is refreshed. prune() evicts
+    objects by age and then oldest first until the store fits its size budget.
+
+    Args:
+        root (str): Store directory. Defaults to RECON_ARTIFACTS or output/artifacts.
+        max_age_days (float): Objects unused for longer are evicted. Defaults to ARTIFACT_MAX_AGE_DAYS or 30.
+        max_bytes (int): Size budget of the compressed objects. Defaults to ARTIFACT_MAX_MB (500) megabytes.
+    """
+
+    def __init__(self, root=None, max_age_days=None, max_bytes=None):
+        self.root = root or os.getenv('RECON_ARTIFACTS') or DEFAULT_ARTIFACT_DIR
+        self.max_age_days = float(max_age_days if max_age_days is not None
+                                  else os.getenv('ARTIFACT_MAX_AGE_DAYS', '30'))
+        self.max_bytes = int(max_bytes if max_bytes is not None
+                             else float(os.getenv('ARTIFACT_MAX_MB', '500')) * 1024 * 1024)
+
+    def object_path(self, digest):
+        return os.path.join(self.root, 'objects', digest[:2], f'{digest}.gz')
+
+    def put(self, path, remove=True):
+        """
+        Store a generated file.
+
+        Args:
+            path (str): The file to store.
+            remove (bool): Delete the original once it is stored.
+
+        Returns:
+            Artifact: Reference to the stored content.
+        """
+        digest = _file_digest(path)
+        artifact = Artifact(digest, os.path.basename(path), os.path.getsize(path))
+        object_path = self.object_path(digest)
+
+        if os.path.exists(object_path):
+            os.utime(object_path)
+        else:
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            # Compress next to the object and swap it in, so a reader never sees a partial object
+            temp_path = f'{object_path}.{uuid.uuid4().hex}.tmp'
+            with open(path, 'rb') as source, gzip.open(temp_path, 'wb', compresslevel=6) as target:
+                shutil.copyfileobj(source, target, 1 << 20)
+            os.replace(temp_path, object_path)
+
+        if remove:
+            os.remove(path)
+        return artifact
+
+    def exists(self, digest):
+        return os.path.exists(self.object_path(digest))
+
+    def materialize(self, digest, name, directory):
+        """
+        Decompress an artifact to directory/name, e.g. to attach it to an email.
+
+        Returns:
+            str: Path of the decompressed file.
+        """
+        path = os.path.join(directory, os.path.basename(name))
+        with gzip.open(self.object_path(digest), 'rb') as source, open(path, 'wb') as target:
+            shutil.copyfileobj(source, target, 1 << 20)
+        return path
+
+    def _objects(self):
+        objects_dir = os.path.join(self.root, 'objects')
+        if not os.path.isdir(objects_dir):
+            return []
+        objects = []
+        for prefix in os.scandir(objects_dir):
+            if not prefix.is_dir():
+                continue
+            for entry in os.scandir(prefix.path):
+                if entry.name.endswith('.gz'):
+                    stat = entry.stat()
+                    objects.append((stat.st_mtime, stat.st_size, entry.name[:-3], entry.path))
+        return objects
+
+    def size(self):
+        """Total size of the compressed objects in bytes."""
+        return sum(size for _, size, _, _ in self._objects())
+
+    def prune(self, keep=(), now=None):
+        """
+        Apply the retention policy.
+
+        Objects older than max_age_days go first, then the least recently used ones until
+        the store is within max_bytes.
+
+        Args:
+            keep (set): Digests that must stay, e.g. attachments of unsent emails.
+            now (float): Current time as a Unix timestamp; defaults to time.time().
+
+        Returns:
+            dict: Number of objects and bytes removed.
+        """
+        now = time.time() if now is None else now
+        keep = set(keep)
+        objects = sorted(self._objects())
+        total = sum(size for _, size, _, _ in objects)
+        removed = {'objects': 0, 'bytes': 0}
+
+        for used_at, size, digest, path in objects:
+            expired = now - used_at > self.max_age_days * 86400
+            if digest in keep or not (expired or total > self.max_bytes):
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            total -= size
+            removed['objects'] += 1
+            removed['bytes'] += size
+        return removed
@@ -0,0 +1,107 @@
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from psycopg2 import extensions
+
+# Session-level advisory locks, one per account and statement day, under their own
+# namespace: the two-key form never collides with the single-key locks of recon.migrate.
+# Postgres drops them if the holding process dies, so a crashed worker cannot wedge a window.
+TRY_LOCK_SQL = """
+    SELECT pg_try_advisory_lock(hashtext('fin.recon_windows'), hashtext(lock_key))
+    FROM unnest(%s::text[]) WITH ORDINALITY AS keys (lock_key, position)
+    ORDER BY position
+"""
+UNLOCK_SQL = """
+    SELECT pg_advisory_unlock(hashtext('fin.recon_windows'), hashtext(lock_key))
+    FROM unnest(%s::text[]) AS keys (lock_key)
+"""
+
+
+def _as_date(value):
+    return value if isinstance(value, date) else date.fromisoformat(str(value))
+
+
+def window_days(from_date, to_date):
+    """
+    The days of a statement window, both ends included.
+
+    Args:
+        from_date (str or datetime.date): Window start (YYYY-MM-DD).
+        to_date (str or datetime.date): Window end (YYYY-MM-DD).
+
+    Returns:
+        list: datetime.date per day; just from_date when the window is empty.
+    """
+    from_date, to_date = _as_date(from_date), _as_date(to_date)
+    return [from_date + timedelta(days=offset) for offset in range(max((to_date - from_date).days, 0) + 1)]
+
+
+def window_lock_keys(account_number, from_date, to_date):
+    """Advisory lock keys of a window: one per account and day, so overlapping windows share one."""
+    return [f'{account_number}|{day.isoformat()}' for day in window_days(from_date, to_date)]
+
+
+def try_lock_window(db_conn, account_number, from_date, to_date):
+    """
+    Take every day lock of a statement window without waiting.
+
+    All or nothing: when another session holds any of the days, the ones taken are
+    released again. The locks belong to the connection's session, not its
+    transaction, and are committed past straight away.
+
+    Args:
+        db_conn (psycopg2.extensions.connection): The database connection object.
+        account_number (str): The account the window belongs to.
+        from_date (str or datetime.date): Window start (YYYY-MM-DD).
+        to_date (str or datetime.date): Window end (YYYY-MM-DD).
+
+    Returns:
+        list: The lock keys held, to pass to unlock_window, or None when the window is busy.
+    """
+    keys = window_lock_keys(account_number, from_date, to_date)
+    with db_conn.cursor() as cur:
+        cur.execute(TRY_LOCK_SQL, (keys,))
+        taken = [acquired for acquired, in cur.fetchall()]
+    db_conn.commit()
+
+    if all(taken):
+        return keys
+    unlock_window(db_conn, [key for key, acquired in zip(keys, taken) if acquired])
+    return None
+
+
+def unlock_window(db_conn, keys):
+    """
+    Release day locks taken by try_lock_window.
+
+    Unlocking takes effect immediately, so a failed transaction is rolled back first
+    and an open one of the caller's is left open.
+
+    Args:
+        db_conn (psycopg2.extensions.connection): The connection that took the locks.
+        keys (list): Lock keys returned by try_lock_window.
+    """
+    if not keys:
+        return
+    if db_conn.get_transaction_status() == extensions.TRANSACTION_STATUS_INERROR:
+        db_conn.rollback()
+    idle = db_conn.get_transaction_status() == extensions.TRANSACTION_STATUS_IDLE
+    with db_conn.cursor() as cur:
+        cur.execute(UNLOCK_SQL, (keys,))
+    if idle:
+        db_conn.commit()
+
+
+@contextmanager
+def window_lock(db_conn, account_number, from_date, to_date):
+    """
+    Hold a statement window for the length of the block, if no other worker has it.
+
+    Yields:
+        bool: Whether the window was acquired; a busy window is skipped, not waited for.
+    """
+    keys = try_lock_window(db_conn, account_number, from_date, to_date)
+    try:
+        yield keys is not None
+    finally:
+        unlock_window(db_conn, keys)
@@ -0,0 +1,368 @@
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+# Standard library only: the recon module and the replay CLI both import this. The
+# linear-time RE2 engine (google-re2) is used when installed; see _RE2FieldMatcher.
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(__file__), 'rules', 'fnb.json')
+
+ENGINES = ('auto', 're', 're2')
+
+# A one-character lookaround: an escaped class, a bracket class or a plain character
+_LOOKAROUND_CHAR = r'(\\[dDwWsS]|\[\^?[^\]]*\]|[^\\()\[\]|?*+{}.^$])'
+_LEADING_LOOKBEHIND = re.compile(r'^\(\?<([=!])' + _LOOKAROUND_CHAR + r'\)')
+_TRAILING_LOOKAHEAD = re.compile(r'\(\?([=!])' + _LOOKAROUND_CHAR + r'\)$')
+
+
+@dataclass
+class Rule:
+    """
+    One customer-id pattern from a rule file.
+
+    Args:
+        name (str): Rule name, reported by the replay harness.
+        pattern (str): Regular expression. Plain capturing groups only: no named groups or backreferences.
+        priority (int): Lower wins when several rules match the same text.
+        groups (list): Capturing groups joined to form the value; the whole match when empty.
+        fields (list): Row fields the rule applies to; all of the rule set's fields when empty.
+        normalize (dict): 'upper' and/or 'ensure_prefix'; the rule set default when None.
+        ignore_case (bool): Match case-insensitively.
+    """
+
+    name: str
+    pattern: str
+    priority: int
+    groups: list = field(default_factory=lambda: [1])
+    fields: list = field(default_factory=list)
+    normalize: dict = None
+    ignore_case: bool = True
+
+
+class _FieldMatcher:
+    """All rules for one field compiled into a single pattern.
+
+    Each rule becomes an optional lookahead with its own named group, behind a gate that
+    only stops at positions where at least one rule matches, so a search reports every
+    rule that matches at the first such position. Once a rule has matched, the scan
+    continues from the next position with only the higher priority rules, which makes
+    one forward pass over the text however many rules there are. The pattern for each
+    leading slice of the priority list is compiled on first use.
+    """
+
+    def __init__(self, rules):
+        self.rules = sorted(rules, key=lambda rule: rule.priority)
+        self.bodies = [f"(?{'i' if rule.ignore_case else '-i'}:{rule.pattern})" for rule in self.rules]
+        self._patterns = {}
+
+    def _pattern(self, count):
+        """Combined pattern for the first `count` rules, with the group number of each rule."""
+        if count not in self._patterns:
+            bodies = self.bodies[:count]
+            gate = '(?=' + '|'.join(bodies) + ')'
+            captures = ''.join(f'(?:(?=(?P<r{index}>{body})))?' for index, body in enumerate(bodies))
+            regex = re.compile(gate + captures)
+            self._patterns[count] = regex, [regex.groupindex[f'r{index}'] for index in range(count)]
+        return self._patterns[count]
+
+    def search(self, text):
+        best_rank, best_match, best_base, position = len(self.rules), None, None, 0
+        while best_rank:
+            regex, group_base = self._pattern(best_rank)
+            match = regex.search(text, position)
+            if match is None:
+                break
+            best_rank = next(rank for rank, base in enumerate(group_base) if match.start(base) != -1)
+            best_match, best_base = match, group_base[best_rank]
+            position = match.start() + 1
+
+        if best_match is None:
+            return None, None
+        rule = self.rules[best_rank]
+        if rule.groups:
+            value = ''.join(best_match.group(best_base + group) or '' for group in rule.groups)
+        else:
+            value = best_match.group(best_base)
+        return rule, value
+
+
+def _negated(char_class):
+    """The one-character class matching what char_class does not: \\d -> \\D, [ab] -> [^ab], x -> [^x]."""
+    if char_class.startswith('\\'):
+        return '\\' + char_class[1].swapcase()
+    if char_class.startswith('[^'):
+        return '[' + char_class[2:]
+    if char_class.startswith('['):
+        return '[^' + char_class[1:]
+    return f'[^{char_class}]'
+
+
+def _re2_pattern(rule):
+    """
+    The rule as an RE2 pattern, with the whole original match as group 1, or None.
+
+    RE2 has no lookarounds. A one-character lookbehind at the start or lookahead at the
+    end of a pattern is rewritten to consume that character instead, e.g. (?<!\\d)X
+    becomes (?:^|\\D)(X); the match of X, and so every group, is the same. Any other
+    lookaround is left alone and the rule fails to compile under RE2.
+    """
+    pattern, prefix, suffix = rule.pattern, '', ''
+    leading = _LEADING_LOOKBEHIND.match(pattern)
+    if leading:
+        sign, char_class = leading.groups()
+        prefix = f'(?:{char_class})' if sign == '=' else f'(?:^|{_negated(char_class)})'
+        pattern = pattern[leading.end():]
+    trailing = _TRAILING_LOOKAHEAD.search(pattern)
+    if trailing:
+        sign, char_class = trailing.groups()
+        suffix = f'(?:{char_class})' if sign == '=' else f'(?:$|{_negated(char_class)})'
+        pattern = pattern[:trailing.start()]
+    flags = 'i' if rule.ignore_case else '-i'
+    return f'(?{flags}:{prefix}({pattern}){suffix})'
+
+
+class _RE2FieldMatcher:
+    """All rules for one field on RE2, which matches in time linear in the text length.
+
+    One RE2 set pass finds which rules match anywhere in the text, then only the winning
+    rule is searched again for its groups. Rules RE2 cannot express (lookarounds other
+    than the ones _re2_pattern rewrites, backreferences) keep the stdlib engine and are
+    searched in priority order as before. Same results as _FieldMatcher: the highest
+    priority rule that matches, at its leftmost match.
+    """
+
+    def __init__(self, rules, re2):
+        self.rules = sorted(rules, key=lambda rule: rule.priority)
+        self.regexes = []
+        self.fallback_rules = []
+        self._set = re2.Set.SearchSet()
+        self._set_ranks = []
+        for rank, rule in enumerate(self.rules):
+            try:
+                pattern = _re2_pattern(rule)
+                regex, offset = re2.compile(pattern), 1
+                self._set.Add(pattern)
+                self._set_ranks.append(rank)
+            except re2.error:
+                flags = re.IGNORECASE if rule.ignore_case else 0
+                regex, offset = re.compile(rule.pattern, flags), 0
+                self.fallback_rules.append(rule.name)
+            self.regexes.append((regex, offset, bool(offset)))
+        if self._set_ranks:
+            self._set.Compile()
+
+    def search(self, text):
+        matched = {self._set_ranks[index] for index in self._set.Match(text) or ()} if self._set_ranks else set()
+        for rank, (regex, offset, in_set) in enumerate(self.regexes):
+            if in_set and rank not in matched:
+                continue
+            match = regex.search(text)
+            if match is None:
+                continue
+            rule = self.rules[rank]
+            if rule.groups:
+                return rule, ''.join(match.group(offset + group) or '' for group in rule.groups)
+            return rule, match.group(offset)
+        return None, None
+
+
+def _load_re2(engine):
+    if engine == 're':
+        return None
+    try:
+        import re2
+    except ImportError:
+        if engine == 're2':
+            raise ValueError("Regex engine 're2' needs the google-re2 package")
+        return None
+    return re2
+
+
+class RuleSet:
+    """
+    Customer-id extraction rules for one bank, compiled to one matcher per field.
+
+    Args:
+        rules (list): Rule objects.
+        fields (list): Row fields to search, in order; the first field with a match wins.
+        normalize (dict): Default normalization for rules that do not set their own.
+        name (str): Rule set name.
+        engine (str): 're2' (linear time, needs google-re2), 're' (stdlib), or 'auto' for re2 when installed.
+        max_scan (int): Characters of a field that are searched; longer text is cut, which bounds the
+            time a malformed row can take on either engine. None searches all of it.
+    """
+
+    def __init__(self, rules, fields, normalize=None, name=None, engine='auto', max_scan=None):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown regex engine '{engine}', expected one of {ENGINES}")
+        self.name = name
+        self.fields = list(fields)
+        self.normalize = normalize or {}
+        self.rules = rules
+        self.max_scan = max_scan
+        for rule in rules:
+            _validate(rule)
+        re2 = _load_re2(engine)
+        self.engine = 're2' if re2 is not None else 're'
+        self._matchers = {}
+        for field_name in self.fields:
+            field_rules = [rule for rule in rules if not rule.fields or field_name in rule.fields]
+            if field_rules:
+                self._matchers[field_name] = (_RE2FieldMatcher(field_rules, re2) if re2 is not None
+                                              else _FieldMatcher(field_rules))
+
+    def match(self, text, field_name=None):
+        """
+        Find the winning rule for one piece of text.
+
+        Args:
+            text (str): Remittance info, reference or similar.
+            field_name (str): Field the text came from; defaults to the first field.
+
+        Returns:
+            tuple: (Rule, normalized value), or (None, None) when no rule matches.
+        """
+        matcher = self._matchers.get(field_name or self.fields[0])
+        if not text or matcher is None:
+            return None, None
+        if self.max_scan is not None:
+            text = text[:self.max_scan]
+        rule, value = matcher.search(text)
+        if rule is None:
+            return None, None
+        return rule, self._normalize(rule, value)
+
+    def extract(self, text, field_name=None):
+        return self.match(text, field_name)[1]
+
+    def extract_row(self, row):
+        """
+        Customer id from the first field of the row that has a match.
+
+        Args:
+            row (Mapping): A statement row, e.g. a pandas Series or dict.
+
+        Returns:
+            str: The customer id, or None.
+        """
+        for field_name in self.fields:
+            value = self.extract(row.get(field_name), field_name)
+            if value:
+                return value
+        return None
+
+    def _normalize(self, rule, value):
+        options = self.normalize if rule.normalize is None else rule.normalize
+        if options.get('upper'):
+            value = value.upper()
+        prefix = options.get('ensure_prefix')
+        if prefix and not value.startswith(prefix):
+            value = prefix + value
+        return value
+
+
+def _validate(rule):
+    try:
+        compiled = re.compile(rule.pattern)
+    except re.error as e:
+        raise ValueError(f"Rule '{rule.name}' has an invalid pattern: {e}") from e
+    if compiled.groupindex:
+        raise ValueError(f"Rule '{rule.name}' uses named groups, which are reserved for the combined matcher")
+    if any(group < 1 or group > compiled.groups for group in rule.groups):
+        raise ValueError(f"Rule '{rule.name}' selects groups {rule.groups} but its pattern has {compiled.groups}")
+
+
+def rules_from_dict(spec, engine='auto'):
+    """Build a RuleSet from a parsed rule file."""
+    rules = [Rule(**rule) for rule in spec['rules']]
+    return RuleSet(rules, spec['fields'], normalize=spec.get('normalize'), name=spec.get('name'),
+                   engine=engine, max_scan=spec.get('max_scan'))
+
+
+def load_rules(path=DEFAULT_RULES_PATH, engine=None):
+    """
+    Load and compile a JSON rule file. Compiled rule sets are cached per path and engine.
+
+    Args:
+        path (str): Path of the rule file.
+        engine (str): Regex engine, see RuleSet; defaults to RECON_REGEX_ENGINE or 'auto'.
+
+    Returns:
+        RuleSet: The compiled rules.
+    """
+    return _load_rules(path, engine or os.getenv('RECON_REGEX_ENGINE', 'auto'))
+
+
+@lru_cache(maxsize=None)
+def _load_rules(path, engine):
+    with open(path) as rules_file:
+        return rules_from_dict(json.load(rules_file), engine)
+
+
+def _read_replay_rows(path, fields):
+    """Rows from an FNB statement ({'entry': [...]}), a CSV with the field columns, or plain text lines."""
+    if path.endswith('.json'):
+        with open(path) as source:
+            entries = json.load(source)['entry']
+        for entry in entries:
+            details = entry.get('entryDetails', {}).get('transactionDetails', {})
+            yield {
+                'remittanceInfo': details.get('remittanceInfo', {}).get('unstructured'),
+                'reference': details.get('reference', {}).get('endToEndId'),
+            }
+    elif path.endswith('.csv'):
+        with open(path, newline='') as source:
+            yield from csv.DictReader(source)
+    else:
+        with open(path) as source:
+            for line in source:
+                yield {fields[0]: line.rstrip('\n')}
+
+
+def replay(rule_set, rows):
+    """
+    Run the rules over historical rows.
+
+    Returns:
+        dict: 'rows', 'matched', 'seconds' and per-rule 'hits'.
+    """
+    hits = Counter()
+    total = 0
+    start_time = time.perf_counter()
+    for row in rows:
+        total += 1
+        for field_name in rule_set.fields:
+            rule, value = rule_set.match(row.get(field_name), field_name)
+            if value:
+                hits[f'{field_name}:{rule.name}'] += 1
+                break
+        else:
+            hits['unmatched'] += 1
+    return {
+        'rows': total,
+        'matched': total - hits['unmatched'],
+        'seconds': round(time.perf_counter() - start_time, 4),
+        'hits': dict(hits.most_common()),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay remittance text through the customer id rules.')
+    parser.add_argument('path', help='statement .json, .csv with remittanceInfo/reference columns, or text lines')
+    parser.add_argument('--rules', default=os.getenv('RECON_RULES', DEFAULT_RULES_PATH))
+    parser.add_argument('--engine', choices=ENGINES, help='regex engine (default: RECON_REGEX_ENGINE or auto)')
+    args = parser.parse_args(argv)
+
+    rule_set = load_rules(args.rules, args.engine)
+    print(json.dumps(replay(rule_set, _read_replay_rows(args.path, rule_set.fields)), indent=2))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
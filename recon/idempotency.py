@@ -0,0 +1,162 @@
+import hashlib
+import uuid
+
+import psycopg2
+from psycopg2 import extras
+
+# Fields of a normalized statement row that identify the transaction. discount/total
+# are recon outputs and customer_id/payment_terms are added later, so they are left out.
+HASH_COLUMNS = ['entryId', 'bookingDate', 'valueDate', 'remittanceInfo', 'reference',
+                'amount', 'currency', 'creditDebitIndicator']
+
+STARTED = 'started'
+COMPLETED = 'completed'
+# Finished, but some rows were not posted; the window is reconciled again on the next run
+PARTIAL = 'partial'
+
+
+def window_key(account_number, from_date, to_date):
+    return f'{account_number}|{from_date}|{to_date}'
+
+
+def row_hashes(df):
+    """
+    Hash every normalized statement row.
+
+    Args:
+        df (pandas.DataFrame): Normalized transactions as returned by get_transaction_history.
+
+    Returns:
+        list: Hex digests, one per row, in frame order.
+    """
+    columns = [
+        df[column].map('{:.2f}'.format) if column == 'amount' else df[column].astype(str)
+        for column in HASH_COLUMNS
+    ]
+    return [
+        hashlib.sha256('\x1f'.join(values).encode()).hexdigest()
+        for values in zip(*columns)
+    ]
+
+
+def statement_hash(hashes):
+    """Order-independent hash of a statement window from its row hashes."""
+    digest = hashlib.sha256()
+    for row_hash in sorted(hashes):
+        digest.update(row_hash.encode())
+    return digest.hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Tracks statement windows and posted transaction rows so retries and reruns are cheap.
+
+    A window keeps one X-Idempotency-ID until it completes, so retried fetches of the
+    same window present the same key to the bank. Once completed, a rerun whose content
+    hash matches is skipped, and otherwise only rows not posted before go to recon.
+    """
+
+    def __init__(self, db_conn):
+        self.db_conn = db_conn
+
+    def begin_window(self, account_number, from_date, to_date):
+        """
+        Register a fetch of a statement window and return its idempotency ID.
+
+        Args:
+            account_number (str): Bank account number.
+            from_date (str): Window start (YYYY-MM-DD).
+            to_date (str): Window end (YYYY-MM-DD).
+
+        Returns:
+            str: The stored ID while the window is unfinished, or a new one for a rerun of a finished window.
+        """
+        key = window_key(account_number, from_date, to_date)
+        with self.db_conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO fin.recon_windows (window_key, account_number, from_date, to_date, idempotency_id)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (window_key) DO UPDATE SET
+                    idempotency_id = CASE WHEN fin.recon_windows.status IN (%s, %s)
+                                          THEN EXCLUDED.idempotency_id
+                                          ELSE fin.recon_windows.idempotency_id END,
+                    status = %s,
+                    started_at = now()
+                RETURNING idempotency_id
+                """,
+                (key, account_number, from_date, to_date, str(uuid.uuid4()), COMPLETED, PARTIAL, STARTED),
+            )
+            idempotency_id = cur.fetchone()[0]
+        self.db_conn.commit()
+        return str(idempotency_id)
+
+    def is_completed(self, account_number, from_date, to_date, content_hash):
+        """True when this exact window content has already been reconciled (content_hash is only set on completion)."""
+        with self.db_conn.cursor() as cur:
+            cur.execute(
+                "SELECT 1 FROM fin.recon_windows WHERE window_key = %s AND content_hash = %s",
+                (window_key(account_number, from_date, to_date), content_hash),
+            )
+            return cur.fetchone() is not None
+
+    def mark_unchanged(self, account_number, from_date, to_date):
+        """Close a rerun whose content matched the last completed run, without touching its row records."""
+        with self.db_conn.cursor() as cur:
+            cur.execute(
+                "UPDATE fin.recon_windows SET status = %s, completed_at = now() WHERE window_key = %s",
+                (COMPLETED, window_key(account_number, from_date, to_date)),
+            )
+        self.db_conn.commit()
+
+    def new_rows_mask(self, hashes):
+        """
+        Flag the rows that have not been posted in any earlier run.
+
+        Args:
+            hashes (list): Row hashes from row_hashes.
+
+        Returns:
+            list: Booleans, True for rows that still need recon.
+        """
+        with self.db_conn.cursor() as cur:
+            cur.execute("SELECT row_hash FROM fin.recon_transaction_hashes WHERE row_hash = ANY(%s)", (list(hashes),))
+            seen = {row[0] for row in cur.fetchall()}
+        return [row_hash not in seen for row_hash in hashes]
+
+    def complete_window(self, account_number, from_date, to_date, content_hash, df, hashes):
+        """
+        Record the posted rows and mark the window finished in one transaction.
+
+        Args:
+            account_number (str): Bank account number.
+            from_date (str): Window start (YYYY-MM-DD).
+            to_date (str): Window end (YYYY-MM-DD).
+            content_hash (str): statement_hash of the full window, or None when some of its rows
+                were not posted; the window is then marked partial and not skipped on reruns.
+            df (pandas.DataFrame): The rows that were posted.
+            hashes (list): Row hashes of df, in frame order.
+        """
+        key = window_key(account_number, from_date, to_date)
+        try:
+            with self.db_conn.cursor() as cur:
+                extras.execute_values(
+                    cur,
+                    """
+                    INSERT INTO fin.recon_transaction_hashes (row_hash, window_key, entry_id)
+                    VALUES %s ON CONFLICT (row_hash) DO NOTHING
+                    """,
+                    [(row_hash, key, entry_id) for row_hash, entry_id in zip(hashes, df['entryId'].astype(str))],
+                )
+                cur.execute(
+                    """
+                    UPDATE fin.recon_windows
+                    SET status = %s, content_hash = %s, row_count = %s, completed_at = now()
+                    WHERE window_key = %s
+                    """,
+                    (COMPLETED if content_hash else PARTIAL, content_hash, len(hashes), key),
+                )
+            self.db_conn.commit()
+        except (Exception, psycopg2.Error) as error:
+            print(f"Error completing recon window {key}: {error}")
+            self.db_conn.rollback()
@@ -0,0 +1,177 @@
+import argparse
+import hashlib
+import os
+import sys
+from dataclasses import dataclass
+from datetime import date
+
+import psycopg2
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), 'migrations')
+
+MIGRATIONS_DDL = """
+    CREATE SCHEMA IF NOT EXISTS fin;
+    CREATE TABLE IF NOT EXISTS fin.schema_migrations (
+        version     TEXT PRIMARY KEY,
+        name        TEXT NOT NULL,
+        checksum    TEXT NOT NULL,
+        applied_at  TIMESTAMP NOT NULL DEFAULT now()
+    );
+"""
+
+# Taken for the length of each migration's transaction, so a worker and a one-shot
+# run starting together apply every migration once
+MIGRATION_LOCK_SQL = "SELECT pg_advisory_xact_lock(hashtext('fin.schema_migrations'))"
+
+# Months of batch_transactions partitions kept ready past the newest booking date
+PARTITION_MONTHS_AHEAD = 3
+
+
+@dataclass(frozen=True)
+class Migration:
+    """
+    One SQL file in the migrations directory, named <version>_<name>.sql.
+
+    Args:
+        version (str): Sortable prefix of the file name, e.g. '0002'.
+        name (str): Rest of the file name.
+        sql (str): File contents, run as one transaction.
+    """
+
+    version: str
+    name: str
+    sql: str
+
+    @property
+    def checksum(self):
+        return hashlib.sha256(self.sql.encode()).hexdigest()
+
+
+def available_migrations(directory=MIGRATIONS_DIR):
+    """Migration files in the directory, in version order."""
+    migrations = []
+    for file_name in sorted(os.listdir(directory)):
+        if not file_name.endswith('.sql'):
+            continue
+        version, _, name = file_name[:-len('.sql')].partition('_')
+        with open(os.path.join(directory, file_name)) as sql_file:
+            migrations.append(Migration(version, name, sql_file.read()))
+    return migrations
+
+
+def applied_migrations(db_conn):
+    """
+    Versions already applied to the database.
+
+    Returns:
+        dict: version -> checksum of the file when it was applied.
+    """
+    with db_conn.cursor() as cur:
+        cur.execute(MIGRATIONS_DDL)
+        cur.execute("SELECT version, checksum FROM fin.schema_migrations")
+        applied = dict(cur.fetchall())
+    db_conn.commit()
+    return applied
+
+
+def migrate(db_conn, directory=MIGRATIONS_DIR):
+    """
+    Apply the migrations the database does not have yet, each in its own transaction.
+
+    Args:
+        db_conn (psycopg2.extensions.connection): The database connection object.
+        directory (str): Directory with the migration files.
+
+    Returns:
+        list: Versions applied by this call.
+
+    Raises:
+        ValueError: An applied migration's file was changed afterwards.
+    """
+    migrations = available_migrations(directory)
+    applied = applied_migrations(db_conn)
+    for migration in migrations:
+        if migration.version in applied and applied[migration.version] != migration.checksum:
+            raise ValueError(f"Migration {migration.version}_{migration.name} was changed after it was applied")
+
+    newly_applied = []
+    for migration in migrations:
+        if migration.version in applied:
+            continue
+        try:
+            with db_conn.cursor() as cur:
+                cur.execute(MIGRATION_LOCK_SQL)
+                # Another process may have applied it while this one waited for the lock
+                cur.execute("SELECT 1 FROM fin.schema_migrations WHERE version = %s", (migration.version,))
+                if cur.fetchone() is None:
+                    cur.execute(migration.sql)
+                    cur.execute("INSERT INTO fin.schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                                (migration.version, migration.name, migration.checksum))
+                    newly_applied.append(migration.version)
+            db_conn.commit()
+        except (Exception, psycopg2.Error):
+            db_conn.rollback()
+            raise
+        print(f"Applied migration {migration.version}_{migration.name}.")
+    return newly_applied
+
+
+def ensure_partitions(db_conn, from_date=None, to_date=None, months_ahead=PARTITION_MONTHS_AHEAD):
+    """
+    Create any missing monthly fin.batch_transactions partitions for a date range.
+
+    Args:
+        db_conn (psycopg2.extensions.connection): The database connection object.
+        from_date (datetime.date): First booking date that needs a partition; defaults to today.
+        to_date (datetime.date): Last booking date; partitions are made up to months_ahead past it.
+        months_ahead (int): Months of partitions kept ready ahead of to_date.
+
+    Returns:
+        int: Partitions created, or None when they could not be created.
+    """
+    from_date = from_date or date.today()
+    to_date = max(to_date or from_date, date.today())
+    try:
+        with db_conn.cursor() as cur:
+            cur.execute("SELECT fin.ensure_batch_transactions_partitions(%s, (%s + make_interval(months => %s))::date)",
+                        (from_date, to_date, months_ahead))
+            created = cur.fetchone()[0]
+        db_conn.commit()
+        return created
+    except (Exception, psycopg2.Error) as error:
+        print(f"Error creating batch_transactions partitions: {error}")
+        db_conn.rollback()
+        return None
+
+
+def main(argv=None):
+    from dotenv import load_dotenv
+
+    from recon.pipeline import db_config_from_env
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description='Apply the recon database migrations.')
+    parser.add_argument('--status', action='store_true', help='list the migrations and whether they are applied')
+    parser.add_argument('--months-ahead', type=int, default=PARTITION_MONTHS_AHEAD,
+                        help='months of future batch_transactions partitions to create')
+    args = parser.parse_args(argv)
+
+    db_conn = psycopg2.connect(**db_config_from_env())
+    try:
+        if args.status:
+            applied = applied_migrations(db_conn)
+            for migration in available_migrations():
+                state = 'applied' if migration.version in applied else 'pending'
+                print(f"{migration.version}_{migration.name}: {state}")
+            return
+
+        migrate(db_conn)
+        created = ensure_partitions(db_conn, months_ahead=args.months_ahead)
+        print(f"Database is up to date; {created or 0} new partitions.")
+    finally:
+        db_conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
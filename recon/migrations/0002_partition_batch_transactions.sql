@@ -0,0 +1,120 @@
+-- fin.batch_transactions as monthly range partitions on booking_date.
+--
+-- Inserts only touch the current month's partition and its indexes, and lookups by
+-- date prune to the months they ask for, so both stay flat as history piles up. Old
+-- months can be detached or archived whole. entry_id keeps the bank's own entry
+-- identifier, which repeats across statement windows while the serial id does not.
+
+-- Creates the monthly partitions covering from_date .. to_date that do not exist yet
+-- and returns how many it created. Rows that went to the default partition before
+-- their month existed are moved into the new partition. The partition is built
+-- detached and then attached, which takes a lighter lock on fin.batch_transactions
+-- than CREATE TABLE ... PARTITION OF, so concurrent inserts are not blocked.
+CREATE OR REPLACE FUNCTION fin.ensure_batch_transactions_partitions(from_date DATE, to_date DATE)
+RETURNS INTEGER LANGUAGE plpgsql AS $$
+DECLARE
+    month_start DATE := date_trunc('month', from_date)::date;
+    month_end DATE;
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    -- Serializes concurrent callers; released at the end of their transaction
+    PERFORM pg_advisory_xact_lock(hashtext('fin.ensure_batch_transactions_partitions'));
+    WHILE month_start <= to_date LOOP
+        month_end := (month_start + INTERVAL '1 month')::date;
+        partition_name := 'batch_transactions_' || to_char(month_start, 'YYYY_MM');
+        IF to_regclass('fin.' || quote_ident(partition_name)) IS NULL THEN
+            EXECUTE format('CREATE TABLE fin.%I (LIKE fin.batch_transactions INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+                           partition_name);
+            EXECUTE format('WITH moved AS (DELETE FROM fin.batch_transactions_default
+                                           WHERE booking_date >= %L AND booking_date < %L RETURNING *)
+                            INSERT INTO fin.%I SELECT * FROM moved', month_start, month_end, partition_name);
+            EXECUTE format('ALTER TABLE fin.batch_transactions ATTACH PARTITION fin.%I FOR VALUES FROM (%L) TO (%L)',
+                           partition_name, month_start, month_end);
+            created := created + 1;
+        END IF;
+        month_start := month_end;
+    END LOOP;
+    RETURN created;
+END $$;
+
+-- The table is rebuilt from the one the database has, so columns added there outside
+-- these migrations are carried over. Stop before touching it if it lacks the columns
+-- the partitioning and indexes below rely on.
+DO $$
+DECLARE
+    missing TEXT;
+BEGIN
+    SELECT string_agg(required.name, ', ') INTO missing
+    FROM unnest(ARRAY['id', 'booking_date', 'value_date', 'reference', 'batch_id']) AS required(name)
+    WHERE NOT EXISTS (SELECT 1 FROM pg_attribute
+                      WHERE attrelid = 'fin.batch_transactions'::regclass
+                        AND attname = required.name AND NOT attisdropped);
+    IF missing IS NOT NULL THEN
+        RAISE EXCEPTION 'fin.batch_transactions has no % column(s); not partitioning it', missing;
+    END IF;
+END $$;
+
+-- Kept under this name after the copy, for checking it before it is dropped by hand
+ALTER TABLE fin.batch_transactions RENAME TO batch_transactions_unpartitioned;
+
+-- Same columns, defaults and checks as the old table. Not INCLUDING ALL: its primary key
+-- and unique indexes would have to include booking_date on a partitioned table.
+CREATE TABLE fin.batch_transactions (
+    LIKE fin.batch_transactions_unpartitioned
+    INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING GENERATED INCLUDING STORAGE INCLUDING COMMENTS
+) PARTITION BY RANGE (booking_date);
+
+ALTER TABLE fin.batch_transactions ADD COLUMN IF NOT EXISTS entry_id TEXT;
+
+-- Foreign keys are not copied by LIKE
+DO $$
+DECLARE
+    foreign_key RECORD;
+BEGIN
+    FOR foreign_key IN SELECT pg_get_constraintdef(oid) AS definition FROM pg_constraint
+                       WHERE conrelid = 'fin.batch_transactions_unpartitioned'::regclass AND contype = 'f' LOOP
+        EXECUTE 'ALTER TABLE fin.batch_transactions ADD ' || foreign_key.definition;
+    END LOOP;
+END $$;
+
+-- ids continue from the serial of the old table; the sequence moves to the new table so
+-- dropping the old one later keeps it
+CREATE SEQUENCE IF NOT EXISTS fin.batch_transactions_id_seq;
+ALTER TABLE fin.batch_transactions ALTER COLUMN id SET DEFAULT nextval('fin.batch_transactions_id_seq');
+ALTER SEQUENCE fin.batch_transactions_id_seq OWNED BY fin.batch_transactions.id;
+
+-- Rows without a booking date, or for a month that has no partition yet
+CREATE TABLE fin.batch_transactions_default PARTITION OF fin.batch_transactions DEFAULT;
+
+SELECT fin.ensure_batch_transactions_partitions(
+    LEAST((SELECT min(booking_date) FROM fin.batch_transactions_unpartitioned), current_date),
+    (current_date + INTERVAL '3 months')::date);
+
+-- Every stored column of the old table, whatever it has
+DO $$
+DECLARE
+    columns TEXT;
+BEGIN
+    SELECT string_agg(quote_ident(attname), ', ' ORDER BY attnum) INTO columns FROM pg_attribute
+    WHERE attrelid = 'fin.batch_transactions_unpartitioned'::regclass
+      AND attnum > 0 AND NOT attisdropped AND attgenerated = '';
+    EXECUTE format('INSERT INTO fin.batch_transactions (%s) SELECT %s FROM fin.batch_transactions_unpartitioned',
+                   columns, columns);
+END $$;
+
+SELECT setval('fin.batch_transactions_id_seq', COALESCE(max(id), 1), max(id) IS NOT NULL) FROM fin.batch_transactions;
+
+-- Built after the copy, and created on every partition, including ones attached later.
+-- batch_id and value_date grow with insertion order, so a BRIN index, a few pages per
+-- partition, narrows them down as well as a B-tree would. Page ranges filled after the
+-- index was built match every query until they are summarized; autosummarize has
+-- autovacuum do that as each range fills. Customer and entry lookups are point
+-- queries and get B-trees.
+CREATE INDEX batch_transactions_id_idx ON fin.batch_transactions (id);
+CREATE INDEX batch_transactions_batch_id_brin ON fin.batch_transactions
+    USING brin (batch_id) WITH (pages_per_range = 32, autosummarize = on);
+CREATE INDEX batch_transactions_value_date_brin ON fin.batch_transactions
+    USING brin (value_date) WITH (autosummarize = on);
+CREATE INDEX batch_transactions_reference_idx ON fin.batch_transactions (reference, booking_date);
+CREATE INDEX batch_transactions_entry_id_idx ON fin.batch_transactions (entry_id);
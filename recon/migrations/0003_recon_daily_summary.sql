@@ -0,0 +1,21 @@
+-- Daily rollups of posted recon batches, one row per booking day, branch, payment term
+-- and customer. RECON.post_to_general_ledger adds each batch in the posting transaction.
+-- Databases that ran the robot before this migration already have the table.
+
+CREATE TABLE IF NOT EXISTS fin.recon_daily_summary (
+    summary_date        DATE NOT NULL,
+    branch_code         TEXT NOT NULL,
+    payment_terms       TEXT NOT NULL,
+    customer_id         TEXT NOT NULL,
+    transaction_count   INTEGER NOT NULL DEFAULT 0,
+    sub_total           NUMERIC(14, 2) NOT NULL DEFAULT 0,
+    discount            NUMERIC(14, 2) NOT NULL DEFAULT 0,
+    total               NUMERIC(14, 2) NOT NULL DEFAULT 0,
+    last_batch_id       INTEGER,
+    updated_at          TIMESTAMP NOT NULL DEFAULT now(),
+    PRIMARY KEY (summary_date, branch_code, payment_terms, customer_id)
+);
+CREATE INDEX IF NOT EXISTS recon_daily_summary_customer_idx
+    ON fin.recon_daily_summary (customer_id, summary_date);
+CREATE INDEX IF NOT EXISTS recon_daily_summary_terms_idx
+    ON fin.recon_daily_summary (payment_terms, summary_date);
@@ -0,0 +1,26 @@
+-- Statement windows and the hashes of the statement rows posted from them, used by
+-- recon/idempotency.py to keep one idempotency ID per window and to skip rows and
+-- windows that were reconciled before. Databases that ran the robot before this
+-- migration already have the tables.
+
+CREATE TABLE IF NOT EXISTS fin.recon_windows (
+    window_key      TEXT PRIMARY KEY,
+    account_number  TEXT NOT NULL,
+    from_date       DATE NOT NULL,
+    to_date         DATE NOT NULL,
+    idempotency_id  UUID NOT NULL,
+    content_hash    TEXT,
+    status          TEXT NOT NULL DEFAULT 'started',
+    row_count       INTEGER,
+    started_at      TIMESTAMP NOT NULL DEFAULT now(),
+    completed_at    TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS fin.recon_transaction_hashes (
+    row_hash        TEXT PRIMARY KEY,
+    window_key      TEXT NOT NULL,
+    entry_id        TEXT,
+    recorded_at     TIMESTAMP NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS recon_transaction_hashes_window_idx
+    ON fin.recon_transaction_hashes (window_key);
@@ -0,0 +1,18 @@
+-- Payments allocated to open invoices by recon/allocation.py, written in the same
+-- transaction as the general ledger posting. Databases that ran the robot before this
+-- migration already have the table.
+
+CREATE TABLE IF NOT EXISTS fin.invoice_allocations (
+    allocation_id   BIGSERIAL PRIMARY KEY,
+    batch_id        INTEGER REFERENCES fin.batch (batch_id),
+    entry_id        TEXT,
+    customer_id     TEXT NOT NULL,
+    invoice_id      TEXT NOT NULL,
+    amount          NUMERIC(14, 2) NOT NULL,
+    method          TEXT NOT NULL,
+    allocated_at    TIMESTAMP NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS invoice_allocations_invoice_idx
+    ON fin.invoice_allocations (invoice_id);
+CREATE INDEX IF NOT EXISTS invoice_allocations_batch_idx
+    ON fin.invoice_allocations (batch_id);
@@ -0,0 +1,14 @@
+-- Customer invoices that recon/allocation.py settles payments against: it reads the
+-- open ones (balance > 0) of the matched customers and lowers their balances when a
+-- batch is posted. Databases fed by the ERP already have the table.
+
+CREATE TABLE IF NOT EXISTS fin.invoices (
+    invoice_id      TEXT PRIMARY KEY,
+    customer_id     TEXT NOT NULL,
+    invoice_date    DATE,
+    due_date        DATE,
+    amount          NUMERIC(14, 2),
+    balance         NUMERIC(14, 2)
+);
+CREATE INDEX IF NOT EXISTS invoices_open_customer_idx
+    ON fin.invoices (customer_id, due_date) WHERE balance > 0;
@@ -0,0 +1,313 @@
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import time
+from contextlib import closing
+from html import escape
+
+from metrics import OUTBOX_DELIVERIES
+
+OUTBOX_DDL = """
+    CREATE TABLE IF NOT EXISTS outbox_messages (
+        message_id      INTEGER PRIMARY KEY AUTOINCREMENT,
+        recipients_key  TEXT NOT NULL,
+        recipients      TEXT NOT NULL,
+        thread          TEXT NOT NULL DEFAULT '',
+        subject         TEXT NOT NULL,
+        body            TEXT NOT NULL,
+        attachments     TEXT NOT NULL,
+        status          TEXT NOT NULL DEFAULT 'pending',
+        attempts        INTEGER NOT NULL DEFAULT 0,
+        next_attempt_at REAL NOT NULL,
+        claimed_at      REAL,
+        last_error      TEXT,
+        created_at      REAL NOT NULL,
+        sent_at         REAL
+    );
+    CREATE INDEX IF NOT EXISTS outbox_messages_due_idx
+        ON outbox_messages (status, next_attempt_at);
+    CREATE TABLE IF NOT EXISTS outbox_thread_attachments (
+        thread          TEXT NOT NULL,
+        recipients_key  TEXT NOT NULL,
+        sha256          TEXT NOT NULL,
+        name            TEXT NOT NULL,
+        sent_at         REAL NOT NULL,
+        PRIMARY KEY (thread, recipients_key, sha256)
+    );
+"""
+
+DEFAULT_OUTBOX_PATH = os.path.join('output', 'outbox.sqlite3')
+
+PENDING = 'pending'
+SENDING = 'sending'
+SENT = 'sent'
+FAILED = 'failed'
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as attachment:
+        for block in iter(lambda: attachment.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def combine_messages(messages, delivered=()):
+    """
+    Fold messages for the same recipients into one email.
+
+    Attachments are deduplicated by content, so a file shared by several messages (the
+    raw statement, the signature image) is sent once. Shared attachments already
+    delivered in a message's thread are left out and named in the body instead.
+
+    Args:
+        messages (list): Message dicts with subject, body, thread and attachments, in queue order.
+        delivered (set): (thread, sha256) pairs of shared attachments sent before to these recipients.
+
+    Returns:
+        tuple: (subject, body, attachment dicts)
+    """
+    attachments, seen, previously_sent = [], set(), {}
+    for message in messages:
+        for attachment in message['attachments']:
+            if attachment.get('shared') and (message['thread'], attachment['sha256']) in delivered:
+                previously_sent.setdefault(attachment['sha256'], attachment['name'])
+            elif attachment['sha256'] not in seen:
+                seen.add(attachment['sha256'])
+                attachments.append(attachment)
+    notes = [name for sha256, name in previously_sent.items() if sha256 not in seen]
+    note = f"<p>Sent earlier in this thread: {escape(', '.join(notes))}</p>" if notes else ''
+
+    if len(messages) == 1:
+        return messages[0]['subject'], messages[0]['body'] + note, attachments
+
+    subject = f"{messages[0]['subject']} (+{len(messages) - 1} more)"
+    listing = ''.join(f"<li>{escape(message['subject'])}</li>" for message in messages)
+    bodies = list(dict.fromkeys(message['body'] for message in messages))
+    body = f"<p><b>This email covers:</b></p><ul>{listing}</ul><hr>" + '<hr>'.join(bodies) + note
+    return subject, body, attachments
+
+
+class Outbox:
+    """
+    Persistent outbox for recon notifications, kept in a local sqlite file.
+
+    Recon queues a message and moves on; a sender drains the outbox later. Due messages
+    for the same recipient list go out as one email, failed sends are retried with
+    exponential backoff, and every message keeps its delivery status. Attachments
+    marked shared (e.g. the day's raw statement) go out once per thread and recipient
+    list; later emails in the thread name them instead of attaching them again.
+
+    Args:
+        path (str): sqlite file. Defaults to RECON_OUTBOX or output/outbox.sqlite3.
+        max_attempts (int): Sends tried before a message is marked failed.
+        backoff_seconds (float): Delay before the first retry; doubles per attempt.
+        max_backoff_seconds (float): Upper bound for the retry delay.
+        max_batch (int): Messages folded into a single email at most.
+        claim_timeout (float): Seconds after which a message claimed by a sender that died is sent again.
+        artifacts (recon.artifacts.ArtifactStore): Store that attachments given as artifacts are read from.
+    """
+
+    def __init__(self, path=None, max_attempts=6, backoff_seconds=30, max_backoff_seconds=3600,
+                 max_batch=10, claim_timeout=600, artifacts=None):
+        self.path = path or os.getenv('RECON_OUTBOX') or DEFAULT_OUTBOX_PATH
+        self.artifacts = artifacts
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.max_batch = max_batch
+        self.claim_timeout = claim_timeout
+        self._schema_ready = False
+
+    def _connect(self):
+        if not self._schema_ready:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        if not self._schema_ready:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(OUTBOX_DDL)
+            columns = [row['name'] for row in conn.execute('PRAGMA table_info(outbox_messages)')]
+            if 'thread' not in columns:
+                # Outbox files created before threads existed
+                conn.execute("ALTER TABLE outbox_messages ADD COLUMN thread TEXT NOT NULL DEFAULT ''")
+            self._schema_ready = True
+        return conn
+
+    def enqueue(self, recipients, subject, body, attachments=(), shared_attachments=(), thread=None):
+        """
+        Queue an email.
+
+        Args:
+            recipients (list): Email addresses.
+            subject (str): Subject line.
+            body (str): HTML body.
+            attachments (list): File paths or recon.artifacts.Artifact; files must stay in place until sent.
+            shared_attachments (list): Like attachments, but sent only once per thread and recipient list.
+            thread (str): Groups related emails, e.g. one recon day; by default every email is its own thread.
+
+        Returns:
+            int: The message id.
+        """
+        recipients = list(recipients)
+        attachment_rows = ([self._attachment(item, shared=False) for item in attachments]
+                           + [self._attachment(item, shared=True) for item in shared_attachments])
+        now = time.time()
+        with closing(self._connect()) as conn:
+            cur = conn.execute(
+                """
+                INSERT INTO outbox_messages
+                (recipients_key, recipients, thread, subject, body, attachments, next_attempt_at, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                ('\n'.join(sorted(address.lower() for address in recipients)), json.dumps(recipients),
+                 thread or '', subject, body, json.dumps(attachment_rows), now, now))
+            return cur.lastrowid
+
+    def _attachment(self, item, shared):
+        if isinstance(item, (str, os.PathLike)):
+            return {'name': os.path.basename(item), 'sha256': _file_digest(item), 'path': os.path.abspath(item),
+                    'shared': shared}
+        if self.artifacts is None:
+            raise ValueError('Artifact attachments need an outbox with an artifact store')
+        return {'name': item.name, 'sha256': item.digest, 'artifact': True, 'shared': shared}
+
+    def status(self, message_id):
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT message_id, subject, status, attempts, last_error, created_at, sent_at "
+                "FROM outbox_messages WHERE message_id = ?", (message_id,)).fetchone()
+        return dict(row) if row else None
+
+    def counts(self):
+        """Number of messages per delivery status."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM outbox_messages GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def pending_artifacts(self):
+        """Digests of stored artifacts that unsent messages still attach; they must not be evicted."""
+        if not self._schema_ready and not os.path.exists(self.path):
+            return set()
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT attachments FROM outbox_messages WHERE status IN (?, ?)",
+                                (PENDING, SENDING)).fetchall()
+        return {attachment['sha256'] for (attachments,) in rows for attachment in json.loads(attachments)
+                if attachment.get('artifact')}
+
+    def _delivered(self, recipients_key):
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT thread, sha256 FROM outbox_thread_attachments WHERE recipients_key = ?",
+                                (recipients_key,)).fetchall()
+        return {(thread, sha256) for thread, sha256 in rows}
+
+    def _claim(self, now):
+        """Mark due messages as being sent and return them, so two senders never send the same message."""
+        with closing(self._connect()) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                rows = conn.execute(
+                    """
+                    SELECT * FROM outbox_messages
+                    WHERE (status = ? AND next_attempt_at <= ?) OR (status = ? AND claimed_at <= ?)
+                    ORDER BY message_id
+                    """, (PENDING, now, SENDING, now - self.claim_timeout)).fetchall()
+                conn.executemany("UPDATE outbox_messages SET status = ?, claimed_at = ? WHERE message_id = ?",
+                                 [(SENDING, now, row['message_id']) for row in rows])
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+        messages = []
+        for row in rows:
+            message = dict(row)
+            message['recipients'] = json.loads(message['recipients'])
+            message['attachments'] = json.loads(message['attachments'])
+            messages.append(message)
+        return messages
+
+    def _record(self, messages, error, now):
+        with closing(self._connect()) as conn:
+            if error is None:
+                conn.executemany(
+                    "UPDATE outbox_messages SET status = ?, attempts = attempts + 1, sent_at = ?, "
+                    "last_error = NULL, claimed_at = NULL WHERE message_id = ?",
+                    [(SENT, now, message['message_id']) for message in messages])
+                conn.executemany(
+                    "INSERT OR IGNORE INTO outbox_thread_attachments (thread, recipients_key, sha256, name, sent_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [(message['thread'], message['recipients_key'], attachment['sha256'], attachment['name'], now)
+                     for message in messages for attachment in message['attachments'] if attachment.get('shared')])
+                OUTBOX_DELIVERIES.labels(result=SENT).inc(len(messages))
+                return
+
+            updates = []
+            for message in messages:
+                attempts = message['attempts'] + 1
+                delay = min(self.backoff_seconds * 2 ** (attempts - 1), self.max_backoff_seconds)
+                status = FAILED if attempts >= self.max_attempts else PENDING
+                updates.append((status, attempts, now + delay, error, message['message_id']))
+                OUTBOX_DELIVERIES.labels(result='retry' if status == PENDING else FAILED).inc()
+            conn.executemany(
+                "UPDATE outbox_messages SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?, "
+                "claimed_at = NULL WHERE message_id = ?", updates)
+
+    def drain(self, send, now=None):
+        """
+        Send every due message, one email per recipient list.
+
+        Args:
+            send: Callable (recipients, subject, body, attachments) that raises when the email was not sent,
+                e.g. RECON.send_email.
+            now (float): Current time as a Unix timestamp; defaults to time.time().
+
+        Returns:
+            dict: Number of messages sent, retried later and failed for good.
+        """
+        result = {SENT: 0, 'retry': 0, FAILED: 0}
+        if not self._schema_ready and not os.path.exists(self.path):
+            # Nothing was ever queued here
+            return result
+
+        now = time.time() if now is None else now
+        batches = {}
+        for message in self._claim(now):
+            batches.setdefault(message['recipients_key'], []).append(message)
+
+        for recipients_key, messages in batches.items():
+            delivered = self._delivered(recipients_key)
+            for start in range(0, len(messages), self.max_batch):
+                batch = messages[start:start + self.max_batch]
+                subject, body, attachments = combine_messages(batch, delivered)
+                try:
+                    with tempfile.TemporaryDirectory(prefix='outbox-') as directory:
+                        send(batch[0]['recipients'], subject, body, self._files(attachments, directory))
+                    error = None
+                    delivered.update((message['thread'], attachment['sha256']) for message in batch
+                                     for attachment in message['attachments'] if attachment.get('shared'))
+                except Exception as e:
+                    print(f"Error sending outbox messages {[m['message_id'] for m in batch]}: {e}")
+                    error = str(e) or type(e).__name__
+                self._record(batch, error, now)
+
+                if error is None:
+                    result[SENT] += len(batch)
+                else:
+                    for message in batch:
+                        result[FAILED if message['attempts'] + 1 >= self.max_attempts else 'retry'] += 1
+        return result
+
+    def _files(self, attachments, directory):
+        paths = []
+        for index, attachment in enumerate(attachments):
+            if not attachment.get('artifact'):
+                paths.append(attachment['path'])
+                continue
+            # One folder per attachment keeps the original names even when two of them clash
+            target = os.path.join(directory, str(index))
+            os.mkdir(target)
+            paths.append(self.artifacts.materialize(attachment['sha256'], attachment['name'], target))
+        return paths
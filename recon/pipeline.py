@@ -0,0 +1,186 @@
+import os
+from datetime import datetime, timedelta
+
+from metrics import ROWS_FETCHED, WINDOW_LOCKS
+from recon.coordination import window_lock
+from recon.idempotency import IdempotencyStore, row_hashes, statement_hash
+from recon.recon_process import NOT_POSTED, POSTED, RECON, UNMATCHED
+
+
+def bank_config_from_env():
+    """FNB client settings from the robot environment."""
+    return {
+        'client_id': os.getenv('CLIENT_ID'),
+        'client_secret': os.getenv('CLIENT_SECRET'),
+        'base_url': os.getenv('BASE_URL'),
+        'auth_url': os.getenv('AUTH_URL'),
+    }
+
+
+def db_config_from_env():
+    """psycopg2 connection settings from the robot environment."""
+    return {
+        'host': os.getenv('HOST'),
+        'database': os.getenv('DATABASE'),
+        'user': 'postgres',
+        'password': os.getenv('PASSWORD')
+    }
+
+
+def bank_adapter_from_env(db_config, replay=False, archive=True):
+    """
+    The statement source for this robot: statement files when STATEMENT_PATH is set, else the FNB API.
+
+    Fetched statements are archived as Parquet under STATEMENT_ARCHIVE (output/archive by
+    default; set it to 'off' to disable). With replay=True statements are read back from
+    that archive instead, and the bank is not called.
+
+    Args:
+        db_config (dict): psycopg2 connection settings, used by the FNB client.
+        replay (bool): Read statements from the archive.
+        archive (bool): Archive fetched statements; dry runs pass False to leave the archive as it is.
+
+    Returns:
+        bank.adapters.BankAdapter: The configured adapter.
+    """
+    from bank.archive import ArchiveAdapter, ArchivingAdapter, StatementArchive
+
+    archive_dir = os.getenv('STATEMENT_ARCHIVE')
+    if replay:
+        return ArchiveAdapter(StatementArchive(archive_dir))
+
+    statement_path = os.getenv('STATEMENT_PATH')
+    if statement_path:
+        from bank.adapters import FileStatementAdapter
+
+        adapter = FileStatementAdapter(statement_path, statement_format=os.getenv('STATEMENT_FORMAT'))
+    else:
+        from bank.adapters import FNBAdapter
+        from bank.fnb import BankAPI
+
+        adapter = FNBAdapter(BankAPI(db_config=db_config, **bank_config_from_env()))
+
+    if archive_dir == 'off' or not archive:
+        return adapter
+    return ArchivingAdapter(adapter, StatementArchive(archive_dir))
+
+
+def default_window(today=None):
+    """
+    The statement window a scheduled run reconciles: today up to tomorrow.
+
+    Returns:
+        tuple: (from_date, to_date) as YYYY-MM-DD strings.
+    """
+    current_date = (today or datetime.now().date()) + timedelta(days=1)
+    from_date = current_date - timedelta(days=1)
+    return from_date.strftime("%Y-%m-%d"), current_date.strftime("%Y-%m-%d")
+
+
+def reconcile_window(fnb, db_conn, account_number, from_date_str, to_date_str, recon_client=None):
+    """
+    Fetch one statement window and reconcile the transactions not posted before.
+
+    Workers can run windows in parallel: each run holds the account's days of the window
+    (see recon/coordination.py), and a window overlapping one that another worker is
+    running is skipped rather than waited for, so no statement row is posted twice.
+
+    Args:
+        fnb (bank.adapters.BankAdapter): Statement source, e.g. the FNB API or statement files.
+        db_conn (psycopg2.extensions.connection): The database connection object.
+        account_number (str): The account to reconcile.
+        from_date_str (str): Window start (YYYY-MM-DD).
+        to_date_str (str): Window end (YYYY-MM-DD).
+        recon_client (RECON): Reused by long-running callers so caches stay warm; a new one is made if omitted.
+
+    Returns:
+        dict: 'status' ('busy', 'no_transactions', 'unchanged', 'completed', or 'partial' when
+            some rows were not posted) plus row counts.
+    """
+    with window_lock(db_conn, account_number, from_date_str, to_date_str) as acquired:
+        WINDOW_LOCKS.labels(result='acquired' if acquired else 'busy').inc()
+        if not acquired:
+            print(f"Statement {from_date_str} - {to_date_str} is being reconciled by another worker, skipping.")
+            return {'status': 'busy', 'fetched': 0, 'reconciled': 0}
+        return _reconcile_locked_window(fnb, db_conn, account_number, from_date_str, to_date_str, recon_client)
+
+
+def _reconcile_locked_window(fnb, db_conn, account_number, from_date_str, to_date_str, recon_client):
+    # Step 1: register the statement window so retries reuse its idempotency ID
+    idempotency = IdempotencyStore(db_conn)
+    idempotency_id = idempotency.begin_window(account_number, from_date_str, to_date_str)
+
+    # Step 2: authorize and get fnb transactions
+    trans_df = fnb.get_transaction_history(account_number, from_date_str, to_date_str,
+                                           idempotency_id=idempotency_id)
+    ROWS_FETCHED.labels(source=getattr(fnb, 'name', None) or 'fnb').inc(0 if trans_df is None else len(trans_df))
+    if trans_df is None or trans_df.empty:
+        print("No transactions to process.")
+        return {'status': 'no_transactions', 'fetched': 0, 'reconciled': 0}
+
+    # Step 3: skip windows that were already reconciled, and rows posted by earlier runs
+    hashes = row_hashes(trans_df)
+    content_hash = statement_hash(hashes)
+    if idempotency.is_completed(account_number, from_date_str, to_date_str, content_hash):
+        print(f"Statement {from_date_str} - {to_date_str} unchanged since the last completed run, skipping recon.")
+        idempotency.mark_unchanged(account_number, from_date_str, to_date_str)
+        return {'status': 'unchanged', 'fetched': len(trans_df), 'reconciled': 0}
+
+    new_rows = idempotency.new_rows_mask(hashes)
+    new_df = trans_df[new_rows].reset_index(drop=True)
+    new_hashes = [row_hash for row_hash, is_new in zip(hashes, new_rows) if is_new]
+    print(f"{len(new_df)} of {len(trans_df)} transactions are new.")
+
+    # Step 4: Recon transactions
+    outcomes = [POSTED] * len(new_df)
+    if not new_df.empty:
+        recon_client = recon_client or RECON(new_df)
+        outcomes = recon_client.process_transactions(new_df, db_conn)
+
+    # Step 5: remember the rows that were posted. Unmatched rows are only reported, so a
+    # window whose other rows all posted is complete and skipped while it is unchanged; if
+    # it changes they are reported again. Rows of failed batches stay new for the next run.
+    posted = [outcome == POSTED for outcome in outcomes]
+    posted_df = new_df[posted]
+    posted_hashes = [row_hash for row_hash, is_posted in zip(new_hashes, posted) if is_posted]
+    result = {'fetched': len(trans_df), 'reconciled': len(posted_df), 'unmatched': outcomes.count(UNMATCHED)}
+    unposted = outcomes.count(NOT_POSTED)
+    if not unposted:
+        idempotency.complete_window(account_number, from_date_str, to_date_str,
+                                    content_hash, posted_df, posted_hashes)
+        return {'status': 'completed', **result}
+
+    print(f"{unposted} transactions were not posted and stay open for the next run.")
+    idempotency.complete_window(account_number, from_date_str, to_date_str,
+                                None, posted_df, posted_hashes)
+    return {'status': 'partial', **result, 'unposted': unposted}
+
+
+def flush_outbox(recon_client):
+    """
+    Send the report emails a recon client queued, e.g. at the end of a one-shot run.
+
+    Afterwards the artifact store's retention policy is applied, keeping every report
+    that an unsent email still attaches.
+
+    Args:
+        recon_client (RECON): The client whose outbox is drained; it also does the sending.
+
+    Returns:
+        dict: Messages sent, retried later and failed, as returned by recon.outbox.Outbox.drain.
+    """
+    try:
+        result = recon_client.outbox.drain(recon_client.send_email)
+    except Exception as e:
+        print(f"Error draining the email outbox: {e}")
+        return None
+    if any(result.values()):
+        print(f"Outbox: {result['sent']} sent, {result['retry']} to retry, {result['failed']} failed.")
+
+    try:
+        removed = recon_client.artifacts.prune(keep=recon_client.outbox.pending_artifacts())
+        if removed['objects']:
+            print(f"Artifacts: evicted {removed['objects']} reports ({removed['bytes']} bytes).")
+    except Exception as e:
+        print(f"Error pruning the artifact store: {e}")
+    return result
@@ -1,77 +1,93 @@
 import logging
-import re
+import os
+import tempfile
+import time
 from datetime import datetime
 from pathlib import Path
 
 import pandas as pd
-import numpy as np
 import psycopg2
-from fpdf import FPDF
-from O365 import Account
-from O365.utils.token import FileSystemTokenBackend
-from robocorp import vault
+from psycopg2 import extras
+
+from metrics import (ALLOCATIONS, EMAIL_SEND_SECONDS, INSERT_ROWS_PER_SECOND, LEDGER_POST_SECONDS, ROWS_INSERTED, ROWS_MATCHED,
+                     UNMATCHED_RATIO)
+from recon.allocation import ALLOCATION_COLUMNS, InvoiceAllocator, allocated_amounts
+from recon.artifacts import ArtifactStore
+from recon.extraction_rules import DEFAULT_RULES_PATH, load_rules
+from recon.migrate import ensure_partitions
+from recon.outbox import Outbox
+from recon.summary import ReconSummary
+
+# Statement rows are posted in one batch per payment term, named as in the reports
+BATCH_TERMS = {
+    '30-DAY': '10% STRICTLY 31 DAYS',
+    '7-DAY': '7 DAY ONLY ACC.',
+    'CASH ONLY (NOTES)': 'CASH ONLY (NOTES)',
+}
+
+# Subject of each batch's report email, followed by the batch id
+BATCH_SUBJECTS = {
+    '30-DAY': 'FNB 30-DAY BATCH',
+    '7-DAY': 'FNB 7-DAY BATCH',
+    'CASH ONLY (NOTES)': 'FNB CASH ONLY (COD) BATCH',
+}
+
+# Outcomes of statement rows in process_transactions
+POSTED = 'posted'
+NOT_POSTED = 'not_posted'
+UNMATCHED = 'unmatched'
+
+# fpdf, O365 and robocorp.vault are only needed for reports and mail, so they are
+# imported inside the methods that use them to keep module import cheap.
 
 #todo - study in detail
 class RECON:
     def __init__(self, trans_data):
         self.trans_data = trans_data
         self.run_count = {} 
+        self.summary = ReconSummary()
+        # Seconds the crm.customers snapshot may be reused; 0 reloads it on every call.
+        # The worker raises this so a resident process does not re-read customers each run.
+        self.customer_cache_seconds = 0
+        self.customers_df = None
+        self.customers_loaded_at = None
+        self.extraction_rules = load_rules(os.getenv('RECON_RULES', DEFAULT_RULES_PATH))
+        # Reports are kept compressed in the artifact store; emails are queued and sent after the run
+        self.artifacts = ArtifactStore()
+        self.outbox = Outbox(artifacts=self.artifacts)
+        # Test hook: a callable returning (O365.Account, scopes) used instead of the vault
+        # credentials, e.g. sandbox.graph_server.GraphMailServer.mail_account
+        self.mail_account = None
+        self.allocator = InvoiceAllocator()
     
     
     def extract_customer_id(self, row):
-        customer_id = self._extract_from_text(row.get('remittanceInfo'))
-        if customer_id:
-            return customer_id
+        # Rules are tried on remittanceInfo first, then reference (see recon/rules/fnb.json)
+        return self.extraction_rules.extract_row(row)
 
-        customer_id = self._extract_from_text(row.get('reference'))
-        if customer_id:
-            return customer_id
-
-        return None
-
-
-    def _extract_from_text(self, text):
-        # Helper function to extract customer ID from a given text
-        if text:
-            match = re.search(r'ADT CASH DEPO\d+\s([A-Z]{3}\d{2})', text, re.IGNORECASE)
-            if match:
-                return '101' + match.group(1).upper()
-            
-            match = re.search(r'\b(101[A-Z]{2}\d{3})\b', text, re.IGNORECASE)
-            if match:
-                return match.group(1).upper()
-            else:
-                # Special case: Extract customer IDs from other longer strings
-                special_cases = [
-                    r'(?<!\d)(101[A-Z]{3}\d{2})(?=\w)',
-                    r'(?<!\d)([A-Z]{3}\d{2})(?=\w)',
-                    r'(?<!\d)(101[A-Z]{3}\d{2})', 
-                    r'(?<!\d)([A-Z]{3}\d{2})'           
-                ]
-                
-                for pattern in special_cases:
-                    match = re.search(pattern, text, re.IGNORECASE)
-                    if match:
-                        return '101' + match.group(1).upper() if not match.group(1).startswith('101') else match.group(1).upper()
+    def load_customers(self, db_connection):
+        """
+        Load customer ids and payment terms, reusing the cached copy while it is fresh.
 
-            match = re.search(r'\b(101[A-Za-z]{3}\d{2}|([A-Za-z]{3}\d{2}))\b', text, re.IGNORECASE)
-            if match:
-                return '101' + match.group(2).upper() if match.group(2) else match.group(1).upper()
+        Args:
+            db_connection (psycopg2.extensions.connection): The database connection object.
 
-            # Match for customer IDs preceded by other text, including those that may be part of longer strings
-            match = re.search(r'\b(101[A-Za-z]{3}\d{2})\b', text)
-            if match:
-                return match.group(1).upper()
+        Returns:
+            pandas.DataFrame: customer_id and payment_terms columns.
+        """
+        now = time.monotonic()
+        if (self.customers_df is not None and self.customer_cache_seconds
+                and now - self.customers_loaded_at < self.customer_cache_seconds):
+            return self.customers_df
 
-            match = re.search(r'\b([A-Za-z]{3}\d{2})\b', text)
-            if match:
-                return '101' + match.group(1).upper()
+        with db_connection.cursor() as cur:
+            query = "SELECT username AS customer_id, payment_terms FROM crm.customers"
+            cur.execute(query)
+            self.customers_df = pd.DataFrame(cur.fetchall(), columns=['customer_id', 'payment_terms'])
+            self.customers_loaded_at = now
 
-            match = re.search(r'([A-Za-z]{3})\s(\d{2})', text)
-            if match:
-                return '101' + match.group(1).upper() + match.group(2)
+        return self.customers_df
 
-        return None
 
     def read_and_apply_discounts(self, df, db_connection):
         """
@@ -91,26 +107,17 @@ class RECON:
         df_trans_cpy = df.copy() 
         #unmatched_transactions = pd.DataFrame()
         try:
-            with db_connection.cursor() as cur:
-                query = "SELECT username AS customer_id, payment_terms FROM crm.customers"
-                cur.execute(query)
-                customers_df = pd.DataFrame(cur.fetchall(), columns=['customer_id', 'payment_terms'])
-
-            df['customer_id'] = df.apply(self.extract_customer_id, axis=1)
-            df['reference'] = df['customer_id']
+            customers_df = self.load_customers(db_connection)
 
-            df = df.merge(customers_df, how='left', on='customer_id')
+            df = self.match_customers(df, customers_df)
 
             unmatched_trans_df = df[df['payment_terms'].isnull()]
+            ROWS_MATCHED.labels(result='matched').inc(len(df) - len(unmatched_trans_df))
+            ROWS_MATCHED.labels(result='unmatched').inc(len(unmatched_trans_df))
+            if len(df):
+                UNMATCHED_RATIO.set(len(unmatched_trans_df) / len(df))
 
-            # Apply 10% discount on ALL 31-DAY debtor accounts 
-            df['discount'] = df.apply(lambda row: (round((df['amount'] / 90) * 100, 2)[row.name] - row['amount']) 
-                                      if row['payment_terms'] == '10% STRICTLY 31 DAYS' and round((df['amount'] / 90) * 100, 2)[row.name] > 0 
-                                      else 0,
-                                      axis=1
-                                      )
-
-            df['discount'] = df['discount'].astype(float).round(2)
+            df = self.apply_discounts(df)
            
             return df, unmatched_trans_df, df_trans_cpy
 
@@ -119,9 +126,80 @@ class RECON:
             return df, unmatched_trans_df, df_trans_cpy
     
         
+    def match_customers(self, df, customers_df):
+        """
+        Extract the customer id of each transaction and attach the customer's payment terms.
+
+        Args:
+            df (pandas.DataFrame): Normalized bank transactions.
+            customers_df (pandas.DataFrame): customer_id and payment_terms, as returned by load_customers.
+
+        Returns:
+            pandas.DataFrame: df with customer_id as its reference, and payment_terms (null when unmatched).
+        """
+        df['customer_id'] = df.apply(self.extract_customer_id, axis=1)
+        df['reference'] = df['customer_id']
+        return df.merge(customers_df, how='left', on='customer_id')
+
+    def apply_discounts(self, df):
+        """
+        Apply the 10% discount of 31-day debtor accounts: the payment is grossed up to the
+        amount it settles (amount / 0.9) and the difference is the discount.
+
+        Args:
+            df (pandas.DataFrame): Matched transactions with amount and payment_terms.
+
+        Returns:
+            pandas.DataFrame: df with a discount column, 0 for every other payment term.
+        """
+        gross = (df['amount'] / 90 * 100).round(2)
+        discount = (gross - df['amount']).where((df['payment_terms'] == BATCH_TERMS['30-DAY']) & (gross > 0), 0)
+        df['discount'] = discount.astype(float).round(2)
+        return df
+
     def apply_discount_at_transaction_level(self, df):
-        df['total'] = df.apply(lambda row: row['amount'] + row['discount'], axis=1)
+        df['total'] = df['amount'] + df['discount']
         return df
+
+    def split_batches(self, df):
+        """
+        Group transactions into the batches they are posted in.
+
+        Returns:
+            dict: Batch type (see BATCH_TERMS) -> its transactions; unmatched rows are in none.
+        """
+        return {batch_type: df[df['payment_terms'] == payment_terms]
+                for batch_type, payment_terms in BATCH_TERMS.items()}
+
+
+    def allocate_payments(self, df, db_connection):
+        """
+        Allocate matched transactions to the customers' open invoices.
+
+        Exact-amount matches first, then oldest due date first (see recon/allocation.py).
+        Nothing is written yet: each batch's allocations are recorded when it is posted.
+
+        Args:
+            df (pandas.DataFrame): Transactions after discounts, with customer_id, payment_terms and total.
+            db_connection (psycopg2.extensions.connection): The database connection object.
+
+        Returns:
+            tuple:
+                - pandas.DataFrame: df with an 'allocated' column, the amount of each row allocated to invoices.
+                - pandas.DataFrame: The allocations, for post_to_general_ledger.
+        """
+        try:
+            matched = df[df['payment_terms'].notna()]
+            allocations = self.allocator.allocate(db_connection, matched)
+            for method, count in allocations['method'].value_counts().items():
+                ALLOCATIONS.labels(method=method).inc(count)
+        except (Exception, psycopg2.Error) as error:
+            print(f"Error allocating payments to invoices: {error}")
+            db_connection.rollback()
+            allocations = pd.DataFrame(columns=ALLOCATION_COLUMNS)
+
+        df['allocated'] = allocated_amounts(df, allocations)
+        return df, allocations
     
 
     def insert_batch(self, db_conn, branch_code, batch_date, operator_name, sub_total, discount, total):
@@ -159,15 +237,15 @@ class RECON:
             batch_id (str): The ID of the batch associated with the transactions.
 
         Returns:
-            None
+            bool: True when every row was inserted.
         """
         try:
             with db_conn.cursor() as cur:
                 sql = """
                     INSERT INTO fin.batch_transactions
                     (booking_date, value_date, remittance_info, reference,
-                    amount, discount, currency, credit_debit_indicator, batch_id)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    amount, discount, currency, credit_debit_indicator, batch_id, entry_id)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
                 """
 
                 data = [
@@ -180,22 +258,50 @@ class RECON:
                         row['discount'],
                         row['currency'],
                         row['availableCreditDebitIndicator'],
-                        batch_id
+                        batch_id,
+                        row.get('entryId')
                     )
                     for _, row in trans_df.iterrows()
                 ]
 
+                start_time = time.perf_counter()
                 psycopg2.extras.execute_batch(cur, sql, data)
                 db_conn.commit()
+                elapsed = time.perf_counter() - start_time
 
+                ROWS_INSERTED.inc(len(data))
+                if elapsed > 0:
+                    INSERT_ROWS_PER_SECOND.set(len(data) / elapsed)
                 print(f"Successfully inserted {len(data)} transactions.")
+                return True
 
         except (Exception, psycopg2.Error) as error:
             print(f"Error inserting transactions: {error}")
             db_conn.rollback()
+            return False
+
+
+    def post_to_general_ledger(self, db, batch_id, total_amount, batch_df=None, branch_code='BR001', allocations=None):
+        """
+        Post a batch to the general ledger and mark it as posted.
 
+        When the batch transactions are passed in, the daily recon rollups, and the
+        invoice allocations of the batch if given, are written in the same database
+        transaction as the ledger entry.
 
-    def post_to_general_ledger(self, db, batch_id, total_amount):
+        Args:
+            db (psycopg2.extensions.connection): The database connection object.
+            batch_id (int): The batch to post.
+            total_amount (float): Batch total.
+            batch_df (pandas.DataFrame): Optional batch transactions for the rollups.
+            branch_code (str): Branch the batch belongs to.
+            allocations (pandas.DataFrame): Optional allocations from allocate_payments.
+
+        Returns:
+            bool: True when the batch was posted.
+        """
+        start_time = time.perf_counter()
+        result = 'error'
         try:
             date_str = datetime.now().strftime("%Y-%m-%d")
 
@@ -210,17 +316,28 @@ class RECON:
 
                 update_batch_query = "UPDATE fin.batch SET posted = TRUE WHERE batch_id = %s"
                 cur.execute(update_batch_query, (batch_id,))
+
+                if batch_df is not None:
+                    self.summary.apply_batch(cur, batch_df, branch_code, batch_id)
+                    if allocations is not None:
+                        self.allocator.apply_batch(cur, allocations, batch_df, batch_id)
                 db.commit()
+                result = 'ok'
 
                 print("Batch posted to the general ledger successfully.")
 
         except Exception as e:
             print("Error while posting to the general ledger:", e)
             db.rollback()
+        finally:
+            LEDGER_POST_SECONDS.labels(result=result).observe(time.perf_counter() - start_time)
+        return result == 'ok'
 
 
     
-    def generate_pdf_report(self, df, batch_id, total_amount, total_discount, batch_type):
+    def generate_pdf_report(self, df, batch_id, total_amount, total_discount, batch_type, directory='.'):
+        from fpdf import FPDF
+
         pdf = FPDF()
         pdf.add_page()
     
@@ -248,6 +365,9 @@ class RECON:
         pdf.cell(30, 10, txt="AMOUNT", border=1, align='C')
         pdf.cell(30, 10, txt="DISCOUNT", border=1, align='C')
         pdf.cell(30, 10, txt="TOTAL", border=1, align='C')
+        show_allocated = 'allocated' in df
+        if show_allocated:
+            pdf.cell(30, 10, txt="ALLOCATED", border=1, align='C')
         pdf.ln()
 
         # Table Rows
@@ -257,6 +377,8 @@ class RECON:
             pdf.cell(30, 8, txt="{:.2f}".format(row['amount']), border=1)
             pdf.cell(30, 8, txt="{:.2f}".format(row['discount']), border=1)
             pdf.cell(30, 8, txt="{:.2f}".format(row['total']), border=1)
+            if show_allocated:
+                pdf.cell(30, 8, txt="{:.2f}".format(row['allocated']), border=1)
             pdf.ln()
 
         pdf.set_font("Helvetica", size=10)
@@ -266,48 +388,122 @@ class RECON:
         pdf.set_font("Helvetica", style='B', size=12)
         pdf.cell(0, 10, txt="END OF REPORT", align='C')
 
-        pdf_file_name = f"FNB {batch_type} Transactions BATCH {batch_id}_{batch_date}.pdf"
+        pdf_file_name = os.path.join(directory, f"FNB {batch_type} Transactions BATCH {batch_id}_{batch_date}.pdf")
 
         pdf.output(pdf_file_name)
         print(f"PDF {batch_type} report generated successfully: {pdf_file_name}")
         return pdf_file_name
 
 
-    def send_email_with_attachments(self, recipients, subject, body, file_1, file_2, signature_image):
-        email_credentials = vault.get_secret("DANNYEMAIL") 
+    def _mail_account(self):
+        """
+        Build the O365 account used for notifications, from the DANNYEMAIL vault secret.
 
-        try:
-            tk = FileSystemTokenBackend(token_path=".", token_filename="o365_token.txt")
+        With GRAPH_URL set, mail goes to the Graph stand-in at that address instead
+        (sandbox/graph_server.py), e.g. for offline load runs. It is unset in production.
+
+        Returns:
+            tuple: (O365.Account, list of scopes)
+        """
+        if self.mail_account is not None:
+            return self.mail_account()
+
+        graph_url = os.getenv('GRAPH_URL')
+        if graph_url:
+            from sandbox.graph_server import stand_in_mail_account
+
+            return stand_in_mail_account(graph_url)
 
-            credentials = (email_credentials['CLIENT-ID'], email_credentials['CLIENT-SECRET'])
-            scopes = [email_credentials['DEFAULT-SCOPES']]
+        from O365 import Account
+        from O365.utils.token import FileSystemTokenBackend
+        from robocorp import vault
 
-            account = Account(credentials, auth_flow_type='credentials', tenant_id=email_credentials['TENANT-ID'], token_backend=tk)
+        tk = FileSystemTokenBackend(token_path=".", token_filename="o365_token.txt")
+        email_credentials = vault.get_secret("DANNYEMAIL")
+        credentials = (email_credentials['CLIENT-ID'], email_credentials['CLIENT-SECRET'])
+        scopes = [email_credentials['DEFAULT-SCOPES']]
+        account = Account(credentials, auth_flow_type='credentials', tenant_id=email_credentials['TENANT-ID'], token_backend=tk)
+        return account, scopes
+
+
+    def send_email(self, recipients, subject, body, attachments):
+        """
+        Send one email through O365; raises if it could not be sent.
+
+        Args:
+            recipients (list): Email addresses.
+            subject (str): Subject line.
+            body (str): HTML body.
+            attachments (list): File paths.
+        """
+        start_time = time.perf_counter()
+        result = 'error'
+        try:
+            account, scopes = self._mail_account()
 
             if account.authenticate(scopes=scopes):
                 logging.info('Authenticated!')
 
             mailbox = account.mailbox('rpa@dannysauto.co.za')
             m = mailbox.new_message()
-            
+
             for recipient in recipients:
                 m.to.add(recipient)
             m.subject = subject
-            m.attachments.add(signature_image)
-
-            body_with_signature = body.replace('src="cid:dannys_email_signature.png"', f'src="cid:{Path(signature_image).name}"')
-            m.body = body_with_signature
-
-            m.attachments.add(file_1)
-            m.attachments.add(file_2)
+            m.body = body
+            for attachment in attachments:
+                m.attachments.add(attachment)
             m.send()
+            result = 'ok'
             logging.info('Email sent successfully.')
+        finally:
+            EMAIL_SEND_SECONDS.labels(result=result).observe(time.perf_counter() - start_time)
+
+
+    def _with_signature(self, body, signature_image):
+        return body.replace('src="cid:dannys_email_signature.png"', f'src="cid:{Path(signature_image).name}"')
+
 
+    def send_email_with_attachments(self, recipients, subject, body, file_1, file_2, signature_image):
+        try:
+            self.send_email(recipients, subject, self._with_signature(body, signature_image),
+                            [signature_image, file_1, file_2])
         except Exception as e:
             logging.error(f"An error occurred while sending the email: {str(e)}")
 
 
-    def save_raw_transactions_excel(self, df, output_file_name, batch_date, current_time):
+    def queue_email_with_attachments(self, recipients, subject, body, file_1, file_2, signature_image, thread=None):
+        """
+        Queue a report email in the outbox instead of sending it during the run.
+
+        The worker drains the outbox in the background and one-shot runs drain it when
+        they finish (see recon.outbox.Outbox.drain), so mail latency is not part of recon.
+        file_2 is the statement shared by the batch emails of a day: it is attached once
+        per thread, and later emails in the thread refer to it.
+        """
+        try:
+            message_id = self.outbox.enqueue(recipients, subject, self._with_signature(body, signature_image),
+                                             [signature_image, file_1], shared_attachments=[file_2], thread=thread)
+            print(f"Email queued in the outbox as message {message_id}.")
+        except Exception as e:
+            logging.error(f"An error occurred while queueing the email: {str(e)}")
+
+
+    def store_artifact(self, path):
+        """
+        Move a generated report into the artifact store.
+
+        Returns:
+            recon.artifacts.Artifact: The stored report, or the path itself if it could not be stored.
+        """
+        try:
+            return self.artifacts.put(path)
+        except Exception as e:
+            logging.error(f"An error occurred while storing {path}: {str(e)}")
+            return path
+
+
+    def save_raw_transactions_excel(self, df, output_file_name, batch_date, current_time, directory='.'):
         """
         Generate a raw Excel file with unprocessed bank transactions.
 
@@ -315,13 +511,14 @@ class RECON:
             df (pandas.DataFrame): DataFrame containing the transaction history.
             batch_date (str): Date of the batch in 'YYYYMMDD' format.
             current_time (str): Current time in 'HH:MM' format.
+            directory (str): Directory the file is written to.
 
         Returns:
             str: Path to the generated Excel file.
         """
         try:
             formatted_time = current_time.replace(':', '-')
-            output_file = f"{output_file_name}_{batch_date}_{formatted_time}.xlsx"
+            output_file = os.path.join(directory, f"{output_file_name}_{batch_date}_{formatted_time}.xlsx")
             
             column_order = [
                 'valueDate',
@@ -343,7 +540,20 @@ class RECON:
 
 
     def process_transactions(self, fnb_trans_df, db_conn):
-        
+        """
+        Reconcile a statement: match customers, post one batch per payment term and queue the reports.
+
+        Args:
+            fnb_trans_df (pandas.DataFrame): Normalized bank transactions with a default index.
+            db_conn (psycopg2.extensions.connection): The database connection object.
+
+        Returns:
+            list: The outcome of each row, in fnb_trans_df order: POSTED when its batch was
+                inserted and posted to the general ledger, NOT_POSTED when its batch failed, and
+                UNMATCHED for rows in no batch, which are only reported.
+        """
+        outcomes = [UNMATCHED] * len(fnb_trans_df)
+
         batch_date = datetime.now().strftime('%Y-%m-%d')
         current_date_str = datetime.now().strftime("%d-%b-%Y").upper()
         current_time = datetime.now().strftime("%H:%M").upper()
@@ -371,103 +581,85 @@ class RECON:
                 <img src="cid:dannys_email_signature.png" alt="Danny's Email Signature">
                 """
 
+        # The batch emails of a day share the raw statement; each version of it is attached once
+        email_thread = f'fnb-recon-{batch_date}'
+
+        # Statement rows go to the monthly partition of their booking date (recon/migrations)
+        booking_dates = fnb_trans_df['bookingDate'].dropna()
+        if not booking_dates.empty:
+            ensure_partitions(db_conn, booking_dates.min(), booking_dates.max())
+
         df_with_discount, unmatched_trans_df, df_trans_cpy = self.read_and_apply_discounts(fnb_trans_df, db_conn)
         df = self.apply_discount_at_transaction_level(df_with_discount)
+        df, allocations = self.allocate_payments(df, db_conn)
 
         # Separate transactions by payment terms
-        df_30_day = df[df['payment_terms'] == '10% STRICTLY 31 DAYS']
-        df_7_day = df[df['payment_terms'] == '7 DAY ONLY ACC.']
-        df_cod = df[df['payment_terms'] == 'CASH ONLY (NOTES)']
+        batches = self.split_batches(df)
+        for batch_df in batches.values():
+            for position in batch_df.index:
+                outcomes[position] = NOT_POSTED
         
-        file_name = 'Latest_FNB_Bank_Statement'
-        raw_excel_file = self.save_raw_transactions_excel(df_trans_cpy, file_name, batch_date, current_time)
-        
-        file_name = 'Unmatched_FNB_Trans'
-        unmatched_trans_excel_file = self.save_raw_transactions_excel(unmatched_trans_df, file_name, batch_date, current_time)
-        
-        
-        batch_id_30_day = self.insert_batch(
-            db_conn, 'BR001', 
-            batch_date, 
-            'Finance (Bot)',
-            df_30_day['amount'].sum(), 
-            df_30_day['discount'].sum(), 
-            df_30_day['total'].sum()
-        )
-        
-        if batch_id_30_day:
-            self.insert_bank_transactions(db_conn, df_30_day, batch_id_30_day)
-            if self.check_batch_balance(df_30_day, df_30_day['amount'].sum(), df_30_day['discount'].sum(), df_30_day['total'].sum()):
-                self.post_to_general_ledger(db_conn, 
-                                            batch_id_30_day, 
-                                            df_30_day['total'].sum())
-                
-                pdf_file_30_day = self.generate_pdf_report(df_30_day, batch_id_30_day, 
-                                                           df_30_day['total'].sum(), 
-                                                           df_30_day['discount'].sum(), 
-                                                           '30-DAY')
-                
-                self.send_email_with_attachments(recipients, 
-                                                 f'FNB 30-DAY BATCH {batch_id_30_day} - {current_date_str} - {current_time}', 
-                                                 matched_email_body, 
-                                                 pdf_file_30_day, raw_excel_file, 
-                                                 'input/dannys_email_signature.png')
-
-        batch_id_7_day = self.insert_batch(
-            db_conn, 'BR001', 
-            batch_date, 
-            'Finance (Bot)',
-            df_7_day['amount'].sum(), 
-            df_7_day['discount'].sum(), 
-            df_7_day['total'].sum()
-        )
-
-        if batch_id_7_day:
-            self.insert_bank_transactions(db_conn, df_7_day, batch_id_7_day)
-            if self.check_batch_balance(df_7_day, df_7_day['amount'].sum(), df_7_day['discount'].sum(), df_7_day['total'].sum()):
-                self.post_to_general_ledger(db_conn, 
-                                            batch_id_7_day, 
-                                            df_7_day['total'].sum())
-                
-                pdf_file_7_day = self.generate_pdf_report(df_7_day, 
-                                                          batch_id_7_day, 
-                                                          df_7_day['total'].sum(), 
-                                                          df_7_day['discount'].sum(), 
-                                                          '7-DAY')
-                
-                self.send_email_with_attachments(recipients, 
-                                                  f'FNB 7-DAY BATCH {batch_id_7_day} - {current_date_str} - {current_time}', 
-                                                  matched_email_body, 
-                                                  pdf_file_7_day, 
-                                                  raw_excel_file, 
-                                                  'input/dannys_email_signature.png')
-        
-        batch_id_cod = self.insert_batch(
-            db_conn, 'BR001', batch_date, 'Finance (Bot)',
-            df_cod['amount'].sum(),  df_cod['discount'].sum(), 
-            df_cod['total'].sum()
-        )
-        
-        if batch_id_cod:
-            self.insert_bank_transactions(db_conn, df_cod, batch_id_cod)
-
-            if self.check_batch_balance(df_cod, df_cod['amount'].sum(), df_cod['discount'].sum(), df_cod['total'].sum()):    
-                self.post_to_general_ledger(db_conn, 
-                                            batch_id_cod, 
-                                            df_cod['total'].sum())
-                
-                pdf_file_cod = self.generate_pdf_report(df_cod, 
-                                                        batch_id_cod, 
-                                                        df_cod['total'].sum(), 
-                                                        df_cod['discount'].sum(), 
-                                                        'CASH ONLY (NOTES)')
-                
-                self.send_email_with_attachments(recipients, 
-                                                  f'FNB CASH ONLY (COD) BATCH {batch_id_cod} - {current_date_str} - {current_time}', 
-                                                  matched_email_body, 
-                                                  pdf_file_cod, 
-                                                  raw_excel_file, 
-                                                  'input/dannys_email_signature.png')
-                
+        # Reports are written to a directory of this run: runs sharing a RECON that finish in
+        # the same minute would otherwise overwrite each other's files before they are stored
+        report_dir = tempfile.mkdtemp(prefix='recon-reports-')
+        try:
+            file_name = 'Latest_FNB_Bank_Statement'
+            raw_excel_file = self.store_artifact(
+                self.save_raw_transactions_excel(df_trans_cpy, file_name, batch_date, current_time, report_dir))
+
+            file_name = 'Unmatched_FNB_Trans'
+            unmatched_trans_excel_file = self.store_artifact(
+                self.save_raw_transactions_excel(unmatched_trans_df, file_name, batch_date, current_time, report_dir))
+
+            for batch_type, batch_df in batches.items():
+                # Reruns often bring no rows of a term; an empty batch would still be posted and mailed
+                if batch_df.empty:
+                    continue
+
+                batch_id = self.insert_batch(
+                    db_conn, 'BR001',
+                    batch_date,
+                    'Finance (Bot)',
+                    batch_df['amount'].sum(),
+                    batch_df['discount'].sum(),
+                    batch_df['total'].sum()
+                )
+                if not batch_id:
+                    continue
+
+                inserted = self.insert_bank_transactions(db_conn, batch_df, batch_id)
+                if self.check_batch_balance(batch_df, batch_df['amount'].sum(), batch_df['discount'].sum(), batch_df['total'].sum()):
+                    batch_posted = self.post_to_general_ledger(db_conn,
+                                                               batch_id,
+                                                               batch_df['total'].sum(),
+                                                               batch_df,
+                                                               allocations=allocations)
+                    if inserted and batch_posted:
+                        for position in batch_df.index:
+                            outcomes[position] = POSTED
+
+                    pdf_file = self.generate_pdf_report(batch_df,
+                                                        batch_id,
+                                                        batch_df['total'].sum(),
+                                                        batch_df['discount'].sum(),
+                                                        batch_type,
+                                                        report_dir)
+                    pdf_file = self.store_artifact(pdf_file)
+
+                    self.queue_email_with_attachments(recipients,
+                                                      f'{BATCH_SUBJECTS[batch_type]} {batch_id} - {current_date_str} - {current_time}',
+                                                      matched_email_body,
+                                                      pdf_file,
+                                                      raw_excel_file,
+                                                      'input/dannys_email_signature.png',
+                                                      thread=email_thread)
+        finally:
+            try:
+                # Left behind only when a report could not be stored and is attached from here
+                os.rmdir(report_dir)
+            except OSError:
+                pass
+
+        return outcomes
 
 
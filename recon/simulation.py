@@ -0,0 +1,300 @@
+import argparse
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass
+
+import pandas as pd
+
+from recon.recon_process import BATCH_TERMS, RECON
+
+# A simulation reads statements from the archive (or the bank) and customers and posted
+# transactions from a snapshot, and writes nothing: no batches, ledger postings, reports
+# or emails. It runs the same extraction, discount and batch grouping code as
+# RECON.process_transactions, so a rules change can be replayed over a month of history
+# and compared with what was posted.
+
+SNAPSHOT_CUSTOMERS_SQL = "SELECT username AS customer_id, payment_terms FROM crm.customers"
+SNAPSHOT_POSTED_SQL = """
+    SELECT booking_date, remittance_info, reference, amount, discount, batch_id, entry_id
+    FROM fin.batch_transactions
+    WHERE booking_date BETWEEN %s AND %s
+"""
+
+CUSTOMER_COLUMNS = ['customer_id', 'payment_terms']
+POSTED_COLUMNS = ['bookingDate', 'remittanceInfo', 'customer_id', 'amount', 'discount', 'batch_id', 'entryId']
+BATCH_COLUMNS = ['bookingDate', 'batch_type', 'transactions', 'sub_total', 'discount', 'total']
+
+# Statement rows are matched to posted ones on these, plus their order among equal rows.
+# entry_id is not used: rows posted before it was recorded do not have one.
+ROW_KEY = ['bookingDate', 'remittanceInfo', 'cents', 'occurrence']
+ROW_FIELDS = ['customer_id', 'batch_type', 'discount']
+
+CUSTOMERS_FILE = 'customers.parquet'
+POSTED_FILE = 'posted.parquet'
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """
+    The database state a simulation needs, read once and kept in memory.
+
+    Args:
+        customers (pandas.DataFrame): customer_id and payment_terms, as crm.customers.
+        posted (pandas.DataFrame): POSTED_COLUMNS of the fin.batch_transactions rows in the window.
+    """
+
+    customers: pd.DataFrame
+    posted: pd.DataFrame
+
+    @classmethod
+    def from_db(cls, db_conn, from_date, to_date):
+        """
+        Read customers and the transactions posted in a window, in a read-only transaction.
+
+        Args:
+            db_conn (psycopg2.extensions.connection): The database connection object.
+            from_date (str or datetime.date): First booking date (YYYY-MM-DD).
+            to_date (str or datetime.date): Last booking date (YYYY-MM-DD).
+
+        Returns:
+            Snapshot: The snapshot.
+        """
+        try:
+            with db_conn.cursor() as cur:
+                cur.execute('SET TRANSACTION READ ONLY')
+                cur.execute(SNAPSHOT_CUSTOMERS_SQL)
+                customers = pd.DataFrame(cur.fetchall(), columns=CUSTOMER_COLUMNS)
+                cur.execute(SNAPSHOT_POSTED_SQL, (from_date, to_date))
+                posted = pd.DataFrame(cur.fetchall(), columns=POSTED_COLUMNS)
+        finally:
+            db_conn.rollback()
+        posted['amount'] = posted['amount'].astype(float)
+        posted['discount'] = posted['discount'].astype(float)
+        return cls(customers, posted)
+
+    @classmethod
+    def load(cls, directory):
+        """Read a snapshot written by save."""
+        return cls(pd.read_parquet(os.path.join(directory, CUSTOMERS_FILE)),
+                   pd.read_parquet(os.path.join(directory, POSTED_FILE)))
+
+    def save(self, directory):
+        """Write the snapshot as Parquet files, so later simulations need no database."""
+        os.makedirs(directory, exist_ok=True)
+        self.customers.to_parquet(os.path.join(directory, CUSTOMERS_FILE), index=False)
+        self.posted.to_parquet(os.path.join(directory, POSTED_FILE), index=False)
+
+    @staticmethod
+    def exists(directory):
+        return all(os.path.exists(os.path.join(directory, name)) for name in (CUSTOMERS_FILE, POSTED_FILE))
+
+
+def _batch_types(payment_terms):
+    return payment_terms.map({terms: batch_type for batch_type, terms in BATCH_TERMS.items()})
+
+
+def _batch_totals(df):
+    """Transactions and amounts per booking date and batch type."""
+    if 'total' not in df:
+        df = df.assign(total=df['amount'] + df['discount'])
+    totals = (
+        df.groupby(['bookingDate', 'batch_type'], sort=True)
+        .agg(transactions=('amount', 'size'), sub_total=('amount', 'sum'),
+             discount=('discount', 'sum'), total=('total', 'sum'))
+        .reset_index()
+    )
+    return totals.round({'sub_total': 2, 'discount': 2, 'total': 2})[BATCH_COLUMNS]
+
+
+def plan_batches(statement_df, customers, recon_client=None):
+    """
+    Work out the batches a recon run would post for a statement, in memory.
+
+    Args:
+        statement_df (pandas.DataFrame): Normalized transactions, as returned by a bank adapter.
+        customers (pandas.DataFrame): customer_id and payment_terms, e.g. Snapshot.customers.
+        recon_client (RECON): Supplies the extraction rules; a new one is made if omitted.
+
+    Returns:
+        dict:
+            - 'transactions' (pandas.DataFrame): Rows that would be posted, with customer_id,
+              payment_terms, discount, total and batch_type.
+            - 'unmatched' (pandas.DataFrame): Rows without a known customer, which are not posted.
+            - 'batches' (pandas.DataFrame): BATCH_COLUMNS per booking date and batch type.
+    """
+    recon_client = recon_client or RECON(None)
+    df = recon_client.match_customers(statement_df.copy(), customers)
+    unmatched = df[df['payment_terms'].isnull()].reset_index(drop=True)
+    df = recon_client.apply_discount_at_transaction_level(recon_client.apply_discounts(df))
+
+    transactions = pd.concat(
+        [batch.assign(batch_type=batch_type) for batch_type, batch in recon_client.split_batches(df).items()],
+        ignore_index=True)
+    return {'transactions': transactions, 'unmatched': unmatched, 'batches': _batch_totals(transactions)}
+
+
+def _keyed(df):
+    df = df.assign(cents=(df['amount'] * 100).round().astype('int64'))
+    return df.assign(occurrence=df.groupby(ROW_KEY[:-1], sort=False).cumcount())
+
+
+def diff_posted(plan, snapshot):
+    """
+    Compare a batch plan with what was posted for the same booking dates.
+
+    Posted rows get the batch type of their customer's payment terms in the snapshot.
+
+    Args:
+        plan (dict): As returned by plan_batches.
+        snapshot (Snapshot): Customers and posted transactions.
+
+    Returns:
+        dict:
+            - 'batches' (pandas.DataFrame): Planned and posted transactions and totals per booking
+              date and batch type, with total_delta = planned - posted.
+            - 'rows' (pandas.DataFrame): Statement rows that differ, with change 'new' (planned,
+              not posted), 'dropped' (posted, no longer planned) or 'changed' (customer,
+              batch type or discount differ).
+    """
+    planned = plan['transactions']
+    dates = set(planned['bookingDate']) | set(plan['unmatched']['bookingDate'])
+    posted = snapshot.posted[snapshot.posted['bookingDate'].isin(dates)]
+    terms = posted[['customer_id']].merge(snapshot.customers, how='left', on='customer_id')['payment_terms']
+    posted = posted.assign(batch_type=_batch_types(terms).fillna('UNKNOWN').to_numpy())
+
+    batches = _batch_totals(planned).merge(_batch_totals(posted), how='outer', on=['bookingDate', 'batch_type'],
+                                           suffixes=('_planned', '_posted'))
+    batches = batches.fillna(0).astype({'transactions_planned': int, 'transactions_posted': int})
+    batches['total_delta'] = (batches['total_planned'] - batches['total_posted']).round(2)
+
+    columns = ['remittanceInfo', 'amount', *ROW_FIELDS]
+    rows = _keyed(planned[['bookingDate', *columns]]).merge(
+        _keyed(posted[['bookingDate', *columns]]), how='outer', on=ROW_KEY, suffixes=('_planned', '_posted'),
+        indicator=True)
+    rows['amount'] = rows['amount_planned'].fillna(rows['amount_posted'])
+    differs = pd.Series(False, index=rows.index)
+    for field in ROW_FIELDS:
+        planned_value, posted_value = rows[f'{field}_planned'], rows[f'{field}_posted']
+        if field == 'discount':
+            differs |= (planned_value - posted_value).abs() >= 0.005
+        else:
+            differs |= planned_value.ne(posted_value)
+    rows['change'] = rows['_merge'].map({'left_only': 'new', 'right_only': 'dropped', 'both': 'changed'}).astype(str)
+    rows = rows[(rows['_merge'] != 'both') | differs]
+    rows = rows.drop(columns=['cents', 'occurrence', 'amount_planned', 'amount_posted', '_merge'])
+    rows = rows.sort_values(['bookingDate', 'change', 'remittanceInfo'], kind='stable').reset_index(drop=True)
+    return {'batches': batches, 'rows': rows}
+
+
+def simulate(fnb, account_number, from_date, to_date, snapshot, recon_client=None):
+    """
+    Plan a statement window and diff it against what was posted, without writing anything.
+
+    Args:
+        fnb (bank.adapters.BankAdapter): Statement source, e.g. the statement archive.
+        account_number (str): The account to simulate.
+        from_date (str): Window start (YYYY-MM-DD).
+        to_date (str): Window end (YYYY-MM-DD).
+        snapshot (Snapshot): Customers and posted transactions covering the window.
+        recon_client (RECON): Supplies the extraction rules; a new one is made if omitted.
+
+    Returns:
+        dict: 'plan' and 'diff' as returned by plan_batches and diff_posted, and 'seconds'
+            taken; both are None when the window has no transactions.
+    """
+    start_time = time.perf_counter()
+    statement_df = fnb.get_transaction_history(account_number, from_date, to_date)
+    if statement_df is None or statement_df.empty:
+        return {'plan': None, 'diff': None, 'seconds': round(time.perf_counter() - start_time, 3)}
+
+    plan = plan_batches(statement_df, snapshot.customers, recon_client)
+    diff = diff_posted(plan, snapshot)
+    return {'plan': plan, 'diff': diff, 'seconds': round(time.perf_counter() - start_time, 3)}
+
+
+def _records(df):
+    return json.loads(df.to_json(orient='records', date_format='iso'))
+
+
+def simulation_report(result, max_rows=1000):
+    """
+    The result of simulate as plain data, for JSON output.
+
+    Args:
+        result (dict): As returned by simulate.
+        max_rows (int): Most changed rows listed; the counts cover all of them.
+
+    Returns:
+        dict: Row counts, the planned batches, the batch diff and the changed rows.
+    """
+    plan, diff = result['plan'], result['diff']
+    if plan is None:
+        return {'rows': 0, 'seconds': result['seconds'], 'batches': [], 'diff': {'batches': [], 'rows': []}}
+
+    matched = len(plan['transactions'])
+    return {
+        'rows': matched + len(plan['unmatched']),
+        'matched': matched,
+        'unmatched': len(plan['unmatched']),
+        'seconds': result['seconds'],
+        'batches': _records(plan['batches']),
+        'diff': {
+            'changes': diff['rows']['change'].value_counts().to_dict(),
+            'batches': _records(diff['batches']),
+            'rows': _records(diff['rows'].head(max_rows)),
+        },
+    }
+
+
+def main(argv=None):
+    from dotenv import load_dotenv
+
+    from recon.extraction_rules import load_rules
+    from recon.pipeline import bank_adapter_from_env, db_config_from_env
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description='Dry-run recon over a statement window and diff it with what was posted.')
+    parser.add_argument('from_date', help='window start (YYYY-MM-DD)')
+    parser.add_argument('to_date', help='window end (YYYY-MM-DD)')
+    parser.add_argument('--account', default=os.getenv('SETTLEMENT_ACC'), help='account number (default: SETTLEMENT_ACC)')
+    parser.add_argument('--rules', help='extraction rules to try (default: RECON_RULES or recon/rules/fnb.json)')
+    parser.add_argument('--fetch', action='store_true',
+                        help='fetch statements from the bank instead of replaying the statement archive')
+    parser.add_argument('--snapshot', help='directory with a saved snapshot; written from the database if empty')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args(argv)
+
+    db_config = db_config_from_env()
+    if args.snapshot and Snapshot.exists(args.snapshot):
+        snapshot = Snapshot.load(args.snapshot)
+    else:
+        import psycopg2
+
+        db_conn = psycopg2.connect(**db_config)
+        try:
+            snapshot = Snapshot.from_db(db_conn, args.from_date, args.to_date)
+        finally:
+            db_conn.close()
+        if args.snapshot:
+            snapshot.save(args.snapshot)
+
+    recon_client = RECON(None)
+    if args.rules:
+        recon_client.extraction_rules = load_rules(args.rules)
+
+    # A dry run must not replace archived days with what it fetched
+    fnb = bank_adapter_from_env(db_config, replay=not args.fetch, archive=False)
+    report = simulation_report(simulate(fnb, args.account, args.from_date, args.to_date, snapshot, recon_client))
+    report_json = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as report_file:
+            report_file.write(report_json)
+    else:
+        print(report_json)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
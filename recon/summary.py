@@ -0,0 +1,147 @@
+import pandas as pd
+from psycopg2 import extras
+
+UPSERT_SQL = """
+    INSERT INTO fin.recon_daily_summary AS s
+    (summary_date, branch_code, payment_terms, customer_id,
+    transaction_count, sub_total, discount, total, last_batch_id)
+    VALUES %s
+    ON CONFLICT (summary_date, branch_code, payment_terms, customer_id) DO UPDATE SET
+        transaction_count = s.transaction_count + EXCLUDED.transaction_count,
+        sub_total = s.sub_total + EXCLUDED.sub_total,
+        discount = s.discount + EXCLUDED.discount,
+        total = s.total + EXCLUDED.total,
+        last_batch_id = EXCLUDED.last_batch_id,
+        updated_at = now()
+"""
+
+# Columns callers may group by; anything else is rejected before it reaches SQL.
+GROUP_COLUMNS = ('branch_code', 'payment_terms', 'customer_id')
+
+SUMMARY_COLUMNS = ['transaction_count', 'sub_total', 'discount', 'total']
+
+
+def aggregate_batch(batch_df, branch_code, batch_id):
+    """
+    Roll a posted batch up to one row per booking day, payment term and customer.
+
+    Args:
+        batch_df (pandas.DataFrame): Batch transactions with bookingDate, payment_terms, customer_id,
+            amount, discount and total columns.
+        branch_code (str): Branch the batch was posted for.
+        batch_id (int): The posted batch.
+
+    Returns:
+        list: Tuples in the column order of fin.recon_daily_summary, ready for execute_values.
+    """
+    if batch_df.empty:
+        return []
+
+    grouped = (
+        batch_df.groupby(['bookingDate', 'payment_terms', 'customer_id'], sort=False)
+        .agg(transaction_count=('amount', 'size'), sub_total=('amount', 'sum'),
+             discount=('discount', 'sum'), total=('total', 'sum'))
+        .reset_index()
+    )
+
+    return [
+        (row.bookingDate, branch_code, row.payment_terms, row.customer_id, int(row.transaction_count),
+         round(float(row.sub_total), 2), round(float(row.discount), 2), round(float(row.total), 2), batch_id)
+        for row in grouped.itertuples(index=False)
+    ]
+
+
+class ReconSummary:
+    """Incrementally maintained daily rollups of posted recon batches."""
+
+    def apply_batch(self, cur, batch_df, branch_code, batch_id):
+        """
+        Add a batch to the rollups using the caller's cursor.
+
+        The caller owns the transaction, so the rollup commits or rolls back together
+        with the general ledger posting.
+
+        Args:
+            cur (psycopg2.extensions.cursor): Cursor of the posting transaction.
+            batch_df (pandas.DataFrame): The posted batch transactions.
+            branch_code (str): Branch the batch was posted for.
+            batch_id (int): The posted batch.
+
+        Returns:
+            int: Number of rollup rows touched.
+        """
+        rows = aggregate_batch(batch_df, branch_code, batch_id)
+        if rows:
+            extras.execute_values(cur, UPSERT_SQL, rows)
+        return len(rows)
+
+    def daily_totals(self, db_conn, from_date, to_date, branch_code=None, payment_terms=None, customer_id=None):
+        """
+        Read daily rollups for a date range.
+
+        Args:
+            db_conn (psycopg2.extensions.connection): The database connection object.
+            from_date (str): First day to include (YYYY-MM-DD).
+            to_date (str): Last day to include (YYYY-MM-DD).
+            branch_code (str): Optional branch filter.
+            payment_terms (str): Optional payment term filter.
+            customer_id (str): Optional customer filter.
+
+        Returns:
+            pandas.DataFrame: One row per day, branch, payment term and customer.
+        """
+        filters = {'branch_code': branch_code, 'payment_terms': payment_terms, 'customer_id': customer_id}
+        where = ['summary_date BETWEEN %s AND %s']
+        params = [from_date, to_date]
+        for column, value in filters.items():
+            if value is not None:
+                where.append(f'{column} = %s')
+                params.append(value)
+
+        query = f"""
+            SELECT summary_date, branch_code, payment_terms, customer_id,
+                   transaction_count, sub_total, discount, total
+            FROM fin.recon_daily_summary
+            WHERE {' AND '.join(where)}
+            ORDER BY summary_date, branch_code, payment_terms, customer_id
+        """
+        return self._read_frame(db_conn, query, params,
+                                ['summary_date', *GROUP_COLUMNS, *SUMMARY_COLUMNS])
+
+    def monthly_totals(self, db_conn, from_date, to_date, group_by=('payment_terms',)):
+        """
+        Aggregate the daily rollups per calendar month.
+
+        Args:
+            db_conn (psycopg2.extensions.connection): The database connection object.
+            from_date (str): First day to include (YYYY-MM-DD).
+            to_date (str): Last day to include (YYYY-MM-DD).
+            group_by (tuple): Any of 'branch_code', 'payment_terms' and 'customer_id'.
+
+        Returns:
+            pandas.DataFrame: One row per month and group.
+        """
+        group_by = list(group_by)
+        unknown = set(group_by) - set(GROUP_COLUMNS)
+        if unknown:
+            raise ValueError(f"Cannot group recon summary by: {', '.join(sorted(unknown))}")
+
+        group_sql = ''.join(f', {column}' for column in group_by)
+        query = f"""
+            SELECT date_trunc('month', summary_date)::date AS month{group_sql},
+                   sum(transaction_count), sum(sub_total), sum(discount), sum(total)
+            FROM fin.recon_daily_summary
+            WHERE summary_date BETWEEN %s AND %s
+            GROUP BY 1{group_sql}
+            ORDER BY 1{group_sql}
+        """
+        return self._read_frame(db_conn, query, [from_date, to_date], ['month', *group_by, *SUMMARY_COLUMNS])
+
+    def _read_frame(self, db_conn, query, params, columns):
+        with db_conn.cursor() as cur:
+            cur.execute(query, params)
+            df = pd.DataFrame(cur.fetchall(), columns=columns)
+
+        for column in ('sub_total', 'discount', 'total'):
+            df[column] = df[column].astype(float)
+        return df
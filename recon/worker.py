@@ -0,0 +1,410 @@
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib import request as urlrequest
+
+import metrics
+from recon.migrate import migrate
+from recon.pipeline import bank_adapter_from_env, db_config_from_env, default_window, flush_outbox, reconcile_window
+from recon.recon_process import RECON
+
+tag = "🥦🥦🥦 Recon Worker 🥦 "
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class Schedule:
+    """
+    A small cron: run every N minutes aligned to the clock, and/or at fixed times of day.
+
+    Args:
+        every_minutes (int): Interval in minutes, e.g. 15 runs at :00, :15, :30 and :45.
+        at_times (list): 'HH:MM' times of day.
+    """
+
+    def __init__(self, every_minutes=None, at_times=()):
+        self.every_minutes = every_minutes
+        self.at_times = [datetime.strptime(value, '%H:%M').time() for value in at_times]
+
+    def __bool__(self):
+        return bool(self.every_minutes or self.at_times)
+
+    def next_run(self, after):
+        """
+        The first scheduled time strictly after the given datetime.
+
+        Args:
+            after (datetime.datetime): Reference time.
+
+        Returns:
+            datetime.datetime: Next run time, or None for an empty schedule.
+        """
+        candidates = []
+        midnight = after.replace(hour=0, minute=0, second=0, microsecond=0)
+
+        if self.every_minutes:
+            elapsed_minutes = (after - midnight) // timedelta(minutes=1)
+            slot = (elapsed_minutes // self.every_minutes + 1) * self.every_minutes
+            candidates.append(midnight + timedelta(minutes=slot))
+
+        for at_time in self.at_times:
+            candidate = datetime.combine(after.date(), at_time)
+            if candidate <= after:
+                candidate += timedelta(days=1)
+            candidates.append(candidate)
+
+        return min(candidates) if candidates else None
+
+
+class ReconWorker:
+    """
+    Resident recon process that keeps the bank token, DB pool and customer cache warm.
+
+    Runs are queued from the schedule, the local HTTP trigger or the CLI and executed by
+    a fixed number of threads. A window that is already queued or running is not queued
+    twice; across worker processes, overlapping windows are kept apart by reconcile_window's
+    window locks.
+
+    Args:
+        bank_api (bank.adapters.BankAdapter): Statement source shared by all runs.
+        db_pool (psycopg2.pool.ThreadedConnectionPool): Connection pool, one connection per running run.
+        account_number (str): The account to reconcile.
+        concurrency (int): Number of runs processed at the same time.
+        schedule (Schedule): Optional schedule for automatic runs.
+        customer_cache_seconds (int): How long the crm.customers snapshot is reused.
+        reconcile: Callable with the signature of recon.pipeline.reconcile_window.
+        history_size (int): Number of finished runs kept for status queries.
+        outbox_interval (float): Seconds between background drains of the email outbox; runs also
+            trigger a drain when they finish. 0 disables the background sender.
+    """
+
+    def __init__(self, bank_api, db_pool, account_number, concurrency=1, schedule=None,
+                 customer_cache_seconds=300, reconcile=reconcile_window, history_size=100, outbox_interval=60):
+        self.bank_api = bank_api
+        self.db_pool = db_pool
+        self.account_number = account_number
+        self.concurrency = concurrency
+        self.schedule = schedule or Schedule()
+        self.reconcile = reconcile
+        self.history_size = history_size
+        self.outbox_interval = outbox_interval
+
+        self.recon_client = RECON(None)
+        self.recon_client.customer_cache_seconds = customer_cache_seconds
+
+        self.queue = queue.Queue()
+        self.runs = OrderedDict()
+        self._active_windows = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._outbox_wake = threading.Event()
+        self._threads = []
+
+    def submit(self, from_date=None, to_date=None, trigger='manual'):
+        """
+        Queue a recon run for a statement window.
+
+        Args:
+            from_date (str): Window start (YYYY-MM-DD), defaults to the scheduled window.
+            to_date (str): Window end (YYYY-MM-DD), defaults to the scheduled window.
+            trigger (str): What asked for the run, e.g. 'schedule', 'http' or 'cli'.
+
+        Returns:
+            dict: The queued run, or the already queued/running run for the same window.
+        """
+        if not from_date or not to_date:
+            from_date, to_date = default_window()
+        window = (from_date, to_date)
+
+        with self._lock:
+            if window in self._active_windows:
+                return next(run for run in reversed(self.runs.values())
+                            if (run['from_date'], run['to_date']) == window and run['status'] in (QUEUED, RUNNING))
+
+            run = {
+                'run_id': uuid.uuid4().hex[:12],
+                'from_date': from_date,
+                'to_date': to_date,
+                'trigger': trigger,
+                'status': QUEUED,
+                'queued_at': datetime.now().isoformat(timespec='seconds'),
+            }
+            self._active_windows.add(window)
+            self.runs[run['run_id']] = run
+            self._trim_history()
+
+        self.queue.put(run['run_id'])
+        print(f"{tag} queued run {run['run_id']} for {from_date} - {to_date} ({trigger})")
+        return dict(run)
+
+    def status(self, run_id=None):
+        with self._lock:
+            if run_id:
+                run = self.runs.get(run_id)
+                return dict(run) if run else None
+            return [dict(run) for run in self.runs.values()]
+
+    def start(self):
+        for index in range(self.concurrency):
+            thread = threading.Thread(target=self._work, name=f'recon-worker-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+        if self.schedule:
+            thread = threading.Thread(target=self._run_schedule, name='recon-scheduler', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+        if self.outbox_interval:
+            thread = threading.Thread(target=self._send_outbox, name='recon-outbox', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=None):
+        """Stop taking new work, wait for running runs to finish and send what they queued."""
+        self._stop.set()
+        self._outbox_wake.set()
+        for _ in range(self.concurrency):
+            self.queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        flush_outbox(self.recon_client)
+
+    def join_queue(self):
+        """Block until every queued run has been processed."""
+        self.queue.join()
+
+    def _work(self):
+        while True:
+            run_id = self.queue.get()
+            try:
+                if run_id is None:
+                    return
+                self._execute(run_id)
+            finally:
+                self.queue.task_done()
+
+    def _execute(self, run_id):
+        with self._lock:
+            run = self.runs[run_id]
+            run['status'] = RUNNING
+            run['started_at'] = datetime.now().isoformat(timespec='seconds')
+
+        start_time = time.time()
+        db_conn = None
+        try:
+            # Inside the try: an exhausted pool or a database that is down fails this run, not the thread
+            db_conn = self.db_pool.getconn()
+            result = self.reconcile(self.bank_api, db_conn, self.account_number,
+                                    run['from_date'], run['to_date'], recon_client=self.recon_client)
+            status, details = DONE, {'result': result}
+        except Exception as e:
+            print(f"{tag} 👿 run {run_id} failed: {e}")
+            status, details = FAILED, {'error': str(e)}
+        finally:
+            if db_conn is not None:
+                # Leave no open transaction behind on a pooled connection
+                db_conn.rollback()
+                self.db_pool.putconn(db_conn)
+
+        metrics.RUN_SECONDS.labels(status=status).observe(time.time() - start_time)
+        with self._lock:
+            run.update(details, status=status, elapsed_seconds=round(time.time() - start_time, 3))
+            self._active_windows.discard((run['from_date'], run['to_date']))
+        print(f"{tag} run {run_id} {status} in {run['elapsed_seconds']}s")
+        self._outbox_wake.set()
+
+    def _send_outbox(self):
+        while not self._stop.is_set():
+            self._outbox_wake.wait(self.outbox_interval)
+            self._outbox_wake.clear()
+            if self._stop.is_set():
+                return
+            flush_outbox(self.recon_client)
+
+    def _run_schedule(self):
+        while not self._stop.is_set():
+            next_run = self.schedule.next_run(datetime.now())
+            print(f"{tag} next scheduled run at {next_run.isoformat(timespec='minutes')}")
+            if self._stop.wait(max((next_run - datetime.now()).total_seconds(), 0)):
+                return
+            self.submit(trigger='schedule')
+
+    def _trim_history(self):
+        finished = [run_id for run_id, run in self.runs.items() if run['status'] in (DONE, FAILED)]
+        for run_id in finished[:max(len(self.runs) - self.history_size, 0)]:
+            del self.runs[run_id]
+
+
+class _TriggerHandler(BaseHTTPRequestHandler):
+    """
+    Local HTTP trigger: POST /runs queues a run, GET /runs[/<id>] reports status,
+    GET /outbox counts queued report emails by status, GET /metrics for Prometheus.
+    """
+
+    def do_POST(self):
+        if self.path.rstrip('/') != '/runs':
+            return self._send(404, {'error': 'not found'})
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            body = json.loads(self.rfile.read(length)) if length else {}
+        except ValueError:
+            return self._send(400, {'error': 'body is not valid JSON'})
+        if not isinstance(body, dict):
+            return self._send(400, {'error': 'body must be a JSON object'})
+
+        window = {}
+        for name in ('from_date', 'to_date'):
+            try:
+                window[name] = body.get(name) and date.fromisoformat(body[name]).isoformat()
+            except (TypeError, ValueError):
+                return self._send(400, {'error': f'{name} must be a YYYY-MM-DD date'})
+        if bool(window['from_date']) != bool(window['to_date']):
+            return self._send(400, {'error': 'from_date and to_date must be given together'})
+        if window['from_date'] and window['from_date'] > window['to_date']:
+            return self._send(400, {'error': 'to_date is before from_date'})
+
+        run = self.server.worker.submit(window['from_date'], window['to_date'], trigger='http')
+        self._send(202, run)
+
+    def do_GET(self):
+        path = self.path.rstrip('/')
+        if path == '/metrics':
+            body = metrics.exposition()
+            self.send_response(200)
+            self.send_header('Content-Type', metrics.CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if path == '/health':
+            return self._send(200, {'status': 'ok', 'queued': self.server.worker.queue.qsize()})
+        if path == '/outbox':
+            return self._send(200, self.server.worker.recon_client.outbox.counts())
+        if path == '/runs':
+            return self._send(200, {'runs': self.server.worker.status()})
+        if path.startswith('/runs/'):
+            run = self.server.worker.status(path.rsplit('/', 1)[1])
+            return self._send(200, run) if run else self._send(404, {'error': 'unknown run'})
+        self._send(404, {'error': 'not found'})
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_http(worker, host='127.0.0.1', port=8090):
+    """Start the local trigger endpoint in a background thread and return the server."""
+    httpd = ThreadingHTTPServer((host, port), _TriggerHandler)
+    httpd.worker = worker
+    threading.Thread(target=httpd.serve_forever, name='recon-trigger', daemon=True).start()
+    return httpd
+
+
+def build_worker(concurrency, schedule, customer_cache_seconds, replay=False, outbox_interval=60):
+    """Create a worker wired to the statement source (or the archive, to replay) and the migrated database."""
+    from psycopg2 import pool
+
+    db_config = db_config_from_env()
+    bank_api = bank_adapter_from_env(db_config, replay=replay)
+    db_pool = pool.ThreadedConnectionPool(1, concurrency, **db_config)
+    db_conn = db_pool.getconn()
+    try:
+        migrate(db_conn)
+    finally:
+        db_pool.putconn(db_conn)
+    return ReconWorker(bank_api, db_pool, os.getenv('SETTLEMENT_ACC'), concurrency=concurrency,
+                       schedule=schedule, customer_cache_seconds=customer_cache_seconds,
+                       outbox_interval=outbox_interval)
+
+
+def _trigger(url, from_date, to_date):
+    payload = json.dumps({'from_date': from_date, 'to_date': to_date}).encode()
+    req = urlrequest.Request(f'{url.rstrip("/")}/runs', data=payload, method='POST',
+                             headers={'Content-Type': 'application/json'})
+    with urlrequest.urlopen(req) as response:
+        return json.loads(response.read())
+
+
+def main():
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description='Resident FNB recon worker.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve = commands.add_parser('serve', help='run the worker with its schedule and HTTP trigger')
+    serve.add_argument('--every', type=int, default=int(os.getenv('RECON_EVERY_MINUTES', '0')) or None,
+                       help='run every N minutes')
+    serve.add_argument('--at', default=os.getenv('RECON_AT_TIMES', ''), help='comma separated HH:MM run times')
+    serve.add_argument('--concurrency', type=int, default=int(os.getenv('RECON_WORKER_CONCURRENCY', '1')))
+    serve.add_argument('--customer-cache-seconds', type=int, default=300)
+    serve.add_argument('--outbox-interval', type=float, default=float(os.getenv('RECON_OUTBOX_INTERVAL', '60')),
+                       help='seconds between retries of unsent report emails')
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=int(os.getenv('RECON_WORKER_PORT', '8090')))
+
+    for name, help_text in (('trigger', 'queue a run on a running worker'),
+                            ('run-once', 'run one window in this process and exit')):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument('--from', dest='from_date')
+        command.add_argument('--to', dest='to_date')
+        if name == 'trigger':
+            command.add_argument('--url', default=os.getenv('RECON_WORKER_URL', 'http://127.0.0.1:8090'))
+        else:
+            command.add_argument('--replay', action='store_true',
+                                 help='read the window from the statement archive instead of the bank')
+
+    args = parser.parse_args()
+
+    if args.command == 'trigger':
+        print(json.dumps(_trigger(args.url, args.from_date, args.to_date), indent=2))
+        return
+
+    if args.command == 'run-once':
+        worker = build_worker(1, None, 0, replay=args.replay).start()
+        worker.submit(args.from_date, args.to_date, trigger='cli')
+        worker.join_queue()
+        # Sends the report emails the run queued
+        worker.stop()
+        print(f"{tag} metrics written to {metrics.write_textfile()}")
+        return
+
+    schedule = Schedule(args.every, [value for value in args.at.split(',') if value])
+    worker = build_worker(args.concurrency, schedule, args.customer_cache_seconds,
+                          outbox_interval=args.outbox_interval).start()
+    httpd = serve_http(worker, args.host, args.port)
+    print(f"{tag} listening on http://{args.host}:{httpd.server_port} with concurrency {args.concurrency}")
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print(f"{tag} stopping ...")
+    finally:
+        httpd.shutdown()
+        worker.stop()
+        worker.db_pool.closeall()
+
+
+if __name__ == '__main__':
+    main()
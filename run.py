@@ -1,42 +1,284 @@
+import argparse
+import json
+import os
+import signal
 import subprocess
+import sys
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime
 
 
 tag = "🍎🍎🍎 The Robot Runner 🍎"
-import sys
-import os
 
-sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../")
-def run_command(command):
+OK = 'ok'
+FAILED = 'failed'
+TIMEOUT = 'timeout'
+SKIPPED = 'skipped'
+CANCELLED = 'cancelled'
+
+ROBOT_SPACE = os.getenv('ROBOT_SPACE', 'tiger-robot')
+
+# Seconds a stopped step gets to exit after the polite signal before it is killed
+KILL_GRACE_SECONDS = 10
+
+# Each step runs in its own process group, so stopping it also stops what its shell started
+if os.name == 'nt':
+    PROCESS_GROUP = {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+else:
+    PROCESS_GROUP = {'start_new_session': True}
+
+# pull -> build the holotree environment -> run the robot -> push. Steps without a
+# shared dependency run in parallel; add more with --graph.
+DEFAULT_GRAPH = [
+    {'name': 'pull', 'command': './pull.sh'},
+    {'name': 'env', 'command': f'rcc holotree variables --robot robot.yaml --space {ROBOT_SPACE}', 'needs': ['pull']},
+    {'name': 'run', 'command': f'rcc task run --robot robot.yaml --space {ROBOT_SPACE} --task "Run Task"',
+     'needs': ['env'], 'timeout': 3600},
+    {'name': 'push', 'command': './push.sh "🅿️ robot run {timestamp}"', 'needs': ['run']},
+]
+
+
+@dataclass
+class Step:
+    """A shell command in the run graph."""
+
+    name: str
+    command: str
+    needs: list = field(default_factory=list)
+    timeout: float = None
+
+
+@dataclass
+class StepResult:
+    name: str
+    status: str
+    returncode: int = None
+    elapsed: float = 0.0
+    log_path: str = None
+
+
+def load_graph(steps):
+    """
+    Build and validate Steps from dicts ({'name', 'command', 'needs', 'timeout'}).
+
+    Raises:
+        ValueError: On duplicate names, unknown dependencies or cycles.
+    """
+    graph = [step if isinstance(step, Step) else Step(**step) for step in steps]
+    names = [step.name for step in graph]
+    if len(names) != len(set(names)):
+        raise ValueError(f"Duplicate step names in {names}")
+
+    by_name = {step.name: step for step in graph}
+    for step in graph:
+        unknown = set(step.needs) - set(by_name)
+        if unknown:
+            raise ValueError(f"Step '{step.name}' needs unknown steps: {', '.join(sorted(unknown))}")
+
+    # Depth-first search for cycles
+    visiting, visited = set(), set()
+
+    def visit(name, path):
+        if name in visiting:
+            raise ValueError(f"Dependency cycle: {' -> '.join(path + [name])}")
+        if name in visited:
+            return
+        visiting.add(name)
+        for dependency in by_name[name].needs:
+            visit(dependency, path + [name])
+        visiting.discard(name)
+        visited.add(name)
+
+    for name in names:
+        visit(name, [])
+    return graph
+
+
+class Runner:
+    """
+    Runs a step graph with independent steps in parallel.
+
+    Each step's stdout and stderr stream live to <log_dir>/<step>.log. A failed or
+    timed out step skips everything that depends on it; cancel() (or Ctrl+C) stops
+    running steps and skips the rest.
+
+    Args:
+        steps (list): Step objects or dicts accepted by load_graph.
+        max_workers (int): Maximum number of steps running at the same time.
+        log_dir (str): Directory for the per-step log files.
+        kill_grace_seconds (float): Time a stopped step gets to exit before it is killed.
+    """
+
+    def __init__(self, steps, max_workers=4, log_dir='output', kill_grace_seconds=KILL_GRACE_SECONDS):
+        self.steps = load_graph(steps)
+        self.max_workers = max_workers
+        self.log_dir = log_dir
+        self.kill_grace_seconds = kill_grace_seconds
+        self.results = {}
+        self._processes = {}
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+
+    def run(self):
+        """
+        Execute the graph.
+
+        Returns:
+            list: StepResult per step, in graph order.
+        """
+        os.makedirs(self.log_dir, exist_ok=True)
+        pending = {step.name: step for step in self.steps}
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                if self._cancelled.is_set():
+                    for name in list(pending):
+                        self.results[name] = StepResult(name, CANCELLED)
+                        del pending[name]
+
+                for name, step in list(pending.items()):
+                    dependency_results = [self.results.get(dependency) for dependency in step.needs]
+                    if any(result and result.status != OK for result in dependency_results):
+                        print(f"{tag} Skipping 🔴 {name} - a dependency did not succeed")
+                        self.results[name] = StepResult(name, SKIPPED)
+                        del pending[name]
+                    elif all(dependency_results) and len(running) < self.max_workers:
+                        running[executor.submit(self._run_step, step)] = name
+                        del pending[name]
+
+                if not running:
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self.results[running.pop(future)] = future.result()
+
+        return [self.results[step.name] for step in self.steps]
+
+    def cancel(self):
+        """Stop running steps and skip everything that has not started."""
+        self._cancelled.set()
+        with self._lock:
+            processes = list(self._processes.values())
+        # Stopped side by side, and off the caller's thread, which may be a signal handler
+        for process in processes:
+            threading.Thread(target=self._kill, args=(process,), daemon=True).start()
+
+    def _run_step(self, step):
+        log_path = os.path.join(self.log_dir, f"{step.name}.log")
+        command = step.command.replace('{timestamp}', datetime.now().strftime('%Y-%m-%d %H:%M'))
+        print(f"{tag} Running {step.name}:  🔵 {command}  🔵  (log: {log_path})")
+
+        start_time = time.time()
+        with open(log_path, 'w') as log_file:
+            process = subprocess.Popen(command, shell=True, stdout=log_file, stderr=subprocess.STDOUT,
+                                       text=True, **PROCESS_GROUP)
+            with self._lock:
+                self._processes[step.name] = process
+            try:
+                returncode = process.wait(timeout=step.timeout)
+                status = OK if returncode == 0 else FAILED
+            except subprocess.TimeoutExpired:
+                self._kill(process)
+                returncode = process.wait()
+                status = TIMEOUT
+            finally:
+                with self._lock:
+                    self._processes.pop(step.name, None)
+
+        if self._cancelled.is_set() and status != OK:
+            status = CANCELLED
 
+        elapsed = time.time() - start_time
+        if status == OK:
+            print(f"{tag} {step.name} executed successfully. 🥬 Elapsed time: 🌼 {elapsed:.2f} seconds")
+        else:
+            print(f"{tag} Error: 👿👿👿 {step.name} {status} with return code {returncode}.")
+            print(f"{tag} Last lines of {log_path}:\n{tail(log_path)}")
+        return StepResult(step.name, status, returncode, elapsed, log_path)
+
+    def _kill(self, process):
+        """Ask a step's process group to stop, and kill it if it is still running after the grace period."""
+        try:
+            if os.name == 'nt':
+                process.send_signal(signal.CTRL_BREAK_EVENT)
+            else:
+                os.killpg(process.pid, signal.SIGTERM)
+        except OSError:
+            pass
+        try:
+            process.wait(timeout=self.kill_grace_seconds)
+        except subprocess.TimeoutExpired:
+            print(f"{tag} Process {process.pid} ignored the stop signal, killing it.")
+            try:
+                if os.name == 'nt':
+                    process.kill()
+                else:
+                    os.killpg(process.pid, signal.SIGKILL)
+            except OSError:
+                pass
+
+
+def tail(path, lines=20):
+    with open(path, errors='replace') as log_file:
+        return ''.join(log_file.readlines()[-lines:])
+
+
+def format_timing_table(results):
+    """Per-step status and elapsed time as a plain text table."""
+    width = max([len('STEP')] + [len(result.name) for result in results])
+    rows = [f"{'STEP':<{width}}  {'STATUS':<9}  {'RC':>4}  {'SECONDS':>8}"]
+    for result in results:
+        returncode = '' if result.returncode is None else result.returncode
+        rows.append(f"{result.name:<{width}}  {result.status:<9}  {returncode:>4}  {result.elapsed:>8.2f}")
+    rows.append(f"{'total':<{width}}  {'':<9}  {'':>4}  {sum(r.elapsed for r in results):>8.2f}")
+    return '\n'.join(rows)
+
+
+def run_command(command, timeout=None, log_dir='output'):
     """Runs a terminal command and checks for successful execution.
 
     Args:
         command: The command to execute as a string.
+        timeout: Optional timeout in seconds.
+        log_dir: Directory for the command log.
 
     Returns:
         True if the command executed successfully, False otherwise.
     """
+    results = Runner([Step('command', command, timeout=timeout)], max_workers=1, log_dir=log_dir).run()
+    return results[0].status == OK
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the robot command graph.')
+    parser.add_argument('--graph', help='JSON file with a list of steps, or {"steps": [...]}')
+    parser.add_argument('--only', help='comma separated step names to run (dependencies are not added)')
+    parser.add_argument('--max-workers', type=int, default=4)
+    parser.add_argument('--log-dir', default='output')
+    args = parser.parse_args(argv)
+
+    steps = DEFAULT_GRAPH
+    if args.graph:
+        with open(args.graph) as graph_file:
+            steps = json.load(graph_file)
+        steps = steps['steps'] if isinstance(steps, dict) else steps
+    if args.only:
+        wanted = set(args.only.split(','))
+        steps = [{**step, 'needs': [n for n in step.get('needs', []) if n in wanted]}
+                 for step in steps if step['name'] in wanted]
+
+    runner = Runner(steps, max_workers=args.max_workers, log_dir=args.log_dir)
+    signal.signal(signal.SIGINT, lambda signum, frame: runner.cancel())
+
+    results = runner.run()
+    print(f"\n{tag} Timing:\n{format_timing_table(results)}\n")
+    return 0 if all(result.status == OK for result in results) else 1
+
 
-    start_time = time.time()
-    print(f"{tag} Running command:  🔵 {command}  🔵")
-    process = subprocess.run(command, shell=True, capture_output=True, text=True)
-    elapsed_time = time.time() - start_time
-
-    global total_elapsed_seconds  # Tell the function to use the global variable
-    total_elapsed_seconds += elapsed_time  # Use the += operator for clarity
-
-    # Check if the command executed successfully
-    if process.returncode == 0:
-        print(
-            f"{tag} Command executed successfully. 🥬 Elapsed time: 🌼 {elapsed_time:.2f} seconds\n"
-        )
-        return True
-    else:
-        print(
-            f"{tag} Error: 👿👿👿 Command failed with return code {process.returncode}.\n"
-        )
-        print(f"{tag} Error: {process.stderr}\n")
-        return False
-
-    COMMAND = """ /usr/bin/env /var/folders/xg/dm5xlygj10n4b2pkmmkwhdpw0000gn/T/rf-ls-run/run_env_00_pddxx6fv.sh /Users/aubreymalabie/.vscode/extensions/robocorp.robocorp-code-1.22.3-darwin-arm64/bin/rcc task run --robot /Users/aubreymalabie/Work/liza-work/tiger-robot/robot.yaml --space vscode-03 --workspace e5176ebb-dd4d-467f-b716-24fa52393e8c --account robocorp-code --task Run\ Task --controller RobocorpCode """
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,219 @@
+import argparse
+import base64
+import binascii
+import json
+import re
+import secrets
+import threading
+import time
+import zlib
+from datetime import date
+from urllib.parse import parse_qs, urlencode
+
+from sandbox.stub_http import StubHandler, StubServer
+from sandbox.synthetic_fnb import generate_statement
+
+tag = "🥦🥦🥦 FNB Stand-in 🥦 "
+
+HISTORY_PATH = re.compile(r'/transaction-history/retrieve/v2/(?P<account>[^/]+)$')
+
+
+class FNBHandler(StubHandler):
+    """OAuth token and transaction-history endpoints in the shape BankAPI expects."""
+
+    def handle_post(self, path, query, body):
+        if path.endswith('/token') or path.endswith('/token/v2'):
+            form = {key: values[-1] for key, values in parse_qs(body.decode()).items()}
+            self.server.record_token_request(form)
+            if not self.server.credentials_are_valid(self.headers.get('Authorization'), form):
+                return 401, {'error': 'invalid_client'}, {}
+            return 200, self.server.issue_token(), {}
+        return 404, {'error': 'not found'}, {}
+
+    def handle_get(self, path, query):
+        match = HISTORY_PATH.search(path)
+        if not match:
+            return 404, {'error': 'not found'}, {}
+
+        server = self.server
+        token = (self.headers.get('Authorization') or '').removeprefix('Bearer ')
+        if not server.token_is_valid(token) or server.chance(server.unauthorized_rate):
+            return 401, {'error': 'invalid_token'}, {}
+        if server.chance(server.rate_limit_rate):
+            return 429, {'error': 'too_many_requests'}, {'Retry-After': server.retry_after}
+        if server.chance(server.server_error_rate):
+            return 503, {'error': 'service_unavailable'}, {}
+
+        body = server.statement_page(match.group('account'), query.get('fromDate'), query.get('toDate'),
+                                     int(query.get('page', 0)))
+        if body is None:
+            return 204, None, {}
+        return 200, body, {'Content-Type': 'application/json'}
+
+
+class FNBServer(StubServer):
+    """Local stand-in for the FNB OAuth and transaction-history API.
+
+    Args:
+        rows (int): Entries returned per statement window.
+        page_size (int): Entries per page, 0 returns the whole window in one response.
+        token_ttl (float): Seconds an issued access token stays valid.
+        unauthorized_rate (float): Share of history requests answered with 401.
+        rate_limit_rate (float): Share of history requests answered with 429.
+        server_error_rate (float): Share of history requests answered with 503.
+        retry_after (int): Retry-After seconds sent with 429 responses.
+        client_secret (str): When set, token requests must carry it, as Basic auth or in the form.
+        **kwargs: Passed to StubServer (host, port, latency_ms, jitter_ms, seed).
+    """
+
+    def __init__(self, rows=1000, page_size=0, token_ttl=3600, unauthorized_rate=0.0,
+                 rate_limit_rate=0.0, server_error_rate=0.0, retry_after=1, client_secret=None, **kwargs):
+        super().__init__(FNBHandler, **kwargs)
+        self.rows = rows
+        self.page_size = page_size
+        self.token_ttl = token_ttl
+        self.unauthorized_rate = unauthorized_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.server_error_rate = server_error_rate
+        self.retry_after = retry_after
+        self.client_secret = client_secret
+        self.token_requests = []
+        self.statement = None
+        self._tokens = {}
+        self._windows = {}
+        self._pages = {}
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return self.url
+
+    @property
+    def auth_url(self):
+        return f'{self.url}/oauth2/token/v2'
+
+    def configure(self, **settings):
+        super().configure(**settings)
+        with self._lock:
+            self._windows.clear()
+            self._pages.clear()
+
+    def config_dict(self):
+        return {
+            **super().config_dict(),
+            'rows': self.rows,
+            'page_size': self.page_size,
+            'token_ttl': self.token_ttl,
+            'unauthorized_rate': self.unauthorized_rate,
+            'rate_limit_rate': self.rate_limit_rate,
+            'server_error_rate': self.server_error_rate,
+            'retry_after': self.retry_after,
+        }
+
+    def load_statement(self, statement):
+        """Serve a fixed response body for every window; None goes back to generated windows."""
+        self.configure(statement=statement)
+
+    def record_token_request(self, form):
+        with self._lock:
+            self.token_requests.append(form)
+
+    def credentials_are_valid(self, authorization, form):
+        if self.client_secret is None:
+            return True
+        if form.get('client_secret') == self.client_secret:
+            return True
+        try:
+            decoded = base64.b64decode((authorization or '').removeprefix('Basic ')).decode()
+        except (binascii.Error, UnicodeDecodeError):
+            return False
+        return decoded.partition(':')[2] == self.client_secret
+
+    def issue_token(self):
+        token = secrets.token_urlsafe(24)
+        with self._lock:
+            self._tokens[token] = time.monotonic() + self.token_ttl
+        return {'access_token': token, 'token_type': 'Bearer', 'expires_in': self.token_ttl}
+
+    def token_is_valid(self, token):
+        with self._lock:
+            expires_at = self._tokens.get(token)
+        return expires_at is not None and expires_at > time.monotonic()
+
+    def statement_page(self, account, from_date, to_date, page):
+        """Encoded JSON for one page of a statement window, or None when the window is empty."""
+        key = (account, from_date, to_date, page)
+        with self._lock:
+            if key in self._pages:
+                return self._pages[key]
+
+        entries = self._window_entries(account, from_date, to_date)
+        if not entries:
+            body = None
+        elif not self.page_size:
+            body = json.dumps({'entry': entries}).encode()
+        else:
+            start = page * self.page_size
+            payload = {'entry': entries[start:start + self.page_size]}
+            if start + self.page_size < len(entries):
+                next_query = urlencode({'fromDate': from_date, 'toDate': to_date, 'page': page + 1})
+                payload['links'] = {'next': f'{self.url}/transaction-history/retrieve/v2/{account}?{next_query}'}
+            body = json.dumps(payload).encode()
+
+        with self._lock:
+            self._pages[key] = body
+        return body
+
+    def _window_entries(self, account, from_date, to_date):
+        if self.statement is not None:
+            return self.statement['entry']
+
+        key = (account, from_date, to_date)
+        with self._lock:
+            entries = self._windows.get(key)
+        if entries is None:
+            start = date.fromisoformat(from_date) if from_date else date.today()
+            end = date.fromisoformat(to_date) if to_date else start
+            days = max((end - start).days, 1)
+            seed = zlib.crc32('|'.join(map(str, key)).encode())
+            entries = generate_statement(self.rows, from_date=start, days=days, seed=seed)['entry']
+            with self._lock:
+                self._windows[key] = entries
+        return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for the FNB transaction-history API.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8085)
+    parser.add_argument('--rows', type=int, default=1000, help='entries per statement window')
+    parser.add_argument('--page-size', type=int, default=0, help='entries per page, 0 disables paging')
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--token-ttl', type=float, default=3600)
+    parser.add_argument('--unauthorized-rate', type=float, default=0.0, help='share of 401 responses')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='share of 429 responses')
+    parser.add_argument('--server-error-rate', type=float, default=0.0, help='share of 503 responses')
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    server = FNBServer(rows=args.rows, page_size=args.page_size, token_ttl=args.token_ttl,
+                       unauthorized_rate=args.unauthorized_rate, rate_limit_rate=args.rate_limit_rate,
+                       server_error_rate=args.server_error_rate, retry_after=args.retry_after,
+                       host=args.host, port=args.port, latency_ms=args.latency_ms,
+                       jitter_ms=args.jitter_ms, seed=args.seed)
+
+    print(f"{tag} listening on {server.url}")
+    print(f"{tag} export BASE_URL={server.base_url}")
+    print(f"{tag} export AUTH_URL={server.auth_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
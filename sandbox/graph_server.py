@@ -0,0 +1,145 @@
+import argparse
+import json
+import os
+import secrets
+import threading
+import time
+from pathlib import Path
+
+from sandbox.stub_http import StubHandler, StubServer
+
+tag = "🍎🍎🍎 Graph Mail Stand-in 🍎 "
+
+TENANT = 'stand-in-tenant'
+
+
+def stand_in_mail_account(graph_url):
+    """
+    An O365 account that sends through a Graph stand-in at graph_url. RECON uses it when
+    GRAPH_URL is set, the way BASE_URL and AUTH_URL point the bank client at the FNB stub.
+
+    Returns:
+        tuple: (O365.Account, list of scopes)
+    """
+    from O365 import Account, MSGraphProtocol
+    from O365.utils.token import FileSystemTokenBackend
+
+    graph_url = graph_url.rstrip('/')
+    if graph_url.startswith('http://'):
+        # oauthlib refuses plain http token endpoints unless told otherwise
+        os.environ.setdefault('OAUTHLIB_INSECURE_TRANSPORT', '1')
+
+    protocol_class = type('StandInGraphProtocol', (MSGraphProtocol,), {'_protocol_url': graph_url + '/'})
+    token_backend = FileSystemTokenBackend(token_path='.', token_filename='o365_stand_in_token.txt')
+    account = Account(('stand-in', 'stand-in'), auth_flow_type='credentials', tenant_id=TENANT,
+                      token_backend=token_backend, protocol=protocol_class())
+    account.con._oauth2_token_url = f'{graph_url}/{TENANT}/oauth2/v2.0/token'
+    return account, ['https://graph.microsoft.com/.default']
+
+
+class GraphMailHandler(StubHandler):
+    """Client-credentials token endpoint and a sendMail sink in the shape O365 calls."""
+
+    def handle_post(self, path, query, body):
+        server = self.server
+        if path.endswith('/oauth2/v2.0/token'):
+            return 200, server.issue_token(), {}
+
+        if path.endswith('/sendMail'):
+            if server.chance(server.failure_rate):
+                return 503, {'error': {'code': 'ServiceUnavailable'}}, {}
+            server.record_message(path, json.loads(body or b'{}'))
+            return 202, None, {}
+
+        return 404, {'error': 'not found'}, {}
+
+    def handle_get(self, path, query):
+        if path == '/messages':
+            return 200, {'value': self.server.messages_summary()}, {}
+        return 404, {'error': 'not found'}, {}
+
+
+class GraphMailServer(StubServer):
+    """Local stand-in for the Microsoft identity token endpoint and Graph sendMail.
+
+    Args:
+        failure_rate (float): Share of sendMail calls answered with 503.
+        outbox_dir (str): Directory every accepted message is written to as JSON, None keeps them in memory only.
+        **kwargs: Passed to StubServer (host, port, latency_ms, jitter_ms, seed).
+    """
+
+    def __init__(self, failure_rate=0.0, outbox_dir=None, **kwargs):
+        super().__init__(GraphMailHandler, **kwargs)
+        self.failure_rate = failure_rate
+        self.outbox_dir = Path(outbox_dir) if outbox_dir else None
+        self.messages = []
+        self._lock = threading.Lock()
+
+    @property
+    def graph_url(self):
+        return self.url
+
+    @property
+    def auth_url(self):
+        return f'{self.url}/{TENANT}/oauth2/v2.0/token'
+
+    def config_dict(self):
+        return {**super().config_dict(), 'failure_rate': self.failure_rate}
+
+    def issue_token(self):
+        return {'access_token': secrets.token_urlsafe(24), 'token_type': 'Bearer', 'expires_in': 3600}
+
+    def record_message(self, path, payload):
+        message = payload.get('message', {})
+        with self._lock:
+            self.messages.append({'path': path, 'received_at': time.time(), 'message': message})
+            sequence = len(self.messages)
+
+        if self.outbox_dir:
+            self.outbox_dir.mkdir(parents=True, exist_ok=True)
+            (self.outbox_dir / f'message_{sequence:06d}.json').write_text(json.dumps(payload))
+
+    def mail_account(self):
+        """An O365 account that sends through this stand-in, for RECON.mail_account."""
+        return stand_in_mail_account(self.graph_url)
+
+    def messages_summary(self):
+        with self._lock:
+            return [
+                {
+                    'subject': item['message'].get('subject'),
+                    'to': [r['emailAddress']['address'] for r in item['message'].get('toRecipients', [])],
+                    'attachments': [a.get('name') for a in item['message'].get('attachments', [])],
+                    'bytes': sum(len(a.get('contentBytes', '')) for a in item['message'].get('attachments', [])),
+                }
+                for item in self.messages
+            ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for the Graph sendMail API.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8086)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='share of 503 responses from sendMail')
+    parser.add_argument('--outbox-dir', default=None, help='write every accepted message here as JSON')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    server = GraphMailServer(failure_rate=args.failure_rate, outbox_dir=args.outbox_dir,
+                             host=args.host, port=args.port, latency_ms=args.latency_ms,
+                             jitter_ms=args.jitter_ms, seed=args.seed)
+
+    print(f"{tag} listening on {server.url}")
+    print(f"{tag} export GRAPH_URL={server.graph_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Base request handler for the local stand-in services.
+
+    Subclasses implement handle_get/handle_post and return (status, payload, headers).
+    Payloads are dicts (sent as JSON), bytes, or None for an empty body.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self._dispatch(self.handle_get)
+
+    def do_POST(self):
+        self._dispatch(self.handle_post)
+
+    def handle_get(self, path, query):
+        return 404, {'error': 'not found'}, {}
+
+    def handle_post(self, path, query, body):
+        return 404, {'error': 'not found'}, {}
+
+    def _dispatch(self, handler):
+        url = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        if url.path.startswith('/_admin/'):
+            status, payload, headers = self._handle_admin(url.path, self._read_body())
+        else:
+            self.server.delay()
+            if handler == self.handle_post:
+                status, payload, headers = handler(url.path, query, self._read_body())
+            else:
+                status, payload, headers = handler(url.path, query)
+            self.server.stats[f'{self.command} {status}'] += 1
+
+        self._send(status, payload, headers)
+
+    def _handle_admin(self, path, body):
+        if path == '/_admin/stats':
+            return 200, dict(self.server.stats), {}
+        if path == '/_admin/config':
+            if body:
+                self.server.configure(**json.loads(body))
+            return 200, self.server.config_dict(), {}
+        if path == '/_admin/reset':
+            self.server.stats.clear()
+            return 200, {'reset': True}, {}
+        return 404, {'error': 'not found'}, {}
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _send(self, status, payload, headers):
+        if isinstance(payload, dict):
+            body = json.dumps(payload).encode()
+            headers = {'Content-Type': 'application/json', **headers}
+        else:
+            body = payload or b''
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, str(value))
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    """Threaded HTTP server with latency and fault injection shared by the stand-ins.
+
+    Args:
+        handler_class: StubHandler subclass serving the endpoints.
+        host (str): Interface to bind to.
+        port (int): Port to bind to, 0 picks a free port.
+        latency_ms (float): Fixed delay added to every request.
+        jitter_ms (float): Random extra delay of up to this many milliseconds.
+        seed (int): Seed for fault injection and jitter, so runs are repeatable.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, handler_class, host='127.0.0.1', port=0, latency_ms=0.0, jitter_ms=0.0, seed=0):
+        super().__init__((host, port), handler_class)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.stats = Counter()
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        return f'http://{self.server_address[0]}:{self.server_port}'
+
+    def configure(self, **settings):
+        for name, value in settings.items():
+            if not hasattr(self, name):
+                raise ValueError(f'Unknown setting: {name}')
+            setattr(self, name, value)
+
+    def config_dict(self):
+        return {'latency_ms': self.latency_ms, 'jitter_ms': self.jitter_ms}
+
+    def chance(self, rate):
+        """Return True with the given probability (0..1)."""
+        if rate <= 0:
+            return False
+        with self._rng_lock:
+            return self._rng.random() < rate
+
+    def delay(self):
+        delay_ms = self.latency_ms
+        if self.jitter_ms:
+            with self._rng_lock:
+                delay_ms += self._rng.uniform(0, self.jitter_ms)
+        if delay_ms:
+            time.sleep(delay_ms / 1000)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
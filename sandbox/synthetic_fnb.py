@@ -0,0 +1,186 @@
+import random
+import string
+import uuid
+from datetime import date, timedelta
+
+PAYMENT_TERMS = [
+    '10% STRICTLY 31 DAYS',
+    '7 DAY ONLY ACC.',
+    'CASH ONLY (NOTES)',
+]
+
+# Remittance layouts seen on the FNB settlement account. Each template is
+# formatted with the customer code (e.g. ABC12) and its full id (101ABC12).
+REMITTANCE_TEMPLATES = [
+    'ADT CASH DEPO{depo} {code}',
+    'ADT CASH DEPO{depo} {code} MAG TYRES',
+    'adt cash depo{depo} {lower}',
+    '{full}',
+    'PAYMENT {full} INV{inv}',
+    'FNB APP PAYMENT FROM {full}',
+    '{code}PAYMENT',
+    '{full}ACC',
+    'INTERNET PMT {code}',
+    'DEPOSIT {prefix} {suffix}',
+    'MAGTAPE CREDIT {code} {inv}',
+]
+
+# Remittance text that must not produce a customer id.
+UNMATCHED_TEMPLATES = [
+    'BANK CHARGES',
+    'SERVICE FEE',
+    'CASH DEPOSIT FEE {inv}',
+    'INTEREST',
+    'TRANSFER {inv}',
+]
+
+
+def generate_customer_ids(count, seed=0):
+    """Generate unique customer ids in the 101XXX99 format used by crm.customers.
+
+    Args:
+        count (int): Number of customer ids to generate.
+        seed (int): Seed for the random generator.
+
+    Returns:
+        list: Customer ids such as '101ABC12'.
+    """
+    rng = random.Random(seed)
+    customer_ids = set()
+    while len(customer_ids) < count:
+        letters = ''.join(rng.choices(string.ascii_uppercase, k=3))
+        customer_ids.add(f'101{letters}{rng.randint(0, 99):02d}')
+    return sorted(customer_ids)
+
+
+def generate_customers(customer_ids, seed=0):
+    """Assign a payment term to every customer id.
+
+    Args:
+        customer_ids (list): Customer ids from generate_customer_ids.
+        seed (int): Seed for the random generator.
+
+    Returns:
+        list: (customer_id, payment_terms) tuples, shaped like crm.customers rows.
+    """
+    rng = random.Random(seed)
+    return [(customer_id, rng.choice(PAYMENT_TERMS)) for customer_id in customer_ids]
+
+
+def generate_invoices(customer_ids, count, from_date=None, seed=0):
+    """Generate open invoices for the given customers, shaped like fin.invoices rows.
+
+    Args:
+        customer_ids (list): Customer ids to bill.
+        count (int): Number of invoices.
+        from_date (datetime.date): Earliest invoice date. Defaults to 90 days ago.
+        seed (int): Seed for the random generator.
+
+    Returns:
+        list: (invoice_id, customer_id, invoice_date, due_date, amount, balance) tuples.
+    """
+    rng = random.Random(seed)
+    from_date = from_date or date.today() - timedelta(days=90)
+    invoices = []
+    for number in range(count):
+        invoice_date = from_date + timedelta(days=rng.randrange(90))
+        amount = round(rng.uniform(50, 25000), 2)
+        invoices.append((f'INV{number:07d}', rng.choice(customer_ids), invoice_date,
+                         invoice_date + timedelta(days=rng.choice((7, 30, 31))), amount, amount))
+    return invoices
+
+
+def generate_remittance(rng, customer_id, unmatched_ratio=0.05):
+    """Build one remittance string and the end-to-end reference that goes with it.
+
+    Args:
+        rng (random.Random): Random generator.
+        customer_id (str): Customer id the payment belongs to.
+        unmatched_ratio (float): Share of rows that carry no recognisable customer id.
+
+    Returns:
+        tuple: (remittance_info, reference)
+    """
+    code = customer_id[3:]
+    fields = {
+        'code': code,
+        'lower': code.lower(),
+        'full': customer_id,
+        'prefix': code[:3],
+        'suffix': code[3:],
+        'depo': rng.randint(1000, 9999),
+        'inv': rng.randint(10000, 99999),
+    }
+    if rng.random() < unmatched_ratio:
+        remittance_info = rng.choice(UNMATCHED_TEMPLATES).format(**fields)
+        return remittance_info, remittance_info
+
+    remittance_info = rng.choice(REMITTANCE_TEMPLATES).format(**fields)
+    reference = customer_id if rng.random() < 0.5 else remittance_info
+    return remittance_info, reference
+
+
+def generate_entry(rng, customer_id, booking_date, unmatched_ratio=0.05):
+    """Generate one transaction-history entry in the FNB v2 response schema.
+
+    Args:
+        rng (random.Random): Random generator.
+        customer_id (str): Customer id the payment belongs to.
+        booking_date (datetime.date): Booking date of the entry.
+        unmatched_ratio (float): Share of rows that carry no recognisable customer id.
+
+    Returns:
+        dict: A single element of the response 'entry' list.
+    """
+    remittance_info, reference = generate_remittance(rng, customer_id, unmatched_ratio)
+    value_date = booking_date + timedelta(days=rng.choice([0, 0, 0, 1]))
+    amount = round(rng.uniform(50, 150000), 2)
+    indicator = 'CRDT' if rng.random() < 0.97 else 'DBIT'
+
+    return {
+        'entryId': str(uuid.UUID(int=rng.getrandbits(128))),
+        'status': 'BOOK',
+        'bookingDate': {'Date': booking_date.isoformat()},
+        'valueDate': {'Date': value_date.isoformat()},
+        'amount': {'amount': f'{amount:.2f}', 'currency': 'ZAR'},
+        'creditDebitIndicator': indicator,
+        'availability': {'creditDebitIndicator': indicator, 'date': value_date.isoformat()},
+        'bankTransactionCode': {'domain': {'code': 'PMNT', 'family': {'code': 'RCDT'}}},
+        'entryDetails': {
+            'transactionDetails': {
+                'remittanceInfo': {'unstructured': remittance_info},
+                'reference': {'endToEndId': reference, 'accountServicerReference': str(rng.randint(10**9, 10**10))},
+                'relatedParties': {'debtor': {'name': f'CUSTOMER {customer_id}'}},
+            }
+        },
+    }
+
+
+def generate_statement(rows, customer_ids=None, from_date=None, days=1, seed=0, unmatched_ratio=0.05):
+    """Generate a synthetic FNB transaction-history response.
+
+    Args:
+        rows (int): Number of entries in the statement.
+        customer_ids (list): Customer ids to draw payments from. Defaults to 500 generated ids.
+        from_date (datetime.date): First booking date. Defaults to today.
+        days (int): Number of booking days the entries are spread over.
+        seed (int): Seed for the random generator.
+        unmatched_ratio (float): Share of rows that carry no recognisable customer id.
+
+    Returns:
+        dict: A response body with an 'entry' list, as returned by the transaction-history API.
+    """
+    rng = random.Random(seed)
+    customer_ids = customer_ids or generate_customer_ids(500, seed)
+    from_date = from_date or date.today()
+
+    entries = [
+        generate_entry(
+            rng,
+            rng.choice(customer_ids),
+            from_date + timedelta(days=rng.randrange(days)),
+            unmatched_ratio,
+        )
+        for _ in range(rows)
+    ]
+    return {'entry': entries}
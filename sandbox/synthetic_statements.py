@@ -0,0 +1,88 @@
+import csv
+from datetime import date
+from xml.sax.saxutils import escape
+
+# Writes a synthetic FNB statement (see synthetic_fnb.generate_statement) out in the file
+# formats other banks deliver, so the statement parsers can be tested and benchmarked on
+# the same transactions the FNB path sees.
+
+
+def _fields(entry):
+    details = entry['entryDetails']['transactionDetails']
+    return {
+        'entryId': entry['entryId'],
+        'bookingDate': date.fromisoformat(entry['bookingDate']['Date']),
+        'valueDate': date.fromisoformat(entry['valueDate']['Date']),
+        'remittanceInfo': details['remittanceInfo']['unstructured'],
+        'reference': details['reference']['endToEndId'],
+        'amount': entry['amount']['amount'],
+        'currency': entry['amount']['currency'],
+        'creditDebitIndicator': entry['creditDebitIndicator'],
+    }
+
+
+def write_csv(statement, stream):
+    """Write the statement as CSV with the normalized column names as headers."""
+    columns = ['entryId', 'bookingDate', 'valueDate', 'remittanceInfo', 'reference', 'amount', 'currency',
+               'creditDebitIndicator']
+    writer = csv.writer(stream)
+    writer.writerow(columns)
+    for entry in statement['entry']:
+        fields = _fields(entry)
+        writer.writerow([fields[column] for column in columns])
+
+
+def write_ofx(statement, stream, account_number='62000000000'):
+    """Write the statement as an OFX 1.x SGML bank statement."""
+    entries = [_fields(entry) for entry in statement['entry']]
+    stream.write('OFXHEADER:100\nDATA:OFXSGML\nVERSION:102\n\n<OFX>\n<BANKMSGSRSV1>\n<STMTTRNRS>\n<STMTRS>\n')
+    stream.write(f'<CURDEF>ZAR\n<BANKACCTFROM>\n<ACCTID>{account_number}\n</BANKACCTFROM>\n<BANKTRANLIST>\n')
+    for fields in entries:
+        sign = '-' if fields['creditDebitIndicator'] == 'DBIT' else ''
+        trntype = 'DEBIT' if sign else 'CREDIT'
+        stream.write(
+            f"<STMTTRN>\n<TRNTYPE>{trntype}\n<DTPOSTED>{fields['bookingDate']:%Y%m%d}\n"
+            f"<DTUSER>{fields['valueDate']:%Y%m%d}\n<TRNAMT>{sign}{fields['amount']}\n"
+            f"<FITID>{fields['entryId']}\n<NAME>{fields['remittanceInfo']}\n"
+            f"<REFNUM>{fields['reference']}\n</STMTTRN>\n"
+        )
+    stream.write('</BANKTRANLIST>\n</STMTRS>\n</STMTTRNRS>\n</BANKMSGSRSV1>\n</OFX>\n')
+
+
+def write_mt940(statement, stream, account_number='62000000000', wrap=65):
+    """Write the statement as one MT940 message, wrapping :86: at the SWIFT line width."""
+    entries = [_fields(entry) for entry in statement['entry']]
+    first = min((fields['bookingDate'] for fields in entries), default=date.today())
+    stream.write(f':20:STMT{first:%y%m%d}\n:25:{account_number}\n:28C:1/1\n:60F:C{first:%y%m%d}ZAR0,00\n')
+    for fields in entries:
+        mark = 'D' if fields['creditDebitIndicator'] == 'DBIT' else 'C'
+        amount = fields['amount'].replace('.', ',')
+        reference = (fields['reference'] or 'NONREF')[:16]
+        stream.write(f":61:{fields['valueDate']:%y%m%d}{fields['bookingDate']:%m%d}{mark}{amount}NTRF"
+                     f"{reference}//{fields['entryId']}\n")
+        text = fields['remittanceInfo']
+        stream.write(f':86:{text[:wrap - 4]}\n')
+        for start in range(wrap - 4, len(text), wrap):
+            stream.write(f'{text[start:start + wrap]}\n')
+    stream.write(f':62F:C{first:%y%m%d}ZAR0,00\n-\n')
+
+
+def write_camt053(statement, stream, account_number='62000000000'):
+    """Write the statement as an ISO 20022 camt.053.001.08 bank-to-customer statement."""
+    stream.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                 '<Document xmlns="urn:iso:std:iso:20022:tech:xsd:camt.053.001.08"><BkToCstmrStmt>'
+                 f'<GrpHdr><MsgId>STMT</MsgId></GrpHdr><Stmt><Id>STMT-1</Id>'
+                 f'<Acct><Id><Othr><Id>{account_number}</Id></Othr></Id><Ccy>ZAR</Ccy></Acct>\n')
+    for entry in statement['entry']:
+        fields = _fields(entry)
+        stream.write(
+            f"<Ntry><NtryRef>{fields['entryId']}</NtryRef>"
+            f"<Amt Ccy=\"{fields['currency']}\">{fields['amount']}</Amt>"
+            f"<CdtDbtInd>{fields['creditDebitIndicator']}</CdtDbtInd><Sts><Cd>BOOK</Cd></Sts>"
+            f"<BookgDt><Dt>{fields['bookingDate']}</Dt></BookgDt><ValDt><Dt>{fields['valueDate']}</Dt></ValDt>"
+            f"<BkTxCd><Domn><Cd>PMNT</Cd></Domn></BkTxCd><NtryDtls><TxDtls>"
+            f"<Refs><EndToEndId>{escape(fields['reference'])}</EndToEndId></Refs>"
+            f"<RmtInf><Ustrd>{escape(fields['remittanceInfo'])}</Ustrd></RmtInf>"
+            f"</TxDtls></NtryDtls></Ntry>\n"
+        )
+    stream.write('</Stmt></BkToCstmrStmt></Document>\n')
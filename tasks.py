@@ -1,24 +1,10 @@
-import json
-import logging
 import os
-import re
-import time
-import zipfile
-from datetime import datetime, timedelta
 
-import pandas as pd
-import psycopg2
 from dotenv import load_dotenv
-from fpdf import FPDF
-from O365 import Account
-from O365.utils.token import FileSystemTokenBackend
-import requests
-from robocorp import vault
 from robocorp.tasks import task
 
-from RPA.Database import Database
-from bank.fnb import BankAPI
-from recon.recon_process import RECON
+# Heavy dependencies (pandas, psycopg2, fpdf, O365, robocorp.vault, requests) are
+# imported inside the tasks that need them, so a task only pays for its own imports.
 
 load_dotenv()
 
@@ -29,6 +15,7 @@ tag = "🥦🥦🥦 FNB Robot 🥦 "
 @task
 def fnb_robot():
     """Connect to Backend to get Transactions"""
+    import requests
 
     status = os.getenv("STATUS")
     url = "https://recon-backend-service-734454946254.europe-west1.run.app/"
@@ -68,46 +55,44 @@ def fnb_robot():
 
 
 def reconcile_fnb_transactions():
-    
-    client_id = os.getenv('CLIENT_ID')
-    client_secret = os.getenv('CLIENT_SECRET')
-    base_url = os.getenv('BASE_URL')
-    auth_url = os.getenv('AUTH_URL')
+    import psycopg2
+
+    import metrics
+    from recon.pipeline import (bank_adapter_from_env, db_config_from_env, default_window, flush_outbox,
+                                reconcile_window)
+    from recon.migrate import migrate
+    from recon.recon_process import RECON
+
     dannys_account_number = os.getenv('SETTLEMENT_ACC')
-    
-    current_date = (datetime.now().date()) + timedelta(days=1)
-    from_date = current_date - timedelta(days=1)
-    
-    from_date_str = from_date.strftime("%Y-%m-%d")
-    to_date_str = current_date.strftime("%Y-%m-%d")
-    
-    db_config = {
-        'host': os.getenv('HOST'),
-        'database': os.getenv('DATABASE'),
-        'user': 'postgres',
-        'password': os.getenv('PASSWORD')
-    }
-
-    # Initialize the FNB client
-    fnb = BankAPI(client_id, client_secret, base_url, auth_url, db_config)
-    
-    # Step 1: authorize and get fnb transactions
-    trans_df = fnb.get_transaction_history(dannys_account_number, from_date_str, to_date_str) 
-    
-    db_conn = fnb.connect_to_database()
-    
-    # Step 2: Insert transactions to db
-    if db_conn is None:
-        print("Error: No database connection available.")
+    from_date_str, to_date_str = default_window()
+
+    # The FNB API, or statement files when STATEMENT_PATH is set
+    db_config = db_config_from_env()
+    statement_source = bank_adapter_from_env(db_config)
 
     try:
-        if not trans_df.empty:
-            # Step 3: Recon transactions
-            recon_client = RECON(trans_df)
-            recon_client.process_transactions(trans_df, db_conn)
-        else:
-            print("No transactions to process.")
+        db_conn = psycopg2.connect(**db_config)
+        print("Connection to the database was successful.")
+    except Exception as e:
+        print(f"Error: No database connection available: {e}")
+        return
+
+    try:
+        migrate(db_conn)
+    except Exception as e:
+        print(f"Error applying database migrations: {e}")
+        db_conn.close()
+        return
+
+    recon_client = RECON(None)
+    try:
+        reconcile_window(statement_source, db_conn, dannys_account_number, from_date_str, to_date_str,
+                         recon_client=recon_client)
     except Exception as e:
         print(f"Error processing transactions: {str(e)}")
     finally:
-        fnb.disconnect_from_database()
+        db_conn.close()
+        # Report emails were queued during recon; send them now that the ledger is committed
+        flush_outbox(recon_client)
+        # One-shot run: leave the metrics for the node_exporter textfile collector
+        metrics.write_textfile()
@@ -0,0 +1,181 @@
+import random
+import time
+from datetime import date, timedelta
+
+import pytest
+
+pd = pytest.importorskip('pandas')
+allocation = pytest.importorskip('recon.allocation')
+recon_process = pytest.importorskip('recon.recon_process')
+synthetic_fnb = pytest.importorskip('sandbox.synthetic_fnb')
+
+
+def reference_allocate(payments, invoices):
+    """Payment-by-invoice loops: exact amount first, then oldest due date first."""
+    open_invoices = sorted(([row.invoice_id, row.customer_id, row.due_date, round(row.balance * 100)]
+                            for row in invoices.itertuples()), key=lambda invoice: (invoice[2], invoice[0]))
+    ordered = sorted(payments.iterrows(), key=lambda item: (item[1]['bookingDate'], payments.index.get_loc(item[0])))
+    pending, allocations = [], []
+    for label, payment in ordered:
+        cents = round(payment['total'] * 100)
+        for invoice in open_invoices:
+            if invoice[1] == payment['customer_id'] and invoice[3] == cents:
+                allocations.append((label, invoice[0], cents, 'exact'))
+                invoice[3] = 0
+                break
+        else:
+            pending.append((label, payment['customer_id'], cents))
+    for label, customer_id, cents in pending:
+        for invoice in open_invoices:
+            if cents and invoice[1] == customer_id and invoice[3]:
+                amount = min(cents, invoice[3])
+                allocations.append((label, invoice[0], amount, 'oldest_first'))
+                invoice[3] -= amount
+                cents -= amount
+    return sorted(allocations)
+
+
+def _allocations(result):
+    return sorted((row.payment, row.invoice_id, round(row.amount * 100), row.method) for row in result.itertuples())
+
+
+def _payments(rows):
+    return pd.DataFrame(rows, columns=['customer_id', 'bookingDate', 'total'])
+
+
+def _invoices(rows):
+    return pd.DataFrame(rows, columns=allocation.INVOICE_COLUMNS)
+
+
+DAY = date(2024, 8, 1)
+
+
+def test_exact_amount_wins_over_oldest_invoice():
+    payments = _payments([('101ABC12', DAY, 250.0)])
+    invoices = _invoices([('INV1', '101ABC12', DAY - timedelta(days=60), 100.0),
+                          ('INV2', '101ABC12', DAY - timedelta(days=30), 250.0)])
+
+    assert _allocations(allocation.allocate(payments, invoices)) == [(0, 'INV2', 25000, 'exact')]
+
+
+def test_remainder_is_spread_oldest_first():
+    payments = _payments([('101ABC12', DAY, 100.0), ('101ABC12', DAY, 175.5), ('101XYZ99', DAY, 40.0)])
+    invoices = _invoices([('INV3', '101ABC12', DAY, 120.0),
+                          ('INV1', '101ABC12', DAY - timedelta(days=10), 80.0),
+                          ('INV2', '101ABC12', DAY - timedelta(days=5), 50.0),
+                          ('INV4', '101XYZ99', DAY, 10.0)])
+
+    assert _allocations(allocation.allocate(payments, invoices)) == [
+        (0, 'INV1', 8000, 'oldest_first'),
+        (0, 'INV2', 2000, 'oldest_first'),
+        (1, 'INV2', 3000, 'oldest_first'),
+        (1, 'INV3', 12000, 'oldest_first'),
+        (2, 'INV4', 1000, 'oldest_first'),
+    ]
+
+
+def test_duplicate_amounts_pair_in_order_and_unmatched_rows_are_skipped():
+    payments = _payments([('101ABC12', DAY + timedelta(days=1), 100.0), ('101ABC12', DAY, 100.0),
+                          (None, DAY, 100.0), ('101ABC12', DAY, 0.0)])
+    invoices = _invoices([('INV2', '101ABC12', DAY, 100.0), ('INV1', '101ABC12', DAY - timedelta(days=1), 100.0),
+                          ('INV3', '101ABC12', DAY + timedelta(days=1), 100.0)])
+    payments.index = ['b', 'a', 'unmatched', 'zero']
+
+    result = allocation.allocate(payments, invoices)
+
+    # The earlier booking takes the older invoice
+    assert _allocations(result) == [('a', 'INV1', 10000, 'exact'), ('b', 'INV2', 10000, 'exact')]
+    assert allocation.allocated_amounts(payments, result).tolist() == [100.0, 100.0, 0.0, 0.0]
+
+
+def test_no_invoices_allocates_nothing():
+    payments = _payments([('101ABC12', DAY, 100.0)])
+
+    result = allocation.allocate(payments, _invoices([]))
+
+    assert result.empty and list(result.columns) == allocation.ALLOCATION_COLUMNS
+
+
+def test_matches_the_nested_loop_reference():
+    rng = random.Random(43)
+    customer_ids = synthetic_fnb.generate_customer_ids(40, seed=43)
+    invoices = _invoices([(invoice_id, customer_id, due_date, balance) for invoice_id, customer_id, _, due_date, _, balance
+                          in synthetic_fnb.generate_invoices(customer_ids, 600, from_date=DAY, seed=43)])
+    # Some payments settle an invoice exactly, the rest are arbitrary amounts
+    totals = [rng.choice(invoices['balance'].tolist()) if rng.random() < 0.3 else round(rng.uniform(10, 40000), 2)
+              for _ in range(400)]
+    payments = _payments([(rng.choice(customer_ids), DAY + timedelta(days=rng.randrange(3)), total)
+                          for total in totals])
+
+    result = allocation.allocate(payments, invoices)
+
+    assert _allocations(result) == reference_allocate(payments, invoices)
+    assert result['method'].nunique() == 2
+
+
+def test_hundreds_of_thousands_of_invoices():
+    customer_ids = synthetic_fnb.generate_customer_ids(5000, seed=1)
+    invoices = _invoices([(invoice_id, customer_id, due_date, balance) for invoice_id, customer_id, _, due_date, _, balance
+                          in synthetic_fnb.generate_invoices(customer_ids, 300_000, seed=1)])
+    rng = random.Random(1)
+    payments = _payments([(rng.choice(customer_ids), DAY, round(rng.uniform(10, 60000), 2)) for _ in range(50_000)])
+
+    start_time = time.perf_counter()
+    result = allocation.allocate(payments, invoices)
+
+    assert time.perf_counter() - start_time < 10
+    assert (allocation.allocated_amounts(payments, result) <= payments['total'] + 1e-9).all()
+    per_invoice = result.groupby('invoice_id')['amount'].sum()
+    assert (per_invoice <= invoices.set_index('invoice_id')['balance'].reindex(per_invoice.index) + 1e-9).all()
+
+
+class _BrokenConnection:
+    rolled_back = False
+
+    def cursor(self):
+        raise RuntimeError('relation "fin.invoices" does not exist')
+
+    def rollback(self):
+        self.rolled_back = True
+
+
+def test_missing_invoice_table_leaves_rows_unallocated():
+    recon = recon_process.RECON(None)
+    df = _payments([('101ABC12', DAY, 100.0)]).assign(payment_terms='7 DAY ONLY ACC.')
+    db_conn = _BrokenConnection()
+
+    df, allocations = recon.allocate_payments(df, db_conn)
+
+    assert df['allocated'].tolist() == [0.0] and db_conn.rolled_back
+    assert allocations.empty
+
+
+def test_posting_records_allocations_and_reduces_balances(recon_db):
+    from psycopg2 import extras
+
+    with recon_db.cursor() as cur:
+        cur.execute('SELECT username FROM crm.customers ORDER BY username LIMIT 1')
+        customer_id = cur.fetchone()[0]
+        extras.execute_values(cur, 'INSERT INTO fin.invoices VALUES %s', [
+            ('INV1', customer_id, DAY, DAY + timedelta(days=30), 300.0, 300.0),
+            ('INV2', customer_id, DAY, DAY + timedelta(days=7), 150.0, 150.0),
+            ('INV3', customer_id, DAY, DAY + timedelta(days=60), 80.0, 80.0),
+        ])
+    recon_db.commit()
+    recon = recon_process.RECON(None)
+    df = _payments([(customer_id, DAY, 80.0), (customer_id, DAY, 200.0)]).assign(
+        payment_terms='7 DAY ONLY ACC.', entryId=['E1', 'E2'])
+
+    df, allocations = recon.allocate_payments(df, recon_db)
+    batch_id = recon.insert_batch(recon_db, 'BR001', '2024-08-01', 'Finance (Bot)', 280.0, 0.0, 280.0)
+    recon.post_to_general_ledger(recon_db, batch_id, 280.0, df.assign(amount=df['total'], discount=0.0),
+                                 allocations=allocations)
+
+    with recon_db.cursor() as cur:
+        cur.execute('SELECT invoice_id, balance FROM fin.invoices ORDER BY invoice_id')
+        assert [(invoice_id, float(balance)) for invoice_id, balance in cur.fetchall()] == [
+            ('INV1', 250.0), ('INV2', 0.0), ('INV3', 0.0)]
+        cur.execute('SELECT entry_id, invoice_id, amount, method FROM fin.invoice_allocations ORDER BY allocation_id')
+        assert [(entry_id, invoice_id, float(amount), method) for entry_id, invoice_id, amount, method
+                in cur.fetchall()] == [('E1', 'INV3', 80.0, 'exact'), ('E2', 'INV2', 150.0, 'oldest_first'),
+                                      ('E2', 'INV1', 50.0, 'oldest_first')]
@@ -0,0 +1,138 @@
+import io
+from datetime import date
+
+import pytest
+
+pd = pytest.importorskip('pandas')
+adapters = pytest.importorskip('bank.adapters')
+statement_parsers = pytest.importorskip('bank.statement_parsers')
+synthetic_statements = pytest.importorskip('sandbox.synthetic_statements')
+recon_process = pytest.importorskip('recon.recon_process')
+
+from sandbox.synthetic_fnb import generate_statement
+
+WRITERS = {
+    'csv': synthetic_statements.write_csv,
+    'ofx': synthetic_statements.write_ofx,
+    'mt940': synthetic_statements.write_mt940,
+    'camt053': synthetic_statements.write_camt053,
+}
+
+
+@pytest.fixture(scope='module')
+def statement(synthetic_statement):
+    return synthetic_statement(500)
+
+
+@pytest.fixture(scope='module')
+def fnb_frame(statement):
+    """The statement as BankAPI.get_transaction_history normalizes it."""
+    df = pd.json_normalize(statement['entry']).rename(columns={
+        'bookingDate.Date': 'bookingDate',
+        'valueDate.Date': 'valueDate',
+        'entryDetails.transactionDetails.remittanceInfo.unstructured': 'remittanceInfo',
+        'entryDetails.transactionDetails.reference.endToEndId': 'reference',
+        'amount.amount': 'amount',
+        'amount.currency': 'currency',
+        'availability.creditDebitIndicator': 'availableCreditDebitIndicator',
+    })
+    df['bookingDate'] = pd.to_datetime(df['bookingDate']).dt.date
+    df['valueDate'] = pd.to_datetime(df['valueDate']).dt.date
+    return adapters.compact_frame(df)
+
+
+def _write(tmp_path, statement, statement_format):
+    path = tmp_path / f'statement.{statement_format}'
+    with open(path, 'w', newline='') as stream:
+        WRITERS[statement_format](statement, stream)
+    return str(path)
+
+
+@pytest.mark.parametrize('statement_format', list(WRITERS))
+def test_file_adapters_match_the_fnb_frame(tmp_path, statement, fnb_frame, statement_format):
+    adapter = adapters.FileStatementAdapter(_write(tmp_path, statement, statement_format), chunk_rows=128)
+
+    df = adapter.get_transaction_history('62000000000', None, None)
+
+    assert list(df.columns) == list(fnb_frame.columns)
+    compared = ['entryId', 'bookingDate', 'valueDate', 'remittanceInfo', 'amount', 'creditDebitIndicator']
+    pd.testing.assert_frame_equal(df[compared], fnb_frame[compared], check_categorical=False)
+    assert (df['currency'] == 'ZAR').all()
+    assert df['currency'].dtype == 'category'
+    if statement_format != 'mt940':
+        # MT940 customer references are cut to 16 characters
+        assert df['reference'].tolist() == fnb_frame['reference'].tolist()
+
+
+def test_file_frames_feed_recon_like_fnb_frames(tmp_path, statement, fnb_frame):
+    recon = recon_process.RECON(None)
+    df = adapters.FileStatementAdapter(_write(tmp_path, statement, 'csv')).get_transaction_history('acc', None, None)
+
+    assert df.apply(recon.extract_customer_id, axis=1).tolist() == \
+        fnb_frame.apply(recon.extract_customer_id, axis=1).tolist()
+
+
+def test_iter_frames_chunks_and_filters_the_booking_window(tmp_path, customer_ids):
+    statement = generate_statement(300, customer_ids=customer_ids, from_date=date(2024, 8, 1), days=3)
+    adapter = adapters.FileStatementAdapter(_write(tmp_path, statement, 'csv'), chunk_rows=100)
+
+    frames = list(adapter.iter_frames('2024-08-02', '2024-08-02'))
+
+    assert all(len(frame) <= 100 for frame in frames)
+    booked = pd.concat(frames)['bookingDate']
+    assert set(booked) == {date(2024, 8, 2)}
+    assert len(booked) == sum(entry['bookingDate']['Date'] == '2024-08-02' for entry in statement['entry'])
+
+
+def test_csv_parser_maps_bank_specific_headers():
+    stream = io.StringIO('Date,Description,Amount\n01/08/2024,ADT CASH DEPO0412 KLM07,"1,250.00"\n'
+                         '02/08/2024,BANK CHARGES,-35.50\n')
+
+    records = list(statement_parsers.parse_csv(
+        stream, columns={'bookingDate': 'Date', 'remittanceInfo': 'Description', 'amount': 'Amount'},
+        date_format='%d/%m/%Y'))
+
+    assert [(r['bookingDate'], r['amount'], r['creditDebitIndicator']) for r in records] == [
+        (date(2024, 8, 1), 1250.0, 'CRDT'),
+        (date(2024, 8, 2), 35.5, 'DBIT'),
+    ]
+    assert records[0]['entryId'] == 'csv-1'
+
+
+def test_ofx_parser_reads_xml_split_across_blocks():
+    ofx = ('<?xml version="1.0"?><OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><CURDEF>USD</CURDEF><BANKTRANLIST>'
+           '<STMTTRN><TRNTYPE>DEBIT</TRNTYPE><DTPOSTED>20240801120000[-5:EST]</DTPOSTED>'
+           '<TRNAMT>-12.00</TRNAMT><FITID>A1</FITID><NAME>FEES &amp; CHARGES</NAME></STMTTRN>'
+           '<STMTTRN><TRNTYPE>CREDIT</TRNTYPE><DTPOSTED>20240802</DTPOSTED><TRNAMT>99.99</TRNAMT>'
+           '<FITID>A2</FITID><MEMO>101ABC12</MEMO></STMTTRN></BANKTRANLIST></STMTRS></STMTTRNRS>'
+           '</BANKMSGSRSV1></OFX>')
+
+    records = list(statement_parsers.parse_ofx(io.StringIO(ofx), block_size=17))
+
+    assert [(r['entryId'], r['bookingDate'], r['amount'], r['creditDebitIndicator'], r['remittanceInfo'],
+             r['currency']) for r in records] == [
+        ('A1', date(2024, 8, 1), 12.0, 'DBIT', 'FEES & CHARGES', 'USD'),
+        ('A2', date(2024, 8, 2), 99.99, 'CRDT', '101ABC12', 'USD'),
+    ]
+
+
+def test_mt940_parser_handles_year_end_reversals_and_wrapped_text():
+    mt940 = (':20:STMT\n:25:62000000000\n:28C:1/1\n:60F:C231231ZAR0,00\n'
+             ':61:2401011231C100,00NTRFNONREF//B1\n:86:ADT CASH DEPO0412 KL\nM07\n'
+             ':61:240102RC5,5NTRF101ABC12\n:86:REVERSAL\n'
+             ':62F:C240102ZAR94,50\n:86:STATEMENT TEXT\n-\n')
+
+    records = list(statement_parsers.parse_mt940(io.StringIO(mt940)))
+
+    assert records[0]['bookingDate'] == date(2023, 12, 31)
+    assert records[0]['valueDate'] == date(2024, 1, 1)
+    assert records[0]['remittanceInfo'] == 'ADT CASH DEPO0412 KLM07'
+    assert records[0]['reference'] is None
+    assert records[1]['entryId'] == '62000000000-20240102-2'
+    assert (records[1]['amount'], records[1]['creditDebitIndicator']) == (5.5, 'DBIT')
+    assert records[1]['remittanceInfo'] == 'REVERSAL'
+
+
+def test_unknown_statement_format_is_rejected():
+    with pytest.raises(ValueError, match='Unsupported statement format'):
+        statement_parsers.parser_for('statement.pdf')
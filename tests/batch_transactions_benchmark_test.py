@@ -0,0 +1,133 @@
+# Insert and lookup latency on fin.batch_transactions as history grows: the original
+# unpartitioned table against the monthly partitions of recon/migrations.
+#
+#   python -m pytest tests/batch_transactions_benchmark_test.py --benchmark-only
+# History sizes default to 10k and 100k rows over two years; set
+# BATCH_TX_BENCH_ROWS=100000,1000000,10000000 to see the curves flatten (or not).
+import os
+from datetime import date, timedelta
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+pd = pytest.importorskip('pandas')
+psycopg2 = pytest.importorskip('psycopg2')
+migrate_module = pytest.importorskip('recon.migrate')
+recon_process = pytest.importorskip('recon.recon_process')
+
+HISTORY_ROWS = [int(rows) for rows in os.getenv('BATCH_TX_BENCH_ROWS', '10000,100000').split(',')]
+ROUNDS = int(os.getenv('BATCH_TX_BENCH_ROUNDS', '5'))
+LAYOUTS = ['unpartitioned', 'partitioned']
+
+SCHEMA_SQL = Path(__file__).parent / 'sql' / 'recon_schema.sql'
+BATCH_ROWS = 1000
+TODAY = date.today()
+
+# Two years of history ending today, 1000 rows per batch and 5000 customers
+HISTORY_SQL = """
+    INSERT INTO fin.batch (branch_code, batch_date, total)
+    SELECT 'BR001', current_date, 0 FROM generate_series(1, %(batches)s);
+
+    INSERT INTO fin.batch_transactions (booking_date, value_date, remittance_info, reference, amount, discount,
+                                        currency, credit_debit_indicator, batch_id, entry_id)
+    SELECT day, day, 'ADT CASH DEPO' || n, '101C' || lpad((n %% 5000)::text, 4, '0'), n %% 9000, 0, 'ZAR', 'CRDT',
+           1 + (n - 1) / 1000, 'E' || n
+    FROM generate_series(1, %(rows)s) AS n,
+         LATERAL (SELECT current_date - 730 + (n::bigint * 730 / %(rows)s)::int AS day) AS d;
+"""
+
+
+@pytest.fixture(scope='module')
+def history_db(throwaway_postgres):
+    """Factory for a database holding the given layout and history size; the last one is kept."""
+    if 'dsn' in throwaway_postgres:
+        conn = psycopg2.connect(throwaway_postgres['dsn'])
+    else:
+        conn = psycopg2.connect(**throwaway_postgres)
+    current = {}
+
+    def _database(layout, rows):
+        if current.get('key') != (layout, rows):
+            with conn.cursor() as cur:
+                cur.execute('DROP SCHEMA IF EXISTS fin CASCADE; DROP SCHEMA IF EXISTS crm CASCADE;')
+                cur.execute(SCHEMA_SQL.read_text())
+                if layout == 'unpartitioned':
+                    # The old table with the new column, so the same inserts run against both
+                    cur.execute('ALTER TABLE fin.batch_transactions ADD COLUMN entry_id TEXT')
+            conn.commit()
+            if layout == 'partitioned':
+                migrate_module.migrate(conn)
+                # As RECON.process_transactions does for the booking dates it is about to insert
+                migrate_module.ensure_partitions(conn, TODAY - timedelta(days=730), TODAY)
+            with conn.cursor() as cur:
+                cur.execute(HISTORY_SQL, {'rows': rows, 'batches': rows // BATCH_ROWS + 1})
+            conn.commit()
+            # What autovacuum would have done by the time years of history had piled up
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute('VACUUM ANALYZE fin.batch_transactions')
+            conn.autocommit = False
+            current['key'] = (layout, rows)
+        return conn
+
+    yield _database
+    conn.close()
+
+
+def _batch_frame():
+    return pd.DataFrame({
+        'entryId': [f'NEW{n}' for n in range(BATCH_ROWS)],
+        'bookingDate': [TODAY] * BATCH_ROWS,
+        'valueDate': [TODAY] * BATCH_ROWS,
+        'remittanceInfo': [f'ADT CASH DEPO{n} ABC12' for n in range(BATCH_ROWS)],
+        'reference': [f'101C{n % 5000:04d}' for n in range(BATCH_ROWS)],
+        'amount': [100.0] * BATCH_ROWS,
+        'discount': [0.0] * BATCH_ROWS,
+        'currency': ['ZAR'] * BATCH_ROWS,
+        'availableCreditDebitIndicator': ['CRDT'] * BATCH_ROWS,
+    })
+
+
+def _record(benchmark, layout, rows):
+    benchmark.extra_info['layout'] = layout
+    benchmark.extra_info['history_rows'] = rows
+
+
+@pytest.mark.parametrize('rows', HISTORY_ROWS)
+@pytest.mark.parametrize('layout', LAYOUTS)
+def test_insert_batch(benchmark, record_rate, history_db, layout, rows):
+    db_conn = history_db(layout, rows)
+    recon = recon_process.RECON(None)
+    batch_id = recon.insert_batch(db_conn, 'BR001', TODAY, 'Finance (Bot)', 0, 0, 0)
+    df = _batch_frame()
+
+    benchmark.pedantic(recon.insert_bank_transactions, args=(db_conn, df, batch_id), rounds=ROUNDS)
+
+    _record(benchmark, layout, rows)
+    record_rate(BATCH_ROWS)
+
+
+LOOKUPS = {
+    'customer_last_30_days': ("SELECT count(*) FROM fin.batch_transactions "
+                              "WHERE reference = '101C0042' AND booking_date >= current_date - 30"),
+    'batch': 'SELECT count(*) FROM fin.batch_transactions WHERE batch_id = 3',
+    'entry': "SELECT count(*) FROM fin.batch_transactions WHERE entry_id = 'E4242'",
+}
+
+
+@pytest.mark.parametrize('lookup', LOOKUPS)
+@pytest.mark.parametrize('rows', HISTORY_ROWS)
+@pytest.mark.parametrize('layout', LAYOUTS)
+def test_lookup(benchmark, history_db, layout, rows, lookup):
+    db_conn = history_db(layout, rows)
+
+    def query():
+        with db_conn.cursor() as cur:
+            cur.execute(LOOKUPS[lookup])
+            return cur.fetchone()[0]
+
+    count = benchmark.pedantic(query, rounds=ROUNDS * 4)
+
+    _record(benchmark, layout, rows)
+    assert count >= (1 if lookup == 'entry' else 0)
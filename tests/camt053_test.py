@@ -0,0 +1,94 @@
+import io
+import subprocess
+import sys
+import textwrap
+from datetime import date
+
+import pytest
+
+pytest.importorskip('lxml')
+camt053 = pytest.importorskip('bank.camt053')
+synthetic_statements = pytest.importorskip('sandbox.synthetic_statements')
+
+CAMT_V02 = b"""<?xml version="1.0" encoding="UTF-8"?>
+<Document xmlns="urn:iso:std:iso:20022:tech:xsd:camt.053.001.02"><BkToCstmrStmt><Stmt>
+<Id>S1</Id>
+<Ntry><Amt Ccy="ZAR">1250.00</Amt><CdtDbtInd>CRDT</CdtDbtInd><Sts>BOOK</Sts>
+  <BookgDt><DtTm>2024-08-01T10:15:00+02:00</DtTm></BookgDt><ValDt><Dt>2024-08-02</Dt></ValDt>
+  <AcctSvcrRef>SVC-1</AcctSvcrRef>
+  <NtryDtls><TxDtls><Refs><EndToEndId>NOTPROVIDED</EndToEndId></Refs>
+    <RmtInf><Ustrd>ADT CASH DEPO0412</Ustrd><Ustrd>KLM07</Ustrd>
+      <Strd><CdtrRefInf><Ref>INV-77</Ref></CdtrRefInf></Strd></RmtInf></TxDtls></NtryDtls></Ntry>
+<Ntry><Amt Ccy="ZAR">10.00</Amt><CdtDbtInd>DBIT</CdtDbtInd><Sts>PDNG</Sts>
+  <BookgDt><Dt>2024-08-01</Dt></BookgDt></Ntry>
+<Ntry><Amt Ccy="ZAR">35.50</Amt><CdtDbtInd>DBIT</CdtDbtInd><Sts>BOOK</Sts>
+  <BookgDt><Dt>2024-08-02</Dt></BookgDt></Ntry>
+</Stmt></BkToCstmrStmt></Document>
+"""
+
+
+def test_parses_version_02_entries():
+    records = list(camt053.parse_camt053(io.BytesIO(CAMT_V02)))
+
+    assert records == [
+        {'entryId': 'SVC-1', 'bookingDate': date(2024, 8, 1), 'valueDate': date(2024, 8, 2),
+         'remittanceInfo': 'ADT CASH DEPO0412 KLM07', 'reference': 'INV-77', 'amount': 1250.0,
+         'currency': 'ZAR', 'creditDebitIndicator': 'CRDT'},
+        {'entryId': 'ntry-3', 'bookingDate': date(2024, 8, 2), 'valueDate': date(2024, 8, 2),
+         'remittanceInfo': None, 'reference': None, 'amount': 35.5,
+         'currency': 'ZAR', 'creditDebitIndicator': 'DBIT'},
+    ]
+
+
+def test_pending_entries_can_be_kept():
+    records = list(camt053.parse_camt053(io.BytesIO(CAMT_V02), booked_only=False))
+
+    assert [record['amount'] for record in records] == [1250.0, 10.0, 35.5]
+
+
+def test_read_camt053_yields_chunks(tmp_path, synthetic_statement):
+    path = tmp_path / 'statement.xml'
+    with open(path, 'w', encoding='utf-8') as stream:
+        synthetic_statements.write_camt053(synthetic_statement(250), stream)
+
+    frames = list(camt053.read_camt053(str(path), chunk_rows=100))
+
+    assert [len(frame) for frame in frames] == [100, 100, 50]
+    assert list(frames[0].columns[:6]) == ['entryId', 'bookingDate', 'valueDate', 'remittanceInfo', 'reference',
+                                           'amount']
+
+
+# VmHWM rather than ru_maxrss, which a child inherits from the (large) forking parent
+_PEAK_RSS = textwrap.dedent("""
+    import sys
+    from bank.camt053 import parse_camt053
+    count = sum(1 for _ in parse_camt053(sys.argv[1]))
+    with open('/proc/self/status') as status:
+        peak_kb = next(line.split()[1] for line in status if line.startswith('VmHWM:'))
+    print(count, peak_kb)
+""")
+
+
+def _parse_in_subprocess(path):
+    output = subprocess.run([sys.executable, '-c', _PEAK_RSS, str(path)], capture_output=True, text=True,
+                            check=True).stdout.split()
+    return int(output[0]), int(output[1])
+
+
+@pytest.mark.skipif(sys.platform != 'linux', reason='reads the peak RSS from /proc')
+def test_memory_stays_flat_as_the_statement_grows(tmp_path):
+    from sandbox.synthetic_fnb import generate_statement
+
+    sizes = {}
+    for rows in (2000, 60000):
+        path = tmp_path / f'{rows}.xml'
+        with open(path, 'w', encoding='utf-8') as stream:
+            synthetic_statements.write_camt053(generate_statement(rows), stream)
+        count, peak_kb = _parse_in_subprocess(path)
+        assert count == rows
+        sizes[rows] = (path.stat().st_size, peak_kb)
+
+    file_growth_kb = (sizes[60000][0] - sizes[2000][0]) / 1024
+    rss_growth_kb = sizes[60000][1] - sizes[2000][1]
+    # A retained tree would cost several times the file size
+    assert rss_growth_kb < file_growth_kb / 4
@@ -0,0 +1,168 @@
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from sandbox.fnb_server import FNBServer
+from sandbox.graph_server import GraphMailServer
+from sandbox.synthetic_fnb import generate_customer_ids, generate_customers, generate_statement
+
+SCHEMA_SQL = Path(__file__).parent / 'sql' / 'recon_schema.sql'
+
+
+@pytest.fixture(scope='session')
+def customer_ids():
+    return generate_customer_ids(500, seed=26)
+
+
+@pytest.fixture(scope='session')
+def customers(customer_ids):
+    return generate_customers(customer_ids, seed=26)
+
+
+@pytest.fixture(scope='session')
+def synthetic_statement(customer_ids):
+    """Factory returning a cached synthetic statement with the given number of rows."""
+    cache = {}
+
+    def _statement(rows):
+        if rows not in cache:
+            cache[rows] = generate_statement(rows, customer_ids=customer_ids, seed=rows)
+        return cache[rows]
+
+    return _statement
+
+
+@pytest.fixture(scope='session')
+def json_normalize_frame():
+    """The json_normalize normalization BankAPI used before bank.fnb_decode, as the reference frame."""
+    pd = pytest.importorskip('pandas')
+
+    def _frame(entries):
+        df = pd.json_normalize(entries)
+        df = df.rename(columns={
+            'bookingDate.Date': 'bookingDate',
+            'valueDate.Date': 'valueDate',
+            'entryDetails.transactionDetails.remittanceInfo.unstructured': 'remittanceInfo',
+            'entryDetails.transactionDetails.reference.endToEndId': 'reference',
+            'amount.amount': 'amount',
+            'amount.currency': 'currency',
+            'availability.creditDebitIndicator': 'availableCreditDebitIndicator',
+        })
+        df['amount'] = pd.to_numeric(df['amount']).abs()
+        df['bookingDate'] = pd.to_datetime(df['bookingDate']).dt.date
+        df['valueDate'] = pd.to_datetime(df['valueDate']).dt.date
+        return df[['entryId', 'bookingDate', 'valueDate', 'remittanceInfo', 'reference', 'amount', 'currency',
+                   'creditDebitIndicator', 'availableCreditDebitIndicator']]
+
+    return _frame
+
+
+@pytest.fixture
+def record_rate(benchmark):
+    """
+    Records rows/sec in the benchmark's extra_info (see --benchmark-json).
+
+    The returned function answers whether timings were taken; --benchmark-disable runs the
+    target once without stats.
+    """
+    def _record(rows):
+        if not benchmark.stats:
+            return False
+        benchmark.extra_info['rows_per_sec'] = round(rows / benchmark.stats.stats.mean)
+        return True
+
+    return _record
+
+
+@pytest.fixture(scope='session')
+def fnb_stub_server():
+    server = FNBServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def fnb_server():
+    """A fresh FNB stand-in per test, for tests that change latency or fault injection."""
+    server = FNBServer(rows=200).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def graph_mail_server(tmp_path):
+    server = GraphMailServer(outbox_dir=tmp_path / 'mail').start()
+    yield server
+    server.stop()
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(scope='session')
+def throwaway_postgres():
+    """Connection settings for a disposable Postgres.
+
+    Uses TEST_DATABASE_URL when set, otherwise starts a temporary cluster with
+    initdb/pg_ctl from PATH. Tests are skipped when neither is available.
+    """
+    psycopg2 = pytest.importorskip('psycopg2')
+
+    dsn = os.getenv('TEST_DATABASE_URL')
+    if dsn:
+        yield {'dsn': dsn}
+        return
+
+    if not shutil.which('initdb') or not shutil.which('pg_ctl'):
+        pytest.skip('no TEST_DATABASE_URL and no initdb/pg_ctl on PATH')
+
+    data_dir = tempfile.mkdtemp(prefix='recon-pg-')
+    port = _free_port()
+    subprocess.run(['initdb', '-D', data_dir, '-U', 'postgres', '-A', 'trust'],
+                   check=True, capture_output=True)
+    subprocess.run(['pg_ctl', '-D', data_dir, '-w', '-l', os.path.join(data_dir, 'server.log'),
+                    '-o', f"-p {port} -k {data_dir} -c listen_addresses=''", 'start'],
+                   check=True, capture_output=True)
+    try:
+        conn = psycopg2.connect(host=data_dir, port=port, user='postgres', dbname='postgres')
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute('CREATE DATABASE recon_test')
+        conn.close()
+        yield {'host': data_dir, 'port': port, 'user': 'postgres', 'database': 'recon_test'}
+    finally:
+        subprocess.run(['pg_ctl', '-D', data_dir, '-m', 'immediate', 'stop'], capture_output=True)
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+@pytest.fixture
+def recon_db(throwaway_postgres, customers):
+    """A psycopg2 connection to a freshly created, migrated recon schema with synthetic customers."""
+    import psycopg2
+    from psycopg2 import extras
+
+    from recon.migrate import migrate
+
+    if 'dsn' in throwaway_postgres:
+        conn = psycopg2.connect(throwaway_postgres['dsn'])
+    else:
+        conn = psycopg2.connect(**throwaway_postgres)
+
+    with conn.cursor() as cur:
+        cur.execute('DROP SCHEMA IF EXISTS fin CASCADE; DROP SCHEMA IF EXISTS crm CASCADE;')
+        cur.execute(SCHEMA_SQL.read_text())
+        extras.execute_values(cur, 'INSERT INTO crm.customers (username, payment_terms) VALUES %s', customers)
+    conn.commit()
+    # As in production: the tables above, then the managed migrations on top
+    migrate(conn)
+
+    yield conn
+    conn.close()
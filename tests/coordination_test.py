@@ -0,0 +1,120 @@
+import threading
+import time
+from datetime import date
+
+import pytest
+
+pd = pytest.importorskip('pandas')
+psycopg2 = pytest.importorskip('psycopg2')
+coordination = pytest.importorskip('recon.coordination')
+pipeline = pytest.importorskip('recon.pipeline')
+recon_process = pytest.importorskip('recon.recon_process')
+
+ACCOUNT = '62000000000'
+
+
+def _connect(throwaway_postgres):
+    if 'dsn' in throwaway_postgres:
+        return psycopg2.connect(throwaway_postgres['dsn'])
+    return psycopg2.connect(**throwaway_postgres)
+
+
+@pytest.fixture
+def other_conn(recon_db, throwaway_postgres):
+    """A second session, as another worker process would have."""
+    conn = _connect(throwaway_postgres)
+    yield conn
+    conn.close()
+
+
+class _Statements:
+    """Statement source with one row per window day, named after the window."""
+
+    name = 'stub'
+
+    def get_transaction_history(self, account_number, from_date, to_date, idempotency_id=None):
+        days = coordination.window_days(from_date, to_date)
+        return pd.DataFrame({
+            'entryId': [f'{from_date}/{n}' for n in range(len(days))],
+            'bookingDate': days,
+            'valueDate': days,
+            'remittanceInfo': [f'ADT CASH DEPO{n} ABC12' for n in range(len(days))],
+            'reference': ['ABC12'] * len(days),
+            'amount': [100.0] * len(days),
+            'currency': ['ZAR'] * len(days),
+            'creditDebitIndicator': ['CRDT'] * len(days),
+            'availableCreditDebitIndicator': ['CRDT'] * len(days),
+        })
+
+
+class _SlowRecon:
+    """Posts each row to fin.batch_transactions, slowly enough for the runs to overlap."""
+
+    def process_transactions(self, df, db_conn):
+        time.sleep(0.3)
+        with db_conn.cursor() as cur:
+            cur.executemany("INSERT INTO fin.batch_transactions (booking_date, reference, amount, entry_id) "
+                            "VALUES (%s, %s, %s, %s)",
+                            list(df[['bookingDate', 'reference', 'amount', 'entryId']].itertuples(index=False)))
+        db_conn.commit()
+        return [recon_process.POSTED] * len(df)
+
+
+def test_window_days_include_both_ends():
+    assert coordination.window_days('2024-08-30', '2024-09-01') == [
+        date(2024, 8, 30), date(2024, 8, 31), date(2024, 9, 1)]
+    assert coordination.window_days(date(2024, 8, 2), date(2024, 8, 1)) == [date(2024, 8, 2)]
+    assert coordination.window_lock_keys(ACCOUNT, '2024-08-01', '2024-08-02') == [
+        f'{ACCOUNT}|2024-08-01', f'{ACCOUNT}|2024-08-02']
+
+
+def test_overlapping_window_is_busy_and_others_are_not(recon_db, other_conn):
+    with coordination.window_lock(recon_db, ACCOUNT, '2024-08-01', '2024-08-02') as acquired:
+        assert acquired
+        assert coordination.try_lock_window(other_conn, ACCOUNT, '2024-08-02', '2024-08-03') is None
+        assert coordination.try_lock_window(other_conn, '62999999999', '2024-08-01', '2024-08-02') is not None
+        keys = coordination.try_lock_window(other_conn, ACCOUNT, '2024-08-03', '2024-08-04')
+        assert keys is not None
+        coordination.unlock_window(other_conn, keys)
+
+    # Released on exit, including the day the busy attempt had briefly taken
+    assert coordination.try_lock_window(other_conn, ACCOUNT, '2024-08-01', '2024-08-03') is not None
+
+
+def test_window_is_released_when_the_run_fails(recon_db, other_conn):
+    with pytest.raises(psycopg2.Error):
+        with coordination.window_lock(recon_db, ACCOUNT, '2024-08-01', '2024-08-02'):
+            with recon_db.cursor() as cur:
+                cur.execute('SELECT * FROM fin.no_such_table')
+
+    assert coordination.try_lock_window(other_conn, ACCOUNT, '2024-08-01', '2024-08-02') is not None
+
+
+def test_parallel_workers_post_each_window_once(recon_db, throwaway_postgres):
+    windows = [('2024-08-01', '2024-08-02'), ('2024-08-01', '2024-08-02'),
+               ('2024-08-03', '2024-08-04'), ('2024-08-05', '2024-08-06')]
+    start = threading.Barrier(len(windows))
+    results = [None] * len(windows)
+
+    def worker(index, from_date, to_date):
+        conn = _connect(throwaway_postgres)
+        try:
+            start.wait()
+            results[index] = pipeline.reconcile_window(_Statements(), conn, ACCOUNT, from_date, to_date,
+                                                       recon_client=_SlowRecon())['status']
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=worker, args=(index, *window)) for index, window in enumerate(windows)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results[:2]) == ['busy', 'completed'] and results[2:] == ['completed', 'completed']
+    # The three distinct windows ran side by side, not one after the other
+    assert time.monotonic() - started < 0.9
+    with recon_db.cursor() as cur:
+        cur.execute('SELECT entry_id, count(*) FROM fin.batch_transactions GROUP BY entry_id ORDER BY entry_id')
+        assert cur.fetchall() == [(f'{from_date}/{n}', 1) for from_date, _ in windows[1:] for n in range(2)]
@@ -0,0 +1,177 @@
+import hashlib
+import io
+import os
+import tarfile
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip('requests')
+download_manager = pytest.importorskip('download_manager')
+
+CHUNK = 64 * 1024
+
+
+class _FileHandler(BaseHTTPRequestHandler):
+    """Serves server.payload with ETag and optional Range support, counting requests."""
+
+    def do_HEAD(self):
+        self._headers(200, len(self.server.payload))
+        self.end_headers()
+
+    def do_GET(self):
+        payload = self.server.payload
+        range_header = self.headers.get('Range')
+        with self.server.lock:
+            self.server.gets.append(range_header)
+            fail = range_header in self.server.fail_ranges
+            self.server.fail_ranges.discard(range_header)
+
+        if fail:
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        if range_header and self.server.accept_ranges:
+            start, end = (int(value) for value in range_header.removeprefix('bytes=').split('-'))
+            body = payload[start:end + 1]
+            self._headers(206, len(body))
+            self.send_header('Content-Range', f'bytes {start}-{end}/{len(payload)}')
+        else:
+            body = payload
+            self._headers(200, len(body))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _headers(self, status, length):
+        self.send_response(status)
+        self.send_header('Content-Length', str(length))
+        self.send_header('ETag', self.server.etag)
+        if self.server.accept_ranges:
+            self.send_header('Accept-Ranges', 'bytes')
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def file_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _FileHandler)
+    server.payload = os.urandom(5 * CHUNK + 123)
+    server.etag = '"v1"'
+    server.accept_ranges = True
+    server.gets = []
+    server.fail_ranges = set()
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    server.url = f'http://127.0.0.1:{server.server_port}/VSCode-linux-x64.tar.gz'
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _manager(tmp_path):
+    return download_manager.DownloadManager(cache_dir=str(tmp_path / 'cache'), chunk_size=CHUNK, max_workers=3)
+
+
+def _read(path):
+    with open(path, 'rb') as source:
+        return source.read()
+
+
+def test_parallel_ranged_download_matches_source(file_server, tmp_path):
+    path = _manager(tmp_path).fetch(file_server.url)
+
+    assert _read(path) == file_server.payload
+    assert len(file_server.gets) == 6
+    assert all(header.startswith('bytes=') for header in file_server.gets)
+
+
+def test_second_fetch_is_a_cache_hit(file_server, tmp_path):
+    first = _manager(tmp_path).fetch(file_server.url)
+    file_server.gets.clear()
+
+    assert _manager(tmp_path).fetch(file_server.url) == first
+    assert file_server.gets == []
+
+
+def test_changed_etag_downloads_again(file_server, tmp_path):
+    first = _manager(tmp_path).fetch(file_server.url)
+    file_server.etag = '"v2"'
+
+    assert _manager(tmp_path).fetch(file_server.url) != first
+
+
+def test_interrupted_download_resumes_missing_chunks(file_server, tmp_path):
+    failing = f'bytes={2 * CHUNK}-{3 * CHUNK - 1}'
+    file_server.fail_ranges.add(failing)
+
+    with pytest.raises(Exception):
+        _manager(tmp_path).fetch(file_server.url)
+
+    file_server.gets.clear()
+    path = _manager(tmp_path).fetch(file_server.url)
+
+    assert file_server.gets == [failing]
+    assert _read(path) == file_server.payload
+
+
+def test_checksum_mismatch_is_rejected(file_server, tmp_path):
+    with pytest.raises(ValueError, match='Checksum mismatch'):
+        _manager(tmp_path).fetch(file_server.url, sha256='0' * 64)
+
+    expected = hashlib.sha256(file_server.payload).hexdigest()
+    assert _read(_manager(tmp_path).fetch(file_server.url, sha256=expected)) == file_server.payload
+
+
+def test_server_without_ranges_falls_back_to_one_stream(file_server, tmp_path):
+    file_server.accept_ranges = False
+
+    path = _manager(tmp_path).fetch(file_server.url)
+
+    assert _read(path) == file_server.payload
+    assert file_server.gets == [None]
+
+
+def test_extract_zip_and_tar_archives(tmp_path):
+    zip_path = tmp_path / 'code.zip'
+    with zipfile.ZipFile(zip_path, 'w') as archive:
+        archive.writestr('VSCode/bin/code', b'#!/bin/sh\n')
+
+    tar_path = tmp_path / 'code.tar.gz'
+    with tarfile.open(tar_path, 'w:gz') as archive:
+        data = b'binary'
+        info = tarfile.TarInfo('VSCode-linux-x64/code')
+        info.size = len(data)
+        archive.addfile(info, io.BytesIO(data))
+
+    assert download_manager.extract_archive(str(zip_path), str(tmp_path / 'zip'))
+    assert download_manager.extract_archive(str(tar_path), str(tmp_path / 'tar'))
+    assert (tmp_path / 'zip' / 'VSCode' / 'bin' / 'code').read_bytes() == b'#!/bin/sh\n'
+    assert (tmp_path / 'tar' / 'VSCode-linux-x64' / 'code').read_bytes() == b'binary'
+
+    (tmp_path / 'installer.exe').write_bytes(b'MZ')
+    assert not download_manager.extract_archive(str(tmp_path / 'installer.exe'), str(tmp_path / 'exe'))
+
+
+def test_extract_rejects_paths_outside_the_output_dir(tmp_path):
+    zip_path = tmp_path / 'evil.zip'
+    with zipfile.ZipFile(zip_path, 'w') as archive:
+        archive.writestr('../escape.txt', b'nope')
+
+    with pytest.raises(ValueError, match='Unsafe path'):
+        download_manager.extract_archive(str(zip_path), str(tmp_path / 'out'))
+
+
+def test_installer_download_is_named_as_install_vscode_expects(file_server, tmp_path, monkeypatch):
+    vsc_install = pytest.importorskip('vsc_install')
+    monkeypatch.setenv('VSC_DOWNLOAD_CACHE', str(tmp_path / 'cache'))
+    file_server.url = f'http://127.0.0.1:{file_server.server_port}/sha/download?build=stable&os=win32-x64-user'
+
+    vsc_install.download_and_extract(file_server.url, str(tmp_path / 'out'), installer_name='VSCode-win32-x64-user.exe')
+
+    assert os.listdir(tmp_path / 'out') == ['VSCode-win32-x64-user.exe']
+    assert _read(tmp_path / 'out' / 'VSCode-win32-x64-user.exe') == file_server.payload
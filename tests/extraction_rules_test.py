@@ -0,0 +1,210 @@
+import json
+import os
+import random
+import re
+import string
+import sys
+import time
+
+import pytest
+
+extraction_rules = pytest.importorskip('recon.extraction_rules')
+synthetic_fnb = pytest.importorskip('sandbox.synthetic_fnb')
+
+REPLAY_PATH = os.path.join(os.path.dirname(__file__), 'data', 'remittance_replay.txt')
+
+
+def legacy_extract(text):
+    """The regex cascade RECON._extract_from_text used before the rule file, kept as the reference."""
+    if text:
+        match = re.search(r'ADT CASH DEPO\d+\s([A-Z]{3}\d{2})', text, re.IGNORECASE)
+        if match:
+            return '101' + match.group(1).upper()
+
+        match = re.search(r'\b(101[A-Z]{2}\d{3})\b', text, re.IGNORECASE)
+        if match:
+            return match.group(1).upper()
+        else:
+            special_cases = [
+                r'(?<!\d)(101[A-Z]{3}\d{2})(?=\w)',
+                r'(?<!\d)([A-Z]{3}\d{2})(?=\w)',
+                r'(?<!\d)(101[A-Z]{3}\d{2})',
+                r'(?<!\d)([A-Z]{3}\d{2})'
+            ]
+
+            for pattern in special_cases:
+                match = re.search(pattern, text, re.IGNORECASE)
+                if match:
+                    return '101' + match.group(1).upper() if not match.group(1).startswith('101') else match.group(1).upper()
+
+        match = re.search(r'\b(101[A-Za-z]{3}\d{2}|([A-Za-z]{3}\d{2}))\b', text, re.IGNORECASE)
+        if match:
+            return '101' + match.group(2).upper() if match.group(2) else match.group(1).upper()
+
+        match = re.search(r'\b(101[A-Za-z]{3}\d{2})\b', text)
+        if match:
+            return match.group(1).upper()
+
+        match = re.search(r'\b([A-Za-z]{3}\d{2})\b', text)
+        if match:
+            return '101' + match.group(1).upper()
+
+        match = re.search(r'([A-Za-z]{3})\s(\d{2})', text)
+        if match:
+            return '101' + match.group(1).upper() + match.group(2)
+
+    return None
+
+
+def _synthetic_texts(count, seed=0):
+    rng = random.Random(seed)
+    texts = []
+    for customer_id in synthetic_fnb.generate_customer_ids(count, seed=seed):
+        texts.extend(synthetic_fnb.generate_remittance(rng, customer_id, unmatched_ratio=0.1))
+    return texts
+
+
+def _noise_texts(count, seed=0):
+    rng = random.Random(seed)
+    alphabet = string.ascii_letters + string.digits + '   /-'
+    return [''.join(rng.choices(alphabet, k=rng.randint(0, 30))) for _ in range(count)]
+
+
+def _replay_texts():
+    with open(REPLAY_PATH) as replay_file:
+        return [line.rstrip('\n') for line in replay_file]
+
+
+def _adversarial_texts(length):
+    """Long malformed remittance text: near misses for every rule, repeated."""
+    return {
+        'deposit_no_code': ('ADT CASH DEPO' + '1' * 50) * (length // 63),
+        'deposit_no_space': 'ADT CASH DEPO' + '1' * length,
+        'digits': '1' * length,
+        'letters': 'a' * length,
+        'short_codes': 'ABC1' * (length // 4),
+        'split_codes': 'ABC ' * (length // 4),
+        'prefix_only': '101AB' * (length // 5),
+        'whitespace': ' \t' * (length // 2),
+        'unicode': 'é' * length,
+    }
+
+
+@pytest.fixture(scope='module', params=['re', 're2'])
+def rule_set(request):
+    if request.param == 're2':
+        pytest.importorskip('re2')
+    return extraction_rules.load_rules(engine=request.param)
+
+
+@pytest.mark.parametrize('texts', [_replay_texts(), _synthetic_texts(2000), _noise_texts(5000)],
+                         ids=['replay', 'synthetic', 'noise'])
+def test_rules_match_the_legacy_cascade(rule_set, texts):
+    mismatches = [(text, legacy_extract(text), rule_set.extract(text))
+                  for text in texts if legacy_extract(text) != rule_set.extract(text)]
+
+    assert mismatches == []
+
+
+def test_extract_row_falls_back_to_reference(rule_set):
+    assert rule_set.extract_row({'remittanceInfo': 'BANK CHARGES', 'reference': '101KLM07'}) == '101KLM07'
+    assert rule_set.extract_row({'remittanceInfo': 'ADT CASH DEPO0412 ABC12', 'reference': '101KLM07'}) == '101ABC12'
+    assert rule_set.extract_row({'remittanceInfo': None, 'reference': None}) is None
+
+
+def test_lower_priority_wins_over_earlier_position(rule_set):
+    rule, value = rule_set.match('INVOICE KLM07 ADT CASH DEPO0412 ABC12')
+
+    assert (rule.name, value) == ('adt_cash_deposit', '101ABC12')
+
+
+def test_rules_can_target_one_field():
+    spec = {
+        'fields': ['remittanceInfo', 'reference'],
+        'normalize': {'upper': True},
+        'rules': [
+            {'name': 'ref_only', 'priority': 1, 'pattern': r'REF:(\w+)', 'fields': ['reference']},
+            {'name': 'anywhere', 'priority': 2, 'pattern': r'ID(\d+)', 'normalize': {'ensure_prefix': 'C'}},
+        ],
+    }
+    rule_set = extraction_rules.rules_from_dict(spec)
+
+    assert rule_set.extract('REF:abc ID7', 'remittanceInfo') == 'C7'
+    assert rule_set.extract('REF:abc ID7', 'reference') == 'ABC'
+
+
+@pytest.mark.parametrize('rule, message', [
+    ({'name': 'bad', 'priority': 1, 'pattern': '(unclosed'}, 'invalid pattern'),
+    ({'name': 'named', 'priority': 1, 'pattern': '(?P<id>x)'}, 'named groups'),
+    ({'name': 'groups', 'priority': 1, 'pattern': 'x', 'groups': [1]}, 'selects groups'),
+])
+def test_invalid_rules_are_rejected(rule, message):
+    with pytest.raises(ValueError, match=message):
+        extraction_rules.rules_from_dict({'fields': ['remittanceInfo'], 'rules': [rule]})
+
+
+def test_replay_cli_reports_hits_per_rule(capsys):
+    extraction_rules.main([REPLAY_PATH])
+
+    report = json.loads(capsys.readouterr().out)
+    assert report['rows'] == len(_replay_texts())
+    assert report['matched'] == sum(1 for text in _replay_texts() if legacy_extract(text))
+    assert report['hits']['remittanceInfo:adt_cash_deposit'] == 3
+
+
+def test_re2_rewrites_edge_lookarounds():
+    rule = extraction_rules.Rule('full_id_joined', r'(?<!\d)(101[A-Z]{3}\d{2})(?=\w)', 30)
+
+    assert extraction_rules._re2_pattern(rule) == r'(?i:(?:^|\D)((101[A-Z]{3}\d{2}))(?:\w))'
+
+
+def test_re2_falls_back_to_re_for_unsupported_rules():
+    pytest.importorskip('re2')
+    spec = {
+        'fields': ['remittanceInfo'],
+        'rules': [
+            {'name': 'inner_lookahead', 'priority': 1, 'pattern': r'INV(?=\d{4})(\d+)'},
+            {'name': 'repeated', 'priority': 2, 'pattern': r'(\w)\1(\d{2})', 'groups': [2]},
+            {'name': 'code', 'priority': 3, 'pattern': r'(?<!\d)([A-Z]{3}\d{2})'},
+        ],
+    }
+    rule_set = extraction_rules.rules_from_dict(spec, engine='re2')
+
+    assert rule_set._matchers['remittanceInfo'].fallback_rules == ['inner_lookahead', 'repeated']
+    assert rule_set.match('ABC12 INV12345')[0].name == 'inner_lookahead'
+    assert rule_set.match('ABC12 XX34')[0].name == 'repeated'
+    assert rule_set.match('INV12 ABC12')[0].name == 'code'
+
+
+def test_re2_engine_requires_the_package(monkeypatch):
+    monkeypatch.setitem(sys.modules, 're2', None)
+
+    with pytest.raises(ValueError, match='google-re2'):
+        extraction_rules.rules_from_dict({'fields': ['remittanceInfo'], 'rules': []}, engine='re2')
+    assert extraction_rules.rules_from_dict({'fields': ['remittanceInfo'], 'rules': []}).engine == 're'
+
+
+def test_text_past_the_scan_budget_is_ignored(rule_set):
+    text = 'X' * (rule_set.max_scan - 5) + 'ABC12'
+
+    assert rule_set.extract(text) == '101ABC12'
+    assert rule_set.extract('X' + text) is None
+
+
+@pytest.mark.parametrize('name, text', _adversarial_texts(100_000).items())
+def test_adversarial_rows_take_bounded_time(rule_set, name, text):
+    start_time = time.perf_counter()
+    rule_set.extract_row({'remittanceInfo': text, 'reference': text})
+
+    assert time.perf_counter() - start_time < 0.05
+
+
+def test_re2_is_linear_without_a_scan_budget():
+    pytest.importorskip('re2')
+    rule_set = extraction_rules.load_rules(engine='re2')
+    unbounded = extraction_rules.RuleSet(rule_set.rules, rule_set.fields, rule_set.normalize, engine='re2')
+
+    for name, text in _adversarial_texts(1_000_000).items():
+        start_time = time.perf_counter()
+        unbounded.extract(text)
+        assert time.perf_counter() - start_time < 0.5, name
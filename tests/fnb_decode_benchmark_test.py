@@ -0,0 +1,66 @@
+# Decode-plus-normalize of transaction-history responses: json_normalize vs bank.fnb_decode.
+#
+#   python -m pytest tests/fnb_decode_benchmark_test.py --benchmark-only
+# Row counts default to 10k; set FNB_DECODE_BENCH_ROWS=10000,100000 for large responses.
+# Peak traced memory per round is stored in extra_info['peak_mb'] (see --benchmark-json).
+import json
+import os
+import tracemalloc
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+pd = pytest.importorskip('pandas')
+fnb_decode = pytest.importorskip('bank.fnb_decode')
+
+ROW_COUNTS = [int(rows) for rows in os.getenv('FNB_DECODE_BENCH_ROWS', '10000').split(',')]
+ROUNDS = int(os.getenv('FNB_DECODE_BENCH_ROUNDS', '3'))
+
+
+@pytest.fixture(scope='module')
+def response_bodies(synthetic_statement):
+    bodies = {}
+
+    def _body(rows):
+        if rows not in bodies:
+            bodies[rows] = json.dumps(synthetic_statement(rows)).encode()
+        return bodies[rows]
+
+    return _body
+
+
+def _direct(backend):
+    def decode(body):
+        columns = fnb_decode.TransactionColumns(backend)
+        columns.add_page(body)
+        return columns.to_frame()
+
+    return decode
+
+
+def _peak_mb(decode, body):
+    tracemalloc.start()
+    try:
+        decode(body)
+        return round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.mark.parametrize('rows', ROW_COUNTS)
+@pytest.mark.parametrize('backend', ['json_normalize', 'json', 'orjson', 'msgspec'])
+def test_decode_and_normalize(benchmark, record_rate, response_bodies, json_normalize_frame, backend, rows):
+    if backend in ('orjson', 'msgspec'):
+        pytest.importorskip(backend)
+    if backend == 'json_normalize':
+        def decode(body):
+            return json_normalize_frame(json.loads(body)['entry'])
+    else:
+        decode = _direct(backend)
+    body = response_bodies(rows)
+
+    df = benchmark.pedantic(decode, args=(body,), rounds=ROUNDS)
+
+    if record_rate(rows):
+        benchmark.extra_info['peak_mb'] = _peak_mb(decode, body)
+    assert len(df) == rows
@@ -0,0 +1,74 @@
+import json
+
+import pytest
+
+pd = pytest.importorskip('pandas')
+fnb_decode = pytest.importorskip('bank.fnb_decode')
+synthetic_fnb = pytest.importorskip('sandbox.synthetic_fnb')
+
+BACKENDS = ['json', 'orjson', 'msgspec']
+
+
+def _columns(backend):
+    if backend != 'json':
+        pytest.importorskip(backend)
+    return fnb_decode.TransactionColumns(backend)
+
+
+def _pages(entries, page_size):
+    for start in range(0, len(entries), page_size):
+        page = {'entry': entries[start:start + page_size]}
+        if start + page_size < len(entries):
+            page['links'] = {'next': f'https://bank.example/page/{start // page_size + 1}'}
+        yield json.dumps(page).encode()
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_frame_matches_json_normalize(json_normalize_frame, backend):
+    entries = synthetic_fnb.generate_statement(2500, days=3, seed=7)['entry']
+    columns = _columns(backend)
+
+    links = [columns.add_page(page) for page in _pages(entries, 1000)]
+
+    assert links == ['https://bank.example/page/1', 'https://bank.example/page/2', None]
+    pd.testing.assert_frame_equal(columns.to_frame(), json_normalize_frame(entries))
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_missing_and_null_fields_match_json_normalize(json_normalize_frame, backend):
+    entries = synthetic_fnb.generate_statement(6, seed=3)['entry']
+    del entries[0]['entryDetails']['transactionDetails']['remittanceInfo']
+    entries[1]['entryDetails']['transactionDetails']['reference']['endToEndId'] = None
+    entries[2]['amount']['amount'] = -125.5
+    entries[3]['availability'] = None
+    # Not a scalar: json_normalize flattens it into other columns and leaves this one empty
+    entries[4]['creditDebitIndicator'] = {'code': 'CRDT'}
+    for entry in entries:
+        entry['bookingDate']['Date'] += 'T23:15:00+02:00'
+    columns = _columns(backend)
+
+    columns.add_page(json.dumps({'entry': entries}).encode())
+
+    pd.testing.assert_frame_equal(columns.to_frame(), json_normalize_frame(entries))
+
+
+def test_unknown_backend_is_rejected(monkeypatch):
+    monkeypatch.setattr(fnb_decode, 'orjson', None)
+
+    with pytest.raises(ValueError):
+        fnb_decode.TransactionColumns('orjson')
+
+
+def test_bank_api_returns_the_normalized_frame(json_normalize_frame, fnb_server):
+    fnb = pytest.importorskip('bank.fnb')
+    statement = synthetic_fnb.generate_statement(450, seed=11)
+    fnb_server.load_statement(statement)
+    fnb_server.configure(page_size=200)
+    bank_api = fnb.BankAPI('stub-client', 'stub-secret', fnb_server.base_url, fnb_server.auth_url, {})
+
+    df = bank_api.get_transaction_history('62000000000', '2024-08-01', '2024-08-02')
+
+    expected = json_normalize_frame(statement['entry'])
+    expected['discount'] = 0.0
+    expected['total'] = 0.0
+    pd.testing.assert_frame_equal(df, expected)
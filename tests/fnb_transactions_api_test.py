@@ -1,113 +1,54 @@
+import pytest
 
-# Generated by CodiumAI
-import json
+fnb = pytest.importorskip('bank.fnb')
 
+ACCOUNT = '62000000000'
+
+
+def _bank_api(server, client_secret='stub-secret', **kwargs):
+    return fnb.BankAPI('stub-client', client_secret, server.base_url, server.auth_url, {},
+                       backoff_seconds=0.01, **kwargs)
 
-# Dependencies:
-# pip install pytest-mock
-import pytest
 
 class TestGetAccessToken:
 
-    # Successfully obtain access and refresh tokens with valid client_id and client_secret
-    def test_successful_token_obtainment(self, mocker):
-        from bank.fnb import get_access_token
-        auth_url = "https://api.example.com/oauth2/token"
-        client_id = "valid_client_id"
-        client_secret = "valid_client_secret"
-    
-        mock_response = mocker.Mock()
-        mock_response.status_code = 200
-        mock_response.text = json.dumps({
-            "access_token": "valid_access_token",
-            "refresh_token": "valid_refresh_token"
-        })
-    
-        mocker.patch('requests.post', return_value=mock_response)
-    
-        tokens = get_access_token(client_id, client_secret, auth_url)
-    
-        assert tokens is not None
-        assert tokens['access_token'] == "valid_access_token"
-        assert tokens['refresh_token'] == "valid_refresh_token"
-
-    # Handle invalid client_id or client_secret resulting in authentication failure
-    def test_invalid_credentials(self, mocker):
-        from bank.fnb import get_access_token
-        auth_url = "https://api.example.com/oauth2/token"
-        client_id = "invalid_client_id"
-        client_secret = "invalid_client_secret"
-    
-        mock_response = mocker.Mock()
-        mock_response.status_code = 401
-        mock_response.text = json.dumps({
-            "error": "invalid_client",
-            "error_description": "Client authentication failed"
-        })
-    
-        mocker.patch('requests.post', return_value=mock_response)
-    
-        tokens = get_access_token(client_id, client_secret, auth_url)
-    
-        assert tokens is None
-
-    # Correctly parse and return tokens from a successful authentication response
-    def test_correct_token_parsing(self, mocker):
-        from your_module import get_access_token
-        auth_url = "https://api.example.com/oauth2/token"
-        client_id = "valid_client_id"
-        client_secret = "valid_client_secret"
-
-        mock_response = mocker.Mock()
-        mock_response.status_code = 200
-        mock_response.text = json.dumps({
-            "access_token": "valid_access_token",
-            "refresh_token": "valid_refresh_token"
-        })
-
-        mocker.patch('requests.post', return_value=mock_response)
-
-        tokens = get_access_token(client_id, client_secret, auth_url)
-
-        assert tokens is not None
-        assert tokens['access_token'] == "valid_access_token"
-        assert tokens['refresh_token'] == "valid_refresh_token"
-
-    # Handle authentication with the correct scope for the Transaction History API
-    def test_handle_correct_scope(self, mocker):
-        from bank.fnb import get_access_token
-        
-        auth_url = "https://api.example.com/oauth2/token"
-        client_id = "valid_client_id"
-        client_secret = "valid_client_secret"
-
-        mock_response = mocker.Mock()
-        mock_response.status_code = 200
-        mock_response.text = json.dumps({
-            "access_token": "valid_access_token",
-            "refresh_token": "valid_refresh_token"
-        })
-
-        mocker.patch('requests.post', return_value=mock_response)
-
-        tokens = get_access_token(client_id, client_secret, auth_url)
-
-        assert tokens is not None
-        assert tokens['access_token'] == "valid_access_token"
-        assert tokens['refresh_token'] == "valid_refresh_token"
-
-    # Handle network issues or timeouts during the authentication request
-    def test_handle_network_issues(self, mocker):
-        from bank.fnb import get_access_token
-        auth_url = "https://api.example.com/oauth2/token"
-        client_id = "valid_client_id"
-        client_secret = "valid_client_secret"
-    
-        mock_response = mocker.Mock()
-        mock_response.status_code = 500  # Simulate network issue with status code 500
-    
-        mocker.patch('requests.post', return_value=mock_response)
-    
-        tokens = get_access_token(client_id, client_secret, auth_url)
-    
-        assert tokens is None
\ No newline at end of file
+    # Successfully obtain an access token with a valid client_id and client_secret
+    def test_successful_token_obtainment(self, fnb_server):
+        bank_api = _bank_api(fnb_server)
+
+        assert fnb_server.token_is_valid(bank_api.access_token)
+        assert bank_api.refresh_token is None
+        assert fnb_server.stats['POST 200'] == 1
+
+    # Handle invalid client credentials resulting in authentication failure
+    def test_invalid_credentials(self, fnb_server):
+        fnb_server.configure(client_secret='stub-secret')
+
+        bank_api = _bank_api(fnb_server, client_secret='wrong-secret')
+
+        assert bank_api.access_token is None
+        assert fnb_server.stats['POST 401'] == 1
+
+    # Authenticate with the client-credentials grant and the Transaction History scope
+    def test_handle_correct_scope(self, fnb_server):
+        _bank_api(fnb_server)
+
+        assert fnb_server.token_requests == [{'grant_type': 'client_credentials', 'scope': 'i_can'}]
+
+    # The token is sent as a bearer token with the transaction-history request
+    def test_token_authorizes_transaction_history(self, fnb_server):
+        fnb_server.configure(client_secret='stub-secret', rows=20)
+
+        df = _bank_api(fnb_server).get_transaction_history(ACCOUNT, '2024-08-01', '2024-08-02')
+
+        assert len(df) == 20
+        assert fnb_server.stats['GET 401'] == 0
+
+    # Without a token, history requests are refused and no frame is returned
+    def test_failed_authentication_returns_no_history(self, fnb_server):
+        fnb_server.configure(client_secret='stub-secret')
+
+        bank_api = _bank_api(fnb_server, client_secret='wrong-secret')
+
+        assert bank_api.get_transaction_history(ACCOUNT, '2024-08-01', '2024-08-02') is None
+        assert fnb_server.stats['GET 401'] == 1
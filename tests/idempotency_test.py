@@ -0,0 +1,166 @@
+from datetime import date
+
+import pytest
+
+pd = pytest.importorskip('pandas')
+idempotency = pytest.importorskip('recon.idempotency')
+pipeline = pytest.importorskip('recon.pipeline')
+recon_process = pytest.importorskip('recon.recon_process')
+
+ACCOUNT = '62000000000'
+
+
+def _statement_df():
+    return pd.DataFrame({
+        'entryId': ['e1', 'e2', 'e3'],
+        'bookingDate': [date(2024, 8, 1)] * 3,
+        'valueDate': [date(2024, 8, 1)] * 3,
+        'remittanceInfo': ['ADT CASH DEPO1234 ABC12', '101XYZ99', 'BANK CHARGES'],
+        'reference': ['ADT CASH DEPO1234 ABC12', '101XYZ99', 'BANK CHARGES'],
+        'amount': [100.0, 250.5, 12.0],
+        'currency': ['ZAR'] * 3,
+        'creditDebitIndicator': ['CRDT', 'CRDT', 'DBIT'],
+        'availableCreditDebitIndicator': ['CRDT', 'CRDT', 'DBIT'],
+        'discount': [0.0] * 3,
+        'total': [0.0] * 3,
+    })
+
+
+class _Statements:
+
+    name = 'stub'
+
+    def __init__(self, df=None):
+        self.df = _statement_df() if df is None else df
+
+    def get_transaction_history(self, account_number, from_date, to_date, idempotency_id=None):
+        return self.df.copy()
+
+
+class _PartialRecon:
+    """Reports the rows in unmatched as unmatched and those in unposted as failed; posts the rest."""
+
+    def __init__(self, unmatched=(), unposted=()):
+        self.outcomes = {**{entry_id: recon_process.UNMATCHED for entry_id in unmatched},
+                         **{entry_id: recon_process.NOT_POSTED for entry_id in unposted}}
+        self.calls = []
+
+    def process_transactions(self, df, db_conn):
+        self.calls.append(df['entryId'].tolist())
+        return [self.outcomes.get(entry_id, recon_process.POSTED) for entry_id in df['entryId']]
+
+
+class _ReportingRecon(recon_process.RECON):
+    """The real recon, with the report files and emails recorded instead of written."""
+
+    def __init__(self):
+        super().__init__(None)
+        self.emails = []
+
+    def save_raw_transactions_excel(self, df, output_file_name, batch_date, current_time, directory='.'):
+        return f'{output_file_name}.xlsx'
+
+    def generate_pdf_report(self, df, batch_id, total_amount, total_discount, batch_type, directory='.'):
+        return f'{batch_type}.pdf'
+
+    def store_artifact(self, path):
+        return path
+
+    def queue_email_with_attachments(self, recipients, subject, body, file_1, file_2, signature_image, thread=None):
+        self.emails.append(subject)
+
+
+def test_row_hashes_ignore_recon_outputs():
+    df = _statement_df()
+    hashes = idempotency.row_hashes(df)
+
+    df['discount'] = 5.0
+    df['customer_id'] = '101ABC12'
+
+    assert idempotency.row_hashes(df) == hashes
+    assert len(set(hashes)) == 3
+
+
+def test_statement_hash_is_order_independent_and_content_sensitive():
+    df = _statement_df()
+    content_hash = idempotency.statement_hash(idempotency.row_hashes(df))
+
+    shuffled = df.iloc[[2, 0, 1]]
+    assert idempotency.statement_hash(idempotency.row_hashes(shuffled)) == content_hash
+
+    df.loc[1, 'amount'] = 250.51
+    assert idempotency.statement_hash(idempotency.row_hashes(df)) != content_hash
+
+
+def test_window_keeps_idempotency_id_until_completed(recon_db):
+    store = idempotency.IdempotencyStore(recon_db)
+
+    first = store.begin_window(ACCOUNT, '2024-08-01', '2024-08-02')
+    assert store.begin_window(ACCOUNT, '2024-08-01', '2024-08-02') == first
+
+    df = _statement_df()
+    hashes = idempotency.row_hashes(df)
+    content_hash = idempotency.statement_hash(hashes)
+    store.complete_window(ACCOUNT, '2024-08-01', '2024-08-02', content_hash, df, hashes)
+
+    assert store.is_completed(ACCOUNT, '2024-08-01', '2024-08-02', content_hash)
+    assert store.begin_window(ACCOUNT, '2024-08-01', '2024-08-02') != first
+
+
+def test_new_rows_mask_skips_rows_posted_before(recon_db):
+    store = idempotency.IdempotencyStore(recon_db)
+
+    df = _statement_df()
+    hashes = idempotency.row_hashes(df)
+    store.begin_window(ACCOUNT, '2024-08-01', '2024-08-02')
+    store.complete_window(ACCOUNT, '2024-08-01', '2024-08-02', 'previous', df.iloc[:2], hashes[:2])
+
+    assert store.new_rows_mask(hashes) == [False, False, True]
+
+
+def test_rows_of_failed_batches_are_reconciled_again(recon_db):
+    store = idempotency.IdempotencyStore(recon_db)
+    first = store.begin_window(ACCOUNT, '2024-08-01', '2024-08-02')
+
+    # The bank-charges row matched no customer and e2's batch failed to post
+    result = pipeline.reconcile_window(_Statements(), recon_db, ACCOUNT, '2024-08-01', '2024-08-02',
+                                       recon_client=_PartialRecon(unmatched=['e3'], unposted=['e2']))
+
+    assert result == {'status': 'partial', 'fetched': 3, 'reconciled': 1, 'unmatched': 1, 'unposted': 1}
+    hashes = idempotency.row_hashes(_statement_df())
+    assert store.new_rows_mask(hashes) == [False, True, True]
+    assert not store.is_completed(ACCOUNT, '2024-08-01', '2024-08-02', idempotency.statement_hash(hashes))
+    assert store.begin_window(ACCOUNT, '2024-08-01', '2024-08-02') != first
+
+    # The rerun retries the rows left open, and the window completes once e2 posts
+    recon_client = _PartialRecon(unmatched=['e3'])
+    result = pipeline.reconcile_window(_Statements(), recon_db, ACCOUNT, '2024-08-01', '2024-08-02',
+                                       recon_client=recon_client)
+
+    assert recon_client.calls == [['e2', 'e3']]
+    assert result == {'status': 'completed', 'fetched': 3, 'reconciled': 1, 'unmatched': 1}
+    assert pipeline.reconcile_window(_Statements(), recon_db, ACCOUNT, '2024-08-01', '2024-08-02',
+                                     recon_client=recon_client)['status'] == 'unchanged'
+    assert recon_client.calls == [['e2', 'e3']]
+
+
+def test_unmatched_rows_do_not_keep_a_window_open(recon_db, customers):
+    customer_id = next(username for username, terms in customers if terms == recon_process.BATCH_TERMS['7-DAY'])
+    statement_df = _statement_df().iloc[1:].reset_index(drop=True)
+    statement_df.loc[0, ['remittanceInfo', 'reference']] = customer_id
+    recon_client = _ReportingRecon()
+
+    result = pipeline.reconcile_window(_Statements(statement_df), recon_db, ACCOUNT, '2024-08-01', '2024-08-02',
+                                       recon_client=recon_client)
+    rerun = pipeline.reconcile_window(_Statements(statement_df), recon_db, ACCOUNT, '2024-08-01', '2024-08-02',
+                                      recon_client=recon_client)
+
+    assert result == {'status': 'completed', 'fetched': 2, 'reconciled': 1, 'unmatched': 1}
+    assert rerun['status'] == 'unchanged'
+    # Only the 7-day batch had rows: no empty 30-day or cash batches were posted or mailed
+    assert [subject.split(' - ')[0] for subject in recon_client.emails] == ['FNB 7-DAY BATCH 1']
+    with recon_db.cursor() as cur:
+        cur.execute('SELECT count(*) FROM fin.batch')
+        assert cur.fetchone()[0] == 1
+        cur.execute('SELECT count(*) FROM fin.general_ledger')
+        assert cur.fetchone()[0] == 1
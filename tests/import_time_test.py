@@ -0,0 +1,73 @@
+# Cold-start guard for the robot entry points.
+#
+# Each check runs in a fresh interpreter so modules already imported by pytest do
+# not hide the real cost. The budget can be tuned per machine with
+# TASKS_IMPORT_BUDGET_MS.
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+IMPORT_BUDGET_MS = float(os.getenv('TASKS_IMPORT_BUDGET_MS', '1000'))
+
+HEAVY_MODULES = ['pandas', 'numpy', 'psycopg2', 'fpdf', 'O365', 'RPA', 'robocorp.vault', 'requests']
+
+
+def _run_python(*args):
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join(filter(None, [str(REPO_ROOT), os.getenv('PYTHONPATH')]))}
+    return subprocess.run([sys.executable, *args], cwd=REPO_ROOT, env=env, capture_output=True, text=True)
+
+
+def _loaded_heavy_modules(module):
+    code = (
+        f'import json, sys; import {module}; '
+        f'print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))'
+    )
+    result = _run_python('-c', code)
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _cumulative_import_ms(module):
+    """Cumulative import time of a top-level module, from python -X importtime."""
+    result = _run_python('-X', 'importtime', '-c', f'import {module}')
+    assert result.returncode == 0, result.stderr
+
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = [field.strip() for field in line.split(':', 1)[1].split('|')]
+        if fields[2] == module:
+            return int(fields[1]) / 1000
+    raise AssertionError(f'{module} not found in -X importtime output')
+
+
+def test_tasks_module_imports_no_heavy_dependencies():
+    pytest.importorskip('robocorp.tasks')
+    pytest.importorskip('dotenv')
+
+    assert _loaded_heavy_modules('tasks') == []
+
+
+def test_recon_module_defers_report_and_mail_dependencies():
+    pytest.importorskip('pandas')
+    pytest.importorskip('psycopg2')
+
+    loaded = _loaded_heavy_modules('recon.recon_process')
+
+    assert 'fpdf' not in loaded
+    assert 'O365' not in loaded
+    assert 'robocorp.vault' not in loaded
+
+
+def test_tasks_import_time_within_budget():
+    pytest.importorskip('robocorp.tasks')
+    pytest.importorskip('dotenv')
+
+    import_ms = _cumulative_import_ms('tasks')
+
+    assert import_ms < IMPORT_BUDGET_MS, f'import tasks took {import_ms:.0f}ms, budget {IMPORT_BUDGET_MS:.0f}ms'
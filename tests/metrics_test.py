@@ -0,0 +1,69 @@
+import pytest
+
+metrics = pytest.importorskip('metrics')
+
+
+def _samples(text):
+    return dict(line.rsplit(' ', 1) for line in text.splitlines() if line and not line.startswith('#'))
+
+
+def _value(name, **labels):
+    return metrics.REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_textfile_is_written_for_one_shot_runs(tmp_path):
+    registry = metrics.CollectorRegistry()
+    metrics.Gauge('up', 'Up.', registry=registry).set(1)
+
+    path = metrics.write_textfile(str(tmp_path / 'output' / 'metrics.prom'), registry=registry)
+
+    with open(path) as metrics_file:
+        assert 'up 1.0' in metrics_file.read()
+    assert [p.name for p in (tmp_path / 'output').iterdir()] == ['metrics.prom']
+
+
+def test_bank_api_records_latency_and_status_codes(fnb_server):
+    fnb = pytest.importorskip('bank.fnb')
+    fnb_server.configure(rate_limit_rate=1.0, retry_after=0)
+    history = {'bank': 'fnb', 'endpoint': 'transaction-history'}
+    before = (_value('recon_bank_responses_total', bank='fnb', endpoint='token', status='200'),
+              _value('recon_bank_responses_total', status='429', **history),
+              _value('recon_bank_request_seconds_count', **history))
+
+    bank_api = fnb.BankAPI('stub-client', 'stub-secret', fnb_server.base_url, fnb_server.auth_url, {},
+                           max_retries=1, backoff_seconds=0.01)
+    bank_api.get_transaction_history('62000000000', '2024-08-01', '2024-08-02')
+
+    after = (_value('recon_bank_responses_total', bank='fnb', endpoint='token', status='200'),
+             _value('recon_bank_responses_total', status='429', **history),
+             _value('recon_bank_request_seconds_count', **history))
+    assert [a - b for a, b in zip(after, before)] == [1, 2, 2]
+
+
+def test_worker_serves_metrics():
+    from urllib import request as urlrequest
+
+    worker_module = pytest.importorskip('recon.worker')
+
+    class _Pool:
+        def getconn(self):
+            return type('Connection', (), {'rollback': lambda self: None})()
+
+        def putconn(self, conn):
+            pass
+
+    before = _value('recon_run_seconds_count', status='done')
+    worker = worker_module.ReconWorker(object(), _Pool(), '62000000000',
+                                       reconcile=lambda *args, **kwargs: {'status': 'completed'}).start()
+    httpd = worker_module.serve_http(worker, port=0)
+    try:
+        worker.submit('2024-08-01', '2024-08-02')
+        worker.join_queue()
+        with urlrequest.urlopen(f'http://127.0.0.1:{httpd.server_port}/metrics') as response:
+            assert response.headers['Content-Type'] == metrics.CONTENT_TYPE
+            body = response.read().decode()
+    finally:
+        httpd.shutdown()
+        worker.stop()
+
+    assert float(_samples(body)['recon_run_seconds_count{status="done"}']) == before + 1
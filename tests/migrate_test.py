@@ -0,0 +1,154 @@
+from datetime import date, timedelta
+from pathlib import Path
+
+import pytest
+
+pd = pytest.importorskip('pandas')
+migrate_module = pytest.importorskip('recon.migrate')
+recon_process = pytest.importorskip('recon.recon_process')
+
+SCHEMA_SQL = Path(__file__).parent / 'sql' / 'recon_schema.sql'
+
+
+def _scalar(db_conn, query, params=None):
+    with db_conn.cursor() as cur:
+        cur.execute(query, params)
+        return cur.fetchone()[0]
+
+
+def _partitions(db_conn):
+    with db_conn.cursor() as cur:
+        cur.execute("""
+            SELECT child.relname FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = 'fin.batch_transactions'::regclass
+            ORDER BY 1
+        """)
+        return [name for name, in cur.fetchall()]
+
+
+@pytest.fixture
+def legacy_db(recon_db):
+    """recon_db as it was before managed migrations, with history in the unpartitioned table."""
+    with recon_db.cursor() as cur:
+        cur.execute('DROP SCHEMA IF EXISTS fin CASCADE')
+        cur.execute(SCHEMA_SQL.read_text())
+        # A column added to production by hand, which the migrations do not know about
+        cur.execute("ALTER TABLE fin.batch_transactions ADD COLUMN cashier TEXT NOT NULL DEFAULT 'robot'")
+        cur.execute("INSERT INTO fin.batch (branch_code, batch_date, total) VALUES ('BR001', '2023-11-30', 0)")
+        cur.execute("""
+            INSERT INTO fin.batch_transactions (booking_date, value_date, reference, amount, discount, batch_id,
+                                                cashier)
+            VALUES ('2023-11-30', '2023-11-30', '101ABC12', 100, 0, 1, 'robot'),
+                   ('2024-01-15', '2024-01-15', '101XYZ99', 250, 25, 1, 'thandi'),
+                   (NULL, NULL, '101KLM07', 10, 0, 1, 'robot')
+        """)
+    recon_db.commit()
+    return recon_db
+
+
+def test_migration_files_are_ordered_by_version():
+    versions = [migration.version for migration in migrate_module.available_migrations()]
+
+    assert versions == sorted(versions) and versions[:2] == ['0001', '0002']
+
+
+def test_existing_history_moves_into_monthly_partitions(legacy_db):
+    assert migrate_module.migrate(legacy_db) == ['0001', '0002', '0003', '0004', '0005', '0006']
+
+    assert _scalar(legacy_db, "SELECT relkind FROM pg_class WHERE oid = 'fin.batch_transactions'::regclass") == 'p'
+    partitions = _partitions(legacy_db)
+    assert {'batch_transactions_2023_11', 'batch_transactions_2024_01', 'batch_transactions_default'} <= set(partitions)
+    assert f"batch_transactions_{date.today():%Y_%m}" in partitions
+    with legacy_db.cursor() as cur:
+        cur.execute("SELECT id, tableoid::regclass::text, reference, cashier FROM fin.batch_transactions ORDER BY id")
+        assert cur.fetchall() == [(1, 'fin.batch_transactions_2023_11', '101ABC12', 'robot'),
+                                  (2, 'fin.batch_transactions_2024_01', '101XYZ99', 'thandi'),
+                                  (3, 'fin.batch_transactions_default', '101KLM07', 'robot')]
+    # New rows continue the old ids and keep the old table's defaults and foreign keys
+    with legacy_db.cursor() as cur:
+        cur.execute("INSERT INTO fin.batch_transactions (booking_date, reference, batch_id) "
+                    "VALUES (current_date, '101ABC12', 1) RETURNING id, cashier")
+        assert cur.fetchone() == (4, 'robot')
+    with pytest.raises(migrate_module.psycopg2.IntegrityError):
+        with legacy_db.cursor() as cur:
+            cur.execute("INSERT INTO fin.batch_transactions (booking_date, batch_id) VALUES (current_date, 999)")
+    legacy_db.rollback()
+    # The old table is kept for checking the copy
+    assert _scalar(legacy_db, 'SELECT count(*) FROM fin.batch_transactions_unpartitioned') == 3
+
+
+def test_partitioning_stops_when_the_table_lacks_expected_columns(legacy_db):
+    with legacy_db.cursor() as cur:
+        cur.execute('ALTER TABLE fin.batch_transactions DROP COLUMN value_date')
+    legacy_db.commit()
+
+    with pytest.raises(migrate_module.psycopg2.Error, match='value_date'):
+        migrate_module.migrate(legacy_db)
+
+    assert _scalar(legacy_db, "SELECT relkind FROM pg_class WHERE oid = 'fin.batch_transactions'::regclass") == 'r'
+    assert _scalar(legacy_db, 'SELECT count(*) FROM fin.batch_transactions') == 3
+
+
+def test_a_new_database_gets_every_table_recon_uses(recon_db):
+    with recon_db.cursor() as cur:
+        cur.execute('DROP SCHEMA fin CASCADE; DROP SCHEMA crm CASCADE')
+    recon_db.commit()
+
+    migrate_module.migrate(recon_db)
+
+    for table in ('crm.customers', 'fin.batch', 'fin.batch_transactions', 'fin.general_ledger', 'fin.invoices',
+                  'fin.invoice_allocations', 'fin.recon_daily_summary', 'fin.recon_windows',
+                  'fin.recon_transaction_hashes'):
+        assert _scalar(recon_db, 'SELECT to_regclass(%s)::text', (table,)) == table
+    assert recon_process.RECON(None).allocator.load_open_invoices(recon_db, ['101ABC12']).empty
+
+
+def test_migrate_applies_each_migration_once(recon_db):
+    assert migrate_module.migrate(recon_db) == []
+    assert _scalar(recon_db, 'SELECT count(*) FROM fin.schema_migrations') == len(migrate_module.available_migrations())
+
+
+def test_changed_migration_is_rejected(recon_db, tmp_path):
+    for migration in migrate_module.available_migrations():
+        (tmp_path / f'{migration.version}_{migration.name}.sql').write_text(migration.sql + '\n-- edited\n')
+
+    with pytest.raises(ValueError, match='changed after it was applied'):
+        migrate_module.migrate(recon_db, str(tmp_path))
+
+
+def test_rows_in_the_default_partition_move_when_their_month_is_created(recon_db):
+    far_future = date.today().replace(day=1) + timedelta(days=3 * 366)
+    with recon_db.cursor() as cur:
+        cur.execute("INSERT INTO fin.batch_transactions (booking_date, reference, amount) VALUES (%s, 'X', 1)",
+                    (far_future,))
+    recon_db.commit()
+    assert _scalar(recon_db, 'SELECT count(*) FROM fin.batch_transactions_default') == 1
+
+    assert migrate_module.ensure_partitions(recon_db, far_future, far_future, months_ahead=0) >= 1
+    assert migrate_module.ensure_partitions(recon_db, far_future, far_future, months_ahead=0) == 0
+
+    assert _scalar(recon_db, 'SELECT count(*) FROM fin.batch_transactions_default') == 0
+    assert _scalar(recon_db, 'SELECT tableoid::regclass::text FROM fin.batch_transactions') == \
+        f'fin.batch_transactions_{far_future:%Y_%m}'
+
+
+def test_inserted_rows_keep_the_bank_entry_id_and_prune_by_date(recon_db):
+    recon = recon_process.RECON(None)
+    today = date.today()
+    df = pd.DataFrame({
+        'entryId': ['E1', 'E2'], 'bookingDate': [today, today], 'valueDate': [today, today],
+        'remittanceInfo': ['ADT CASH DEPO0412 ABC12', '101XYZ99'], 'reference': ['101ABC12', '101XYZ99'],
+        'amount': [100.0, 50.0], 'discount': [0.0, 0.0], 'currency': ['ZAR', 'ZAR'],
+        'availableCreditDebitIndicator': ['CRDT', 'CRDT'],
+    })
+    batch_id = recon.insert_batch(recon_db, 'BR001', today, 'Finance (Bot)', 150.0, 0.0, 150.0)
+    recon.insert_bank_transactions(recon_db, df, batch_id)
+
+    with recon_db.cursor() as cur:
+        cur.execute('SELECT entry_id FROM fin.batch_transactions WHERE batch_id = %s ORDER BY id', (batch_id,))
+        assert [entry_id for entry_id, in cur.fetchall()] == ['E1', 'E2']
+        cur.execute("EXPLAIN SELECT * FROM fin.batch_transactions WHERE reference = '101ABC12' AND booking_date = %s",
+                    (today,))
+        plan = '\n'.join(line for line, in cur.fetchall())
+    assert f'batch_transactions_{today:%Y_%m}' in plan and 'batch_transactions_default' not in plan
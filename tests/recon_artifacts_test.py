@@ -0,0 +1,129 @@
+import os
+import time
+
+import pytest
+
+artifacts_module = pytest.importorskip('recon.artifacts')
+outbox_module = pytest.importorskip('recon.outbox')
+
+DEBTORS = ['sharon@example.com', 'francina@example.com']
+
+
+class _Sender:
+    def __init__(self):
+        self.sent = []
+
+    def __call__(self, recipients, subject, body, attachments):
+        contents = {os.path.basename(path): open(path, 'rb').read() for path in attachments}
+        self.sent.append({'subject': subject, 'body': body, 'attachments': contents})
+
+
+@pytest.fixture
+def store(tmp_path):
+    return artifacts_module.ArtifactStore(str(tmp_path / 'artifacts'), max_age_days=30, max_bytes=10 ** 9)
+
+
+def _report(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_reports_are_stored_once_and_compressed(store, tmp_path):
+    content = b'valueDate,remittanceInfo,amount\n' + b'2024-08-01,CUSTOMER 101ABC,100.00\n' * 2000
+
+    first = store.put(_report(tmp_path, 'Latest_FNB_Bank_Statement_0800.xlsx', content))
+    second = store.put(_report(tmp_path, 'Latest_FNB_Bank_Statement_0900.xlsx', content))
+
+    assert first.digest == second.digest and second.name == 'Latest_FNB_Bank_Statement_0900.xlsx'
+    assert not os.path.exists(tmp_path / 'Latest_FNB_Bank_Statement_0800.xlsx')
+    assert len(store._objects()) == 1
+    assert store.size() < len(content) / 10
+
+    restored = store.materialize(first.digest, first.name, str(tmp_path))
+    with open(restored, 'rb') as restored_file:
+        assert restored_file.read() == content
+
+
+def test_prune_evicts_by_age_then_least_recently_used(tmp_path):
+    store = artifacts_module.ArtifactStore(str(tmp_path / 'artifacts'), max_age_days=7, max_bytes=10 ** 9)
+    now = time.time()
+    expired, kept, old, recent = (store.put(_report(tmp_path, f'{name}.pdf', os.urandom(4096)))
+                                  for name in ('expired', 'kept', 'old', 'recent'))
+    for artifact, age_days in ((expired, 8), (kept, 9), (old, 2), (recent, 1)):
+        used_at = now - age_days * 86400
+        os.utime(store.object_path(artifact.digest), (used_at, used_at))
+
+    assert store.prune(keep={kept.digest}, now=now)['objects'] == 1
+    assert not store.exists(expired.digest) and store.exists(kept.digest)
+
+    store.max_bytes = store.size() - 1
+    assert store.prune(keep={kept.digest}, now=now)['objects'] == 1
+    assert [store.exists(a.digest) for a in (kept, old, recent)] == [True, False, True]
+
+
+def test_shared_statement_is_attached_once_per_thread(store, tmp_path):
+    outbox = outbox_module.Outbox(str(tmp_path / 'outbox.sqlite3'), artifacts=store)
+    statement = store.put(_report(tmp_path, 'Latest_FNB_Bank_Statement.xlsx', b'statement v1'))
+    sender = _Sender()
+
+    def queue(batch, shared, thread):
+        report = store.put(_report(tmp_path, f'FNB {batch} BATCH.pdf', batch.encode()))
+        outbox.enqueue(DEBTORS, f'FNB {batch} BATCH', '<p>recon</p>', [report],
+                       shared_attachments=[shared], thread=thread)
+        outbox.drain(sender)
+        return sender.sent[-1]
+
+    first = queue('30-DAY', statement, 'fnb-recon-2024-08-01')
+    second = queue('7-DAY', statement, 'fnb-recon-2024-08-01')
+    changed = queue('COD', store.put(_report(tmp_path, 'Latest_FNB_Bank_Statement.xlsx', b'statement v2')),
+                    'fnb-recon-2024-08-01')
+    next_day = queue('30-DAY', statement, 'fnb-recon-2024-08-02')
+
+    assert first['attachments'] == {'FNB 30-DAY BATCH.pdf': b'30-DAY', 'Latest_FNB_Bank_Statement.xlsx': b'statement v1'}
+    assert second['attachments'] == {'FNB 7-DAY BATCH.pdf': b'7-DAY'}
+    assert 'Sent earlier in this thread: Latest_FNB_Bank_Statement.xlsx' in second['body']
+    assert changed['attachments']['Latest_FNB_Bank_Statement.xlsx'] == b'statement v2'
+    assert 'Latest_FNB_Bank_Statement.xlsx' in next_day['attachments']
+
+
+def test_unsent_attachments_survive_pruning(store, tmp_path):
+    outbox = outbox_module.Outbox(str(tmp_path / 'outbox.sqlite3'), artifacts=store)
+    report = store.put(_report(tmp_path, 'report.pdf', b'report'))
+    outbox.enqueue(DEBTORS, 'FNB 30-DAY BATCH', '<p>recon</p>', [report])
+
+    store.max_bytes = 0
+    store.prune(keep=outbox.pending_artifacts())
+    assert store.exists(report.digest)
+
+    outbox.drain(_Sender())
+    store.prune(keep=outbox.pending_artifacts())
+    assert not store.exists(report.digest)
+
+
+def test_each_run_writes_its_reports_to_its_own_directory(recon_db, store, tmp_path, monkeypatch):
+    from datetime import date
+
+    pd = pytest.importorskip('pandas')
+    pytest.importorskip('openpyxl')
+    recon_process = pytest.importorskip('recon.recon_process')
+
+    monkeypatch.chdir(tmp_path)
+    recon = recon_process.RECON(None)
+    recon.artifacts = store
+    stored = []
+    monkeypatch.setattr(recon, 'store_artifact', lambda path: stored.append(path) or store.put(path))
+    statement_df = pd.DataFrame({
+        'entryId': ['E1'], 'bookingDate': [date(2024, 8, 1)], 'valueDate': [date(2024, 8, 1)],
+        'remittanceInfo': ['BANK CHARGES'], 'reference': ['BANK CHARGES'], 'amount': [12.0], 'currency': ['ZAR'],
+        'creditDebitIndicator': ['DBIT'], 'availableCreditDebitIndicator': ['DBIT'],
+    })
+
+    # Two runs of the shared client within the same minute
+    for _ in range(2):
+        assert recon.process_transactions(statement_df.copy(), recon_db) == [recon_process.UNMATCHED]
+
+    report_dirs = {os.path.dirname(path) for path in stored}
+    assert len(stored) == 4 and len(report_dirs) == 2
+    assert not any(os.path.exists(directory) for directory in report_dirs)
+    assert not list(tmp_path.glob('*.xlsx'))
@@ -0,0 +1,125 @@
+# Benchmarks for the FNB recon pipeline on synthetic statements.
+#
+# Runs offline against the stub FNB server and throwaway Postgres from conftest.py.
+#   python -m pytest tests/recon_benchmark_test.py --benchmark-only
+# Row counts default to 10k; set RECON_BENCH_ROWS=10000,100000,1000000 for the full suite.
+import os
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+pd = pytest.importorskip('pandas')
+fnb = pytest.importorskip('bank.fnb')
+recon_process = pytest.importorskip('recon.recon_process')
+
+ROW_COUNTS = [int(rows) for rows in os.getenv('RECON_BENCH_ROWS', '10000').split(',')]
+ROUNDS = int(os.getenv('RECON_BENCH_ROUNDS', '3'))
+
+
+@pytest.fixture(scope='module')
+def bank_api(fnb_stub_server):
+    return fnb.BankAPI('stub-client', 'stub-secret', fnb_stub_server.base_url, fnb_stub_server.auth_url, {})
+
+
+@pytest.fixture(scope='module')
+def statement_frames(bank_api, fnb_stub_server, synthetic_statement):
+    """Normalized transaction frames fetched through BankAPI, one per row count."""
+    frames = {}
+
+    def _frame(rows):
+        if rows not in frames:
+            fnb_stub_server.load_statement(synthetic_statement(rows))
+            frames[rows] = bank_api.get_transaction_history('62000000000', '2024-08-01', '2024-08-02')
+        return frames[rows].copy()
+
+    return _frame
+
+
+@pytest.fixture(scope='module')
+def matched_frames(statement_frames, customers):
+    """Frames with customer_id, payment_terms, discount and total filled in, as after discounting."""
+    customers_df = pd.DataFrame(customers, columns=['customer_id', 'payment_terms'])
+    recon = recon_process.RECON(None)
+
+    def _frame(rows):
+        df = statement_frames(rows)
+        df['customer_id'] = df.apply(recon.extract_customer_id, axis=1)
+        df['reference'] = df['customer_id']
+        df = df.merge(customers_df, how='left', on='customer_id')
+        df['discount'] = 0.0
+        return recon.apply_discount_at_transaction_level(df)
+
+    return _frame
+
+
+def _pedantic(benchmark, target, make_args):
+    return benchmark.pedantic(target, setup=lambda: (make_args(), {}), rounds=ROUNDS, iterations=1)
+
+
+@pytest.mark.parametrize('rows', ROW_COUNTS)
+def test_fetch_and_normalize(benchmark, bank_api, fnb_stub_server, synthetic_statement, rows):
+    fnb_stub_server.load_statement(synthetic_statement(rows))
+    df = benchmark.pedantic(bank_api.get_transaction_history,
+                            args=('62000000000', '2024-08-01', '2024-08-02'), rounds=ROUNDS)
+    assert len(df) == rows
+
+
+@pytest.mark.parametrize('rows', ROW_COUNTS)
+def test_extract_customer_ids(benchmark, statement_frames, rows):
+    recon = recon_process.RECON(None)
+    df = statement_frames(rows)
+    customer_ids = benchmark(df.apply, recon.extract_customer_id, axis=1)
+    assert customer_ids.notna().mean() > 0.9
+
+
+@pytest.mark.parametrize('rows', ROW_COUNTS)
+def test_read_and_apply_discounts(benchmark, statement_frames, recon_db, rows):
+    recon = recon_process.RECON(None)
+    df, unmatched_df, _ = _pedantic(benchmark, recon.read_and_apply_discounts,
+                                    lambda: (statement_frames(rows), recon_db))
+    assert len(df) == rows
+    assert len(unmatched_df) < rows
+
+
+@pytest.mark.parametrize('rows', ROW_COUNTS)
+def test_split_batches(benchmark, matched_frames, rows):
+    recon = recon_process.RECON(None)
+    df = matched_frames(rows)
+
+    batches = benchmark(recon.split_batches, df)
+    assert sum(len(batch) for batch in batches.values()) <= rows
+
+
+@pytest.mark.parametrize('rows', ROW_COUNTS)
+def test_generate_pdf_report(benchmark, matched_frames, tmp_path, monkeypatch, rows):
+    monkeypatch.chdir(tmp_path)
+    recon = recon_process.RECON(None)
+    df = matched_frames(rows)
+    pdf_file = benchmark.pedantic(recon.generate_pdf_report,
+                                  args=(df, 1, df['total'].sum(), df['discount'].sum(), '30-DAY'), rounds=ROUNDS)
+    assert (tmp_path / pdf_file).exists()
+
+
+@pytest.mark.parametrize('rows', ROW_COUNTS)
+def test_save_raw_transactions_excel(benchmark, statement_frames, tmp_path, monkeypatch, rows):
+    pytest.importorskip('openpyxl')
+    monkeypatch.chdir(tmp_path)
+    recon = recon_process.RECON(None)
+    df = statement_frames(rows)
+    excel_file = benchmark.pedantic(recon.save_raw_transactions_excel,
+                                    args=(df, 'Latest_FNB_Bank_Statement', '2024-08-01', '10:00'), rounds=ROUNDS)
+    assert (tmp_path / excel_file).exists()
+
+
+@pytest.mark.parametrize('rows', ROW_COUNTS)
+def test_insert_bank_transactions(benchmark, record_rate, matched_frames, recon_db, rows):
+    recon = recon_process.RECON(None)
+    df = matched_frames(rows)
+    batch_id = recon.insert_batch(recon_db, 'BR001', '2024-08-01', 'Finance (Bot)',
+                                  df['amount'].sum(), df['discount'].sum(), df['total'].sum())
+    benchmark.pedantic(recon.insert_bank_transactions, args=(recon_db, df, batch_id), rounds=ROUNDS)
+    timed = record_rate(rows)
+
+    with recon_db.cursor() as cur:
+        cur.execute('SELECT count(*) FROM fin.batch_transactions WHERE batch_id = %s', (batch_id,))
+        assert cur.fetchone()[0] == rows * (ROUNDS if timed else 1)
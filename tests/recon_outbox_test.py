@@ -0,0 +1,146 @@
+import time
+
+import pytest
+
+outbox_module = pytest.importorskip('recon.outbox')
+
+DEBTORS = ['sharon@example.com', 'francina@example.com']
+
+
+class _Sender:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.sent = []
+
+    def __call__(self, recipients, subject, body, attachments):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError('graph unavailable')
+        self.sent.append({'recipients': recipients, 'subject': subject, 'body': body, 'attachments': attachments})
+
+
+@pytest.fixture
+def files(tmp_path):
+    paths = {}
+    for name in ('statement.xlsx', 'batch_30.pdf', 'batch_7.pdf', 'signature.png'):
+        paths[name] = tmp_path / name
+        paths[name].write_bytes(name.encode())
+    return {name: str(path) for name, path in paths.items()}
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    return outbox_module.Outbox(str(tmp_path / 'outbox.sqlite3'), max_attempts=3, backoff_seconds=10)
+
+
+def test_messages_for_the_same_recipients_are_sent_as_one_email(outbox, files):
+    first = outbox.enqueue(DEBTORS, 'FNB 30-DAY BATCH 1', '<p>recon</p>',
+                           [files['signature.png'], files['batch_30.pdf'], files['statement.xlsx']])
+    second = outbox.enqueue(list(reversed(DEBTORS)), 'FNB 7-DAY BATCH 2', '<p>recon</p>',
+                            [files['signature.png'], files['batch_7.pdf'], files['statement.xlsx']])
+    other = outbox.enqueue(['audit@example.com'], 'FNB COD BATCH 3', '<p>recon</p>', [files['statement.xlsx']])
+    sender = _Sender()
+
+    assert outbox.drain(sender) == {'sent': 3, 'retry': 0, 'failed': 0}
+
+    batched, single = sender.sent
+    assert batched['subject'] == 'FNB 30-DAY BATCH 1 (+1 more)'
+    assert 'FNB 7-DAY BATCH 2' in batched['body'] and batched['body'].count('<p>recon</p>') == 1
+    assert [path.rsplit('/', 1)[1] for path in batched['attachments']] == [
+        'signature.png', 'batch_30.pdf', 'statement.xlsx', 'batch_7.pdf']
+    assert single['recipients'] == ['audit@example.com'] and single['subject'] == 'FNB COD BATCH 3'
+    assert [outbox.status(message_id)['status'] for message_id in (first, second, other)] == ['sent'] * 3
+    assert outbox.drain(sender) == {'sent': 0, 'retry': 0, 'failed': 0}
+
+
+def test_failed_sends_back_off_and_give_up(outbox, files):
+    message_id = outbox.enqueue(DEBTORS, 'FNB 30-DAY BATCH 1', '<p>recon</p>', [files['statement.xlsx']])
+    sender = _Sender(failures=3)
+    start = time.time() + 1
+
+    assert outbox.drain(sender, now=start) == {'sent': 0, 'retry': 1, 'failed': 0}
+    assert outbox.status(message_id)['last_error'] == 'graph unavailable'
+    # Not due again until the backoff has passed, then the delay doubles
+    assert outbox.drain(sender, now=start + 9) == {'sent': 0, 'retry': 0, 'failed': 0}
+    assert outbox.drain(sender, now=start + 10) == {'sent': 0, 'retry': 1, 'failed': 0}
+    assert outbox.drain(sender, now=start + 29) == {'sent': 0, 'retry': 0, 'failed': 0}
+    assert outbox.drain(sender, now=start + 30) == {'sent': 0, 'retry': 0, 'failed': 1}
+
+    assert outbox.status(message_id)['status'] == 'failed'
+    assert outbox.counts() == {'failed': 1}
+    assert sender.sent == []
+
+
+def test_claimed_messages_are_not_sent_twice(outbox, files):
+    message_id = outbox.enqueue(DEBTORS, 'FNB 30-DAY BATCH 1', '<p>recon</p>', [files['statement.xlsx']])
+    start = time.time() + 1
+    claimed = outbox._claim(now=start)
+    sender = _Sender()
+
+    assert [message['message_id'] for message in claimed] == [message_id]
+    assert outbox.drain(sender, now=start + 1) == {'sent': 0, 'retry': 0, 'failed': 0}
+    # A sender that died holding the claim does not strand the message
+    assert outbox.drain(sender, now=start + outbox.claim_timeout) == {'sent': 1, 'retry': 0, 'failed': 0}
+
+
+def test_drain_without_an_outbox_file_creates_nothing(tmp_path):
+    outbox = outbox_module.Outbox(str(tmp_path / 'outbox.sqlite3'))
+
+    assert outbox.drain(_Sender()) == {'sent': 0, 'retry': 0, 'failed': 0}
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_worker_sends_queued_mail_when_it_stops(tmp_path, files):
+    worker_module = pytest.importorskip('recon.worker')
+
+    class _Pool:
+        def getconn(self):
+            return type('Connection', (), {'rollback': lambda self: None})()
+
+        def putconn(self, conn):
+            pass
+
+    def reconcile(bank_api, db_conn, account_number, from_date, to_date, recon_client=None):
+        recon_client.queue_email_with_attachments(DEBTORS, f'FNB 30-DAY BATCH {from_date}', '<p>recon</p>',
+                                                  files['batch_30.pdf'], files['statement.xlsx'],
+                                                  files['signature.png'])
+        return {'status': 'completed'}
+
+    worker = worker_module.ReconWorker(object(), _Pool(), '62000000000', reconcile=reconcile, outbox_interval=0)
+    worker.recon_client.outbox = outbox_module.Outbox(str(tmp_path / 'outbox.sqlite3'))
+    worker.recon_client.send_email = sender = _Sender()
+    worker.start()
+    worker.submit('2024-08-01', '2024-08-02')
+    worker.submit('2024-08-02', '2024-08-03')
+    worker.join_queue()
+
+    assert sender.sent == []
+    worker.stop()
+
+    assert len(sender.sent) == 1
+    assert sender.sent[0]['subject'] == 'FNB 30-DAY BATCH 2024-08-01 (+1 more)'
+    assert len(sender.sent[0]['attachments']) == 3
+
+
+def test_outbox_delivers_through_the_graph_stand_in(graph_mail_server, tmp_path, monkeypatch, files):
+    pytest.importorskip('O365')
+    recon_process = pytest.importorskip('recon.recon_process')
+    from recon.pipeline import flush_outbox
+
+    monkeypatch.chdir(tmp_path)
+    recon_client = recon_process.RECON(None)
+    recon_client.outbox = outbox_module.Outbox(str(tmp_path / 'outbox.sqlite3'))
+    # As a worker or robot run is pointed at the stand-in
+    monkeypatch.setenv('GRAPH_URL', graph_mail_server.graph_url)
+
+    for batch in ('30', '7'):
+        recon_client.queue_email_with_attachments(DEBTORS, f'FNB {batch}-DAY BATCH', '<p>recon</p>',
+                                                  files[f'batch_{batch}.pdf'], files['statement.xlsx'],
+                                                  files['signature.png'])
+    assert graph_mail_server.messages_summary() == []
+
+    assert flush_outbox(recon_client) == {'sent': 2, 'retry': 0, 'failed': 0}
+
+    messages = graph_mail_server.messages_summary()
+    assert len(messages) == 1
+    assert sorted(messages[0]['attachments']) == ['batch_30.pdf', 'batch_7.pdf', 'signature.png', 'statement.xlsx']
@@ -0,0 +1,61 @@
+from datetime import date
+
+import pytest
+
+pd = pytest.importorskip('pandas')
+summary = pytest.importorskip('recon.summary')
+recon_process = pytest.importorskip('recon.recon_process')
+
+
+def _batch_df():
+    return pd.DataFrame({
+        'bookingDate': [date(2024, 8, 1), date(2024, 8, 1), date(2024, 8, 2)],
+        'payment_terms': ['10% STRICTLY 31 DAYS'] * 3,
+        'customer_id': ['101ABC12', '101ABC12', '101XYZ99'],
+        'amount': [90.0, 180.0, 45.0],
+        'discount': [10.0, 20.0, 5.0],
+        'total': [100.0, 200.0, 50.0],
+    })
+
+
+def test_aggregate_batch_rolls_up_per_day_terms_and_customer():
+    rows = summary.aggregate_batch(_batch_df(), 'BR001', 7)
+
+    assert sorted(rows) == [
+        (date(2024, 8, 1), 'BR001', '10% STRICTLY 31 DAYS', '101ABC12', 2, 270.0, 30.0, 300.0, 7),
+        (date(2024, 8, 2), 'BR001', '10% STRICTLY 31 DAYS', '101XYZ99', 1, 45.0, 5.0, 50.0, 7),
+    ]
+
+
+def test_aggregate_batch_of_empty_frame_is_empty():
+    assert summary.aggregate_batch(_batch_df().iloc[0:0], 'BR001', 7) == []
+
+
+def test_monthly_totals_rejects_unknown_group_columns():
+    with pytest.raises(ValueError):
+        summary.ReconSummary().monthly_totals(None, '2024-08-01', '2024-08-31', group_by=['amount; DROP TABLE x'])
+
+
+def test_posting_updates_rollups_incrementally(recon_db):
+    recon = recon_process.RECON(None)
+
+    for _ in range(2):
+        batch_id = recon.insert_batch(recon_db, 'BR001', '2024-08-02', 'Finance (Bot)', 315.0, 35.0, 350.0)
+        recon.post_to_general_ledger(recon_db, batch_id, 350.0, _batch_df())
+
+    daily = recon.summary.daily_totals(recon_db, '2024-08-01', '2024-08-31', customer_id='101ABC12')
+    assert daily[['transaction_count', 'sub_total', 'total']].values.tolist() == [[4, 540.0, 600.0]]
+
+    monthly = recon.summary.monthly_totals(recon_db, '2024-08-01', '2024-08-31')
+    assert monthly[['payment_terms', 'transaction_count', 'total']].values.tolist() == [
+        ['10% STRICTLY 31 DAYS', 6, 700.0]
+    ]
+
+
+def test_failed_posting_leaves_rollups_untouched(recon_db):
+    recon = recon_process.RECON(None)
+
+    # No such batch: the ledger insert violates its foreign key and the whole posting rolls back
+    recon.post_to_general_ledger(recon_db, 999999, 350.0, _batch_df())
+
+    assert recon.summary.daily_totals(recon_db, '2024-08-01', '2024-08-31').empty
@@ -0,0 +1,184 @@
+import json
+import threading
+from datetime import datetime
+from urllib import request as urlrequest
+
+import pytest
+
+worker_module = pytest.importorskip('recon.worker')
+
+
+class _Connection:
+    def rollback(self):
+        pass
+
+
+class _Pool:
+    def __init__(self):
+        self.in_use = 0
+        self.down = False
+
+    def getconn(self):
+        if self.down:
+            raise RuntimeError('connection pool exhausted')
+        self.in_use += 1
+        return _Connection()
+
+    def putconn(self, conn):
+        self.in_use -= 1
+
+
+def _worker(reconcile, **kwargs):
+    return worker_module.ReconWorker(object(), _Pool(), '62000000000', reconcile=reconcile, **kwargs)
+
+
+def test_schedule_aligns_intervals_to_the_clock():
+    schedule = worker_module.Schedule(every_minutes=15)
+
+    assert schedule.next_run(datetime(2024, 8, 1, 10, 7, 30)) == datetime(2024, 8, 1, 10, 15)
+    assert schedule.next_run(datetime(2024, 8, 1, 23, 50)) == datetime(2024, 8, 2, 0, 0)
+
+
+def test_schedule_picks_the_earliest_of_interval_and_fixed_times():
+    schedule = worker_module.Schedule(every_minutes=120, at_times=['06:30', '18:00'])
+
+    assert schedule.next_run(datetime(2024, 8, 1, 6, 0)) == datetime(2024, 8, 1, 6, 30)
+    assert schedule.next_run(datetime(2024, 8, 1, 18, 0)) == datetime(2024, 8, 1, 20, 0)
+    assert not worker_module.Schedule()
+
+
+def test_runs_share_the_warm_recon_client():
+    clients = []
+
+    def reconcile(bank_api, db_conn, account_number, from_date, to_date, recon_client=None):
+        clients.append(recon_client)
+        return {'status': 'completed', 'reconciled': 1}
+
+    worker = _worker(reconcile, customer_cache_seconds=600).start()
+    worker.submit('2024-08-01', '2024-08-02')
+    worker.submit('2024-08-02', '2024-08-03')
+    worker.join_queue()
+    worker.stop()
+
+    assert len(clients) == 2 and clients[0] is clients[1]
+    assert clients[0].customer_cache_seconds == 600
+    assert [run['status'] for run in worker.status()] == ['done', 'done']
+
+
+def test_duplicate_window_is_not_queued_twice():
+    release = threading.Event()
+    calls = []
+
+    def reconcile(bank_api, db_conn, account_number, from_date, to_date, recon_client=None):
+        calls.append((from_date, to_date))
+        release.wait(5)
+        return {}
+
+    worker = _worker(reconcile).start()
+    first = worker.submit('2024-08-01', '2024-08-02')
+    second = worker.submit('2024-08-01', '2024-08-02')
+    release.set()
+    worker.join_queue()
+    worker.stop()
+
+    assert first['run_id'] == second['run_id']
+    assert calls == [('2024-08-01', '2024-08-02')]
+
+
+def test_concurrency_limits_parallel_runs():
+    active = []
+    peak = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(2, timeout=5)
+
+    def reconcile(bank_api, db_conn, account_number, from_date, to_date, recon_client=None):
+        with lock:
+            active.append(from_date)
+            peak.append(len(active))
+        barrier.wait()
+        with lock:
+            active.remove(from_date)
+        return {}
+
+    worker = _worker(reconcile, concurrency=2).start()
+    for day in range(1, 5):
+        worker.submit(f'2024-08-0{day}', f'2024-08-0{day + 1}')
+    worker.join_queue()
+    worker.stop()
+
+    assert max(peak) == 2
+    assert worker.db_pool.in_use == 0
+
+
+def test_failed_run_is_reported_and_worker_keeps_going():
+    def reconcile(bank_api, db_conn, account_number, from_date, to_date, recon_client=None):
+        if from_date == '2024-08-01':
+            raise RuntimeError('bank down')
+        return {'status': 'completed'}
+
+    worker = _worker(reconcile).start()
+    failed = worker.submit('2024-08-01', '2024-08-02')
+    done = worker.submit('2024-08-02', '2024-08-03')
+    worker.join_queue()
+    worker.stop()
+
+    assert worker.status(failed['run_id'])['error'] == 'bank down'
+    assert worker.status(done['run_id'])['status'] == 'done'
+
+
+def test_run_fails_cleanly_when_no_connection_is_available():
+    worker = _worker(lambda *args, **kwargs: {'status': 'completed'})
+    worker.db_pool.down = True
+    worker.start()
+
+    run = worker.submit('2024-08-01', '2024-08-02')
+    worker.join_queue()
+
+    assert worker.status(run['run_id'])['status'] == 'failed'
+    assert worker.status(run['run_id'])['error'] == 'connection pool exhausted'
+    # The window is free again, and the worker thread is still there to run it
+    worker.db_pool.down = False
+    retry = worker.submit('2024-08-01', '2024-08-02')
+    worker.join_queue()
+    worker.stop()
+
+    assert retry['run_id'] != run['run_id']
+    assert worker.status(retry['run_id'])['status'] == 'done'
+
+
+def test_http_trigger_queues_runs():
+    worker = _worker(lambda *args, **kwargs: {'status': 'completed'}).start()
+    httpd = worker_module.serve_http(worker, port=0)
+    try:
+        url = f'http://127.0.0.1:{httpd.server_port}'
+        run = worker_module._trigger(url, '2024-08-01', '2024-08-02')
+        worker.join_queue()
+
+        with urlrequest.urlopen(f"{url}/runs/{run['run_id']}") as response:
+            assert json.loads(response.read())['status'] == 'done'
+    finally:
+        httpd.shutdown()
+        worker.stop()
+
+
+@pytest.mark.parametrize('body, error', [
+    (b'{"from_date": ', 'body is not valid JSON'),
+    (b'["2024-08-01", "2024-08-02"]', 'body must be a JSON object'),
+    (b'{"from_date": "01/08/2024", "to_date": "2024-08-02"}', 'from_date must be a YYYY-MM-DD date'),
+    (b'{"from_date": "2024-08-01", "to_date": 20240802}', 'to_date must be a YYYY-MM-DD date'),
+    (b'{"from_date": "2024-08-01"}', 'from_date and to_date must be given together'),
+    (b'{"from_date": "2024-08-02", "to_date": "2024-08-01"}', 'to_date is before from_date'),
+])
+def test_http_trigger_rejects_bad_requests(body, error):
+    worker = _worker(lambda *args, **kwargs: {'status': 'completed'})
+    httpd = worker_module.serve_http(worker, port=0)
+    try:
+        post = urlrequest.Request(f'http://127.0.0.1:{httpd.server_port}/runs', data=body, method='POST')
+        with pytest.raises(urlrequest.HTTPError) as excinfo:
+            urlrequest.urlopen(post)
+
+        assert excinfo.value.code == 400
+        assert json.loads(excinfo.value.read()) == {'error': error}
+        assert worker.status() == []
+    finally:
+        httpd.shutdown()
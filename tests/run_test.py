@@ -0,0 +1,98 @@
+import threading
+import time
+
+import pytest
+
+import run
+
+
+def test_independent_steps_run_in_parallel(tmp_path):
+    steps = [
+        {'name': 'a', 'command': 'sleep 0.5'},
+        {'name': 'b', 'command': 'sleep 0.5'},
+        {'name': 'c', 'command': 'sleep 0.5'},
+    ]
+    start = time.time()
+    results = run.Runner(steps, max_workers=3, log_dir=tmp_path).run()
+
+    assert [result.status for result in results] == [run.OK] * 3
+    assert time.time() - start < 1.2
+
+
+def test_dependencies_run_in_order_and_stream_to_logs(tmp_path):
+    marker = tmp_path / 'marker'
+    steps = [
+        {'name': 'second', 'command': f'cat {marker}', 'needs': ['first']},
+        {'name': 'first', 'command': f'echo from-first > {marker}; echo to-stderr >&2'},
+    ]
+    results = run.Runner(steps, log_dir=tmp_path).run()
+
+    assert [result.status for result in results] == [run.OK, run.OK]
+    assert (tmp_path / 'second.log').read_text() == 'from-first\n'
+    assert (tmp_path / 'first.log').read_text() == 'to-stderr\n'
+
+
+def test_failure_skips_dependents_but_not_independent_steps(tmp_path):
+    steps = [
+        {'name': 'broken', 'command': 'exit 3'},
+        {'name': 'after', 'command': 'echo never', 'needs': ['broken']},
+        {'name': 'after-after', 'command': 'echo never', 'needs': ['after']},
+        {'name': 'other', 'command': 'echo fine'},
+    ]
+    results = {result.name: result for result in run.Runner(steps, log_dir=tmp_path).run()}
+
+    assert results['broken'].status == run.FAILED and results['broken'].returncode == 3
+    assert results['after'].status == run.SKIPPED
+    assert results['after-after'].status == run.SKIPPED
+    assert results['other'].status == run.OK
+
+
+def test_timeout_kills_the_step(tmp_path):
+    start = time.time()
+    results = run.Runner([{'name': 'slow', 'command': 'sleep 30', 'timeout': 0.3}], log_dir=tmp_path).run()
+
+    assert results[0].status == run.TIMEOUT
+    assert time.time() - start < 5
+
+
+def test_step_ignoring_the_stop_signal_is_killed_after_the_grace_period(tmp_path):
+    start = time.time()
+    results = run.Runner([{'name': 'stubborn', 'command': "trap '' TERM; sleep 30", 'timeout': 0.3}],
+                         log_dir=tmp_path, kill_grace_seconds=0.3).run()
+
+    assert results[0].status == run.TIMEOUT
+    assert time.time() - start < 5
+
+
+def test_cancel_stops_running_and_pending_steps(tmp_path):
+    steps = [
+        {'name': 'slow', 'command': 'sleep 30'},
+        {'name': 'later', 'command': 'echo never', 'needs': ['slow']},
+    ]
+    runner = run.Runner(steps, log_dir=tmp_path)
+    threading.Timer(0.3, runner.cancel).start()
+
+    results = {result.name: result.status for result in runner.run()}
+
+    assert results == {'slow': run.CANCELLED, 'later': run.CANCELLED}
+
+
+@pytest.mark.parametrize('steps, message', [
+    ([{'name': 'a', 'command': 'true', 'needs': ['b']}, {'name': 'b', 'command': 'true', 'needs': ['a']}], 'cycle'),
+    ([{'name': 'a', 'command': 'true', 'needs': ['missing']}], 'unknown'),
+    ([{'name': 'a', 'command': 'true'}, {'name': 'a', 'command': 'true'}], 'Duplicate'),
+])
+def test_invalid_graphs_are_rejected(steps, message):
+    with pytest.raises(ValueError, match=message):
+        run.load_graph(steps)
+
+
+def test_timing_table_lists_every_step():
+    table = run.format_timing_table([run.StepResult('pull', run.OK, 0, 1.5), run.StepResult('push', run.SKIPPED)])
+
+    assert 'pull' in table and 'skipped' in table and '1.50' in table
+
+
+def test_run_command_reports_success(tmp_path):
+    assert run.run_command('true', log_dir=tmp_path)
+    assert not run.run_command('false', log_dir=tmp_path)
@@ -0,0 +1,140 @@
+import json
+import threading
+import time
+
+import pytest
+
+fnb = pytest.importorskip('bank.fnb')
+requests = pytest.importorskip('requests')
+
+
+def _bank_api(server, **kwargs):
+    return fnb.BankAPI('stub-client', 'stub-secret', server.base_url, server.auth_url, {},
+                       backoff_seconds=0.01, **kwargs)
+
+
+def test_bank_api_follows_pages(fnb_server):
+    fnb_server.configure(rows=250, page_size=100)
+    df = _bank_api(fnb_server).get_transaction_history('62000000000', '2024-08-01', '2024-08-02')
+
+    assert len(df) == 250
+    assert df['entryId'].is_unique
+    assert fnb_server.stats['GET 200'] == 3
+
+
+def test_bank_api_retries_rate_limits_and_server_errors(fnb_server):
+    fnb_server.configure(rate_limit_rate=0.3, server_error_rate=0.3, retry_after=0)
+    bank_api = _bank_api(fnb_server, max_retries=10)
+
+    for day in range(1, 6):
+        df = bank_api.get_transaction_history('62000000000', f'2024-08-0{day}', f'2024-08-0{day + 1}')
+        assert len(df) == 200
+
+    assert fnb_server.stats['GET 429'] + fnb_server.stats['GET 503'] > 0
+    assert fnb_server.stats['GET 200'] == 5
+
+
+def test_bank_api_reauthenticates_on_expired_token(fnb_server):
+    bank_api = _bank_api(fnb_server)
+    fnb_server.configure(token_ttl=0)
+    bank_api.access_token = 'expired-token'
+    fnb_server.configure(token_ttl=3600)
+
+    df = bank_api.get_transaction_history('62000000000', '2024-08-01', '2024-08-02')
+
+    assert len(df) == 200
+    assert fnb_server.stats['GET 401'] == 1
+
+
+def test_threads_sharing_a_client_reauthenticate_once(fnb_server):
+    bank_api = _bank_api(fnb_server)
+    bank_api.access_token = 'expired-token'
+    fnb_server.configure(latency_ms=50)
+    start = threading.Barrier(4)
+    rows = []
+
+    def fetch():
+        start.wait()
+        rows.append(len(bank_api.get_transaction_history('62000000000', '2024-08-01', '2024-08-02')))
+
+    threads = [threading.Thread(target=fetch) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert rows == [200] * 4
+    assert fnb_server.stats['GET 401'] == 4
+    # The first token plus one re-authentication, not one per thread
+    assert fnb_server.stats['POST 200'] == 2
+
+
+def test_bank_api_gives_up_after_max_retries(fnb_server):
+    fnb_server.configure(server_error_rate=1.0)
+
+    assert _bank_api(fnb_server, max_retries=2).get_transaction_history('62000000000', '2024-08-01', '2024-08-02') is None
+    assert fnb_server.stats['GET 503'] == 3
+
+
+def test_retry_after_accepts_seconds_and_http_dates():
+    from datetime import datetime, timezone
+
+    now = datetime(2024, 8, 1, 12, 0, tzinfo=timezone.utc)
+
+    assert fnb.retry_after_seconds('2.5') == 2.5
+    assert fnb.retry_after_seconds('Thu, 01 Aug 2024 12:00:30 GMT', now=now) == 30
+    assert fnb.retry_after_seconds('Thu, 01 Aug 2024 11:00:00 GMT', now=now) == 0
+    assert fnb.retry_after_seconds('soon') is None and fnb.retry_after_seconds(None) is None
+
+
+def test_large_retry_after_is_capped(fnb_server):
+    fnb_server.configure(rate_limit_rate=1.0, retry_after=3600)
+    bank_api = _bank_api(fnb_server, max_retries=2, max_delay_seconds=0.05)
+
+    start_time = time.monotonic()
+    assert bank_api.get_transaction_history('62000000000', '2024-08-01', '2024-08-02') is None
+    assert time.monotonic() - start_time < 5
+    assert fnb_server.stats['GET 429'] == 3
+
+
+def test_http_date_retry_after_is_honoured(fnb_server):
+    fnb_server.configure(rate_limit_rate=1.0, retry_after='Wed, 21 Oct 2015 07:28:00 GMT')
+
+    assert _bank_api(fnb_server, max_retries=1).get_transaction_history('62000000000', '2024-08-01',
+                                                                         '2024-08-02') is None
+    assert fnb_server.stats['GET 429'] == 2
+
+
+def test_empty_window_returns_none(fnb_server):
+    fnb_server.configure(rows=0)
+
+    assert _bank_api(fnb_server).get_transaction_history('62000000000', '2024-08-01', '2024-08-02') is None
+    assert fnb_server.stats['GET 204'] == 1
+
+
+def test_admin_config_updates_running_server(fnb_server):
+    response = requests.post(f'{fnb_server.url}/_admin/config', data=json.dumps({'latency_ms': 5, 'page_size': 50}))
+
+    assert response.json()['page_size'] == 50
+    assert fnb_server.latency_ms == 5
+
+
+def test_send_email_goes_to_graph_stand_in(graph_mail_server, tmp_path, monkeypatch):
+    pytest.importorskip('O365')
+    recon_process = pytest.importorskip('recon.recon_process')
+
+    monkeypatch.chdir(tmp_path)
+    for name in ('report.pdf', 'statement.xlsx', 'signature.png'):
+        (tmp_path / name).write_bytes(b'stand-in attachment')
+
+    recon_client = recon_process.RECON(None)
+    recon_client.mail_account = graph_mail_server.mail_account
+    recon_client.send_email_with_attachments(
+        ['debtors@example.com'], 'FNB 30-DAY BATCH 1', '<p>body</p>',
+        'report.pdf', 'statement.xlsx', 'signature.png')
+
+    messages = graph_mail_server.messages_summary()
+    assert len(messages) == 1
+    assert messages[0]['to'] == ['debtors@example.com']
+    assert sorted(messages[0]['attachments']) == ['report.pdf', 'signature.png', 'statement.xlsx']
+    assert len(list((tmp_path / 'mail').glob('*.json'))) == 1
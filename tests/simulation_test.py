@@ -0,0 +1,156 @@
+import json
+from datetime import date
+
+import pytest
+
+pd = pytest.importorskip('pandas')
+simulation = pytest.importorskip('recon.simulation')
+recon_process = pytest.importorskip('recon.recon_process')
+adapters = pytest.importorskip('bank.adapters')
+archive = pytest.importorskip('bank.archive')
+fnb_decode = pytest.importorskip('bank.fnb_decode')
+
+from sandbox.synthetic_fnb import generate_statement  # noqa: E402
+
+ACCOUNT = '62000000000'
+FROM_DATE = date(2024, 8, 1)
+
+
+def _statement_frame(customer_ids, rows, days=1):
+    columns = fnb_decode.TransactionColumns('json')
+    columns.add_page(json.dumps(generate_statement(rows, customer_ids=customer_ids, from_date=FROM_DATE,
+                                                   days=days, seed=rows)).encode())
+    return adapters.compact_frame(columns.to_frame())
+
+
+def _customers_df(customers):
+    return pd.DataFrame(customers, columns=simulation.CUSTOMER_COLUMNS)
+
+
+def _posted(transactions):
+    """What process_transactions would have written to fin.batch_transactions for the plan."""
+    return transactions.assign(batch_id=1)[simulation.POSTED_COLUMNS].reset_index(drop=True)
+
+
+def _statement_row(remittance, amount, entry_id):
+    return {'entryId': entry_id, 'bookingDate': FROM_DATE, 'valueDate': FROM_DATE, 'remittanceInfo': remittance,
+            'reference': remittance, 'amount': amount, 'currency': 'ZAR', 'creditDebitIndicator': 'CRDT',
+            'availableCreditDebitIndicator': 'CRDT'}
+
+
+def test_discounts_match_the_row_by_row_formula():
+    recon = recon_process.RECON(None)
+    df = pd.DataFrame({
+        'amount': [90.0, 100.0, 0.0, 123.45, 100.0, 0.01],
+        'payment_terms': ['10% STRICTLY 31 DAYS', '10% STRICTLY 31 DAYS', '10% STRICTLY 31 DAYS',
+                          '10% STRICTLY 31 DAYS', '7 DAY ONLY ACC.', None],
+    })
+    expected = df.apply(lambda row: (round((df['amount'] / 90) * 100, 2)[row.name] - row['amount'])
+                        if row['payment_terms'] == '10% STRICTLY 31 DAYS'
+                        and round((df['amount'] / 90) * 100, 2)[row.name] > 0 else 0,
+                        axis=1).astype(float).round(2)
+
+    assert recon.apply_discounts(df)['discount'].tolist() == expected.tolist()
+
+
+def test_plan_groups_a_statement_into_batches(customer_ids, customers):
+    statement_df = _statement_frame(customer_ids, 2000, days=3)
+
+    plan = simulation.plan_batches(statement_df, _customers_df(customers))
+
+    transactions, batches = plan['transactions'], plan['batches']
+    assert len(transactions) + len(plan['unmatched']) == len(statement_df)
+    assert (transactions['batch_type'].map(recon_process.BATCH_TERMS) == transactions['payment_terms']).all()
+    assert set(batches['batch_type']) <= set(recon_process.BATCH_TERMS)
+    assert batches['transactions'].sum() == len(transactions)
+    assert batches['total'].sum() == pytest.approx(transactions['total'].sum())
+    assert (transactions.loc[transactions['batch_type'] != '30-DAY', 'discount'] == 0).all()
+    # The statement frame is left as it was
+    assert 'customer_id' not in statement_df
+
+
+def test_diff_reports_new_dropped_and_changed_rows(customers):
+    customer_ids = [customer_id for customer_id, _ in customers[:3]]
+    statement_df = adapters.compact_frame(pd.DataFrame([
+        _statement_row(f'ADT CASH DEPO0001 {customer_ids[0][3:]}', 100.0, 'E1'),
+        _statement_row(customer_ids[1], 50.0, 'E2'),
+        _statement_row(customer_ids[2], 75.0, 'E3'),
+    ]))
+    snapshot_customers = _customers_df(customers)
+    plan = simulation.plan_batches(statement_df, snapshot_customers)
+    posted = _posted(plan['transactions'])
+    # E1 was posted as it is planned, E2 went to another customer, E3 was not posted,
+    # and a row the rules no longer match was
+    posted.loc[posted['entryId'] == 'E2', 'customer_id'] = customer_ids[0]
+    posted = posted[posted['entryId'] != 'E3']
+    posted = pd.concat([posted, pd.DataFrame([{
+        'bookingDate': FROM_DATE, 'remittanceInfo': 'BANK CHARGES', 'customer_id': customer_ids[0],
+        'amount': 12.0, 'discount': 0.0, 'batch_id': 1, 'entryId': 'E4'}])], ignore_index=True)
+
+    diff = simulation.diff_posted(plan, simulation.Snapshot(snapshot_customers, posted))
+
+    rows = diff['rows'].set_index('remittanceInfo')
+    assert sorted(zip(rows['change'], rows.index)) == [
+        ('changed', customer_ids[1]), ('dropped', 'BANK CHARGES'), ('new', customer_ids[2])]
+    assert rows.loc[customer_ids[1], 'customer_id_planned'] == customer_ids[1]
+    assert rows.loc[customer_ids[1], 'customer_id_posted'] == customer_ids[0]
+    assert diff['batches']['transactions_planned'].sum() == 3
+    assert diff['batches']['transactions_posted'].sum() == 3
+
+
+def test_a_month_of_archived_history_simulates_in_seconds(customer_ids, customers, tmp_path):
+    statement_df = _statement_frame(customer_ids, 30000, days=30)
+    archive.StatementArchive(str(tmp_path)).write(ACCOUNT, statement_df)
+    snapshot_customers = _customers_df(customers)
+    plan = simulation.plan_batches(statement_df, snapshot_customers)
+    snapshot = simulation.Snapshot(snapshot_customers, _posted(plan['transactions']))
+
+    result = simulation.simulate(archive.ArchiveAdapter(archive.StatementArchive(str(tmp_path))), ACCOUNT,
+                                 '2024-08-01', '2024-08-30', snapshot)
+
+    assert result['seconds'] < 10
+    assert result['plan']['batches']['bookingDate'].nunique() == 30
+    assert result['diff']['rows'].empty
+    assert (result['diff']['batches']['total_delta'] == 0).all()
+    report = simulation.simulation_report(result)
+    assert report['rows'] == 30000 and report['diff']['changes'] == {}
+    json.dumps(report)
+
+
+def test_snapshot_is_read_only_and_can_be_cached(recon_db, customer_ids, customers, tmp_path):
+    from psycopg2 import extensions
+
+    recon = recon_process.RECON(None)
+    statement_df = _statement_frame(customer_ids, 200)
+    plan = simulation.plan_batches(statement_df, _customers_df(customers), recon)
+    batch_id = recon.insert_batch(recon_db, 'BR001', FROM_DATE, 'Finance (Bot)', 0, 0, 0)
+    recon.insert_bank_transactions(recon_db, plan['transactions'], batch_id)
+
+    snapshot = simulation.Snapshot.from_db(recon_db, FROM_DATE, FROM_DATE)
+
+    assert recon_db.get_transaction_status() == extensions.TRANSACTION_STATUS_IDLE
+    assert len(snapshot.customers) == len(customers) and len(snapshot.posted) == len(plan['transactions'])
+    assert simulation.diff_posted(plan, snapshot)['rows'].empty
+
+    snapshot.save(str(tmp_path / 'snapshot'))
+    cached = simulation.Snapshot.load(str(tmp_path / 'snapshot'))
+    pd.testing.assert_frame_equal(cached.posted, snapshot.posted)
+    assert simulation.diff_posted(plan, cached)['rows'].empty
+
+
+def test_fetching_for_a_simulation_does_not_touch_the_archive(customer_ids, tmp_path, monkeypatch):
+    from sandbox.synthetic_statements import write_csv
+
+    pipeline = pytest.importorskip('recon.pipeline')
+    path = tmp_path / 'statement.csv'
+    with open(path, 'w', newline='') as stream:
+        write_csv(generate_statement(20, customer_ids=customer_ids, from_date=FROM_DATE), stream)
+    monkeypatch.setenv('STATEMENT_PATH', str(path))
+    monkeypatch.setenv('STATEMENT_ARCHIVE', str(tmp_path / 'archive'))
+
+    fnb = pipeline.bank_adapter_from_env({}, archive=False)
+
+    assert isinstance(fnb, adapters.FileStatementAdapter)
+    assert len(fnb.get_transaction_history(ACCOUNT, None, None)) == 20
+    assert not (tmp_path / 'archive').exists()
+    assert isinstance(pipeline.bank_adapter_from_env({}), archive.ArchivingAdapter)
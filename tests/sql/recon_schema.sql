@@ -0,0 +1,50 @@
+-- Minimal copy of the production tables touched by the recon robot, used by
+-- the throwaway Postgres in tests/conftest.py.
+
+CREATE SCHEMA IF NOT EXISTS crm;
+CREATE SCHEMA IF NOT EXISTS fin;
+
+CREATE TABLE IF NOT EXISTS crm.customers (
+    username        TEXT PRIMARY KEY,
+    payment_terms   TEXT
+);
+
+CREATE TABLE IF NOT EXISTS fin.invoices (
+    invoice_id      TEXT PRIMARY KEY,
+    customer_id     TEXT NOT NULL,
+    invoice_date    DATE,
+    due_date        DATE,
+    amount          NUMERIC(14, 2),
+    balance         NUMERIC(14, 2)
+);
+
+CREATE TABLE IF NOT EXISTS fin.batch (
+    batch_id        SERIAL PRIMARY KEY,
+    branch_code     TEXT,
+    batch_date      DATE,
+    operator_name   TEXT,
+    sub_total       NUMERIC(14, 2),
+    discount        NUMERIC(14, 2),
+    total           NUMERIC(14, 2),
+    posted          BOOLEAN DEFAULT FALSE
+);
+
+CREATE TABLE IF NOT EXISTS fin.batch_transactions (
+    id                      BIGSERIAL PRIMARY KEY,
+    booking_date            DATE,
+    value_date              DATE,
+    remittance_info         TEXT,
+    reference               TEXT,
+    amount                  NUMERIC(14, 2),
+    discount                NUMERIC(14, 2),
+    currency                TEXT,
+    credit_debit_indicator  TEXT,
+    batch_id                INTEGER REFERENCES fin.batch (batch_id)
+);
+
+CREATE TABLE IF NOT EXISTS fin.general_ledger (
+    id              BIGSERIAL PRIMARY KEY,
+    batch_id        INTEGER REFERENCES fin.batch (batch_id),
+    posting_date    DATE,
+    total_amount    NUMERIC(14, 2)
+);
@@ -0,0 +1,51 @@
+# Rows/sec for each statement file parser on synthetic statements.
+#
+#   python -m pytest tests/statement_parsers_benchmark_test.py --benchmark-only
+# Row counts default to 10k; set STATEMENT_BENCH_ROWS=10000,100000,1000000 for the full suite.
+# Rows/sec per parser is stored in extra_info['rows_per_sec'] (see --benchmark-json).
+import os
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+pytest.importorskip('pandas')
+adapters = pytest.importorskip('bank.adapters')
+synthetic_statements = pytest.importorskip('sandbox.synthetic_statements')
+
+ROW_COUNTS = [int(rows) for rows in os.getenv('STATEMENT_BENCH_ROWS', '10000').split(',')]
+ROUNDS = int(os.getenv('STATEMENT_BENCH_ROUNDS', '3'))
+
+WRITERS = {
+    'csv': synthetic_statements.write_csv,
+    'ofx': synthetic_statements.write_ofx,
+    'mt940': synthetic_statements.write_mt940,
+    'camt053': synthetic_statements.write_camt053,
+}
+
+
+@pytest.fixture(scope='module')
+def statement_files(tmp_path_factory, synthetic_statement):
+    """Statement files per (format, rows), written once per module."""
+    directory = tmp_path_factory.mktemp('statements')
+    files = {}
+
+    def _file(statement_format, rows):
+        if (statement_format, rows) not in files:
+            path = directory / f'{rows}.{statement_format}'
+            with open(path, 'w', newline='') as stream:
+                WRITERS[statement_format](synthetic_statement(rows), stream)
+            files[statement_format, rows] = str(path)
+        return files[statement_format, rows]
+
+    return _file
+
+
+@pytest.mark.parametrize('rows', ROW_COUNTS)
+@pytest.mark.parametrize('statement_format', list(WRITERS))
+def test_parse_to_normalized_frame(benchmark, record_rate, statement_files, statement_format, rows):
+    adapter = adapters.FileStatementAdapter(statement_files(statement_format, rows))
+
+    df = benchmark.pedantic(adapter.get_transaction_history, args=('62000000000', None, None), rounds=ROUNDS)
+
+    record_rate(rows)
+    assert len(df) == rows
@@ -1,11 +1,21 @@
 import os
 import platform
-import requests
 import zipfile
 import shutil
 import subprocess
 
+from download_manager import DownloadManager, extract_archive
+
 tag = '🍎🍎🍎 Local Robot Environment Builder 🍎'
+
+# The installer file install_vscode looks for in the download directory. The download
+# URL ends in /sha/download on every platform, so it cannot name the file.
+INSTALLER_FILES = {
+    "Windows": "VSCode-win32-x64-user.exe",
+    "Darwin": "VSCode-darwin-arm64-user.zip",
+    "Linux": "VSCode-linux-x64-user.tar.gz",
+}
+
 def find_vscode_download(platform):
     """Finds the appropriate VS Code download URL for the given platform.
 
@@ -32,19 +42,26 @@ def find_vscode_download(platform):
     return download_url
 
 
-def download_and_extract(download_url, output_dir):
+def download_and_extract(download_url, output_dir, sha256=None, installer_name=None):
     """Downloads the VS Code installer and extracts it to the specified directory.
 
+    The download goes through the local download cache, so repeat environment builds
+    reuse the archive instead of fetching it again.
+
     Args:
         download_url: The URL to download VS Code from.
         output_dir: The directory to extract the installer to.
+        sha256: Optional expected SHA-256 of the download.
+        installer_name: File name for a download that is not an archive. Defaults to the
+            installer install_vscode expects on this platform.
     """
     print(f"\n{tag} Downloading VS Code installer...")
     try:
-        response = requests.get(download_url, stream=True)
-        response.raise_for_status()
-        with zipfile.ZipFile(response.raw) as zip_ref:
-            zip_ref.extractall(output_dir)
+        archive_path = DownloadManager().fetch(download_url, sha256=sha256)
+        if not extract_archive(archive_path, output_dir):
+            # Not an archive (e.g. the Windows .exe installer): copy it as is
+            installer_name = installer_name or INSTALLER_FILES.get(platform.system(), INSTALLER_FILES["Windows"])
+            shutil.copy(archive_path, os.path.join(output_dir, installer_name))
 
         print(f"{tag} VS Code installer downloaded and extracted to  🥦 {output_dir}")
     except Exception as e:
@@ -59,11 +76,7 @@ def install_vscode(output_dir):
     """
 
     print(f"\n{tag} Installing VS Code...")
-    installer_path = os.path.join(output_dir, "VSCode-win32-x64-user.exe")
-    if platform.system() == "Darwin":
-        installer_path = os.path.join(output_dir, "VSCode-darwin-arm64-user.zip")
-    elif platform.system() == "Linux":
-        installer_path = os.path.join(output_dir, "VSCode-linux-x64-user.tar.gz")
+    installer_path = os.path.join(output_dir, INSTALLER_FILES.get(platform.system(), INSTALLER_FILES["Windows"]))
 
     print(f"{tag} VS Code installer path: {installer_path}")
 
@@ -168,7 +181,8 @@ def start_installation(project_source_folder:str):
 
 
 # Installs an environment to enable running a production robot locally on a customer's machine
-source_folder = "/Users/aubreymalabie/Work/liza-work/tiger-robot"
-project_name = "ReconRobot"
+if __name__ == "__main__":
+    source_folder = "/Users/aubreymalabie/Work/liza-work/tiger-robot"
+    project_name = "ReconRobot"
 
-start_installation(project_source_folder=source_folder)
+    start_installation(project_source_folder=source_folder)